@@ -3,18 +3,28 @@
 MarketScale QA Framework - Simple Demo
 Demonstrates the testing capabilities without full Laravel setup
 """
+import functools
 import subprocess
 import time
 import json
 from datetime import datetime
 
+from qa_runner.probes import probe_tools
+from qa_runner.store import record_results
+from qa_runner.toolchain import Toolchain
+
+@functools.lru_cache(maxsize=None)
+def toolchain():
+    """Node tool binaries, resolved on first use"""
+    return Toolchain()
+
 def run_test(name, command, test_type="functional"):
     """Run a test and return results"""
     print(f"🚀 Running {name} ({test_type})...")
     start = time.time()
     
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
+        result = subprocess.run(toolchain().argv(command)[0], capture_output=True, text=True)
         duration = time.time() - start
         
         success = result.returncode == 0
@@ -26,6 +36,7 @@ def run_test(name, command, test_type="functional"):
         
         return {
             'name': name,
+            'command': command,
             'type': test_type,
             'duration': duration,
             'success': success,
@@ -37,12 +48,30 @@ def run_test(name, command, test_type="functional"):
         print(f"   ❌ ERROR {name} - {duration:.2f}s: {e}")
         return {
             'name': name,
+            'command': command,
             'type': test_type,
             'duration': duration,
             'success': False,
             'error': str(e)
         }
 
+def probe_test(name, probe, test_type="health"):
+    """Report a tool probe the same way as a test"""
+    status = "✅ PASSED" if probe['success'] else "❌ FAILED"
+    source = " (cached)" if probe['cached'] else ""
+    print(f"   {status} {name} - {probe['duration']:.2f}s{source}")
+    if not probe['success'] and probe['error']:
+        print(f"    Error: {probe['error'][:100]}...")
+    return {
+        'name': name,
+        'command': probe['command'],
+        'type': test_type,
+        'duration': probe['duration'],
+        'success': probe['success'],
+        'error': probe['error'],
+        'cached': probe['cached']
+    }
+
 def main():
     print("🎬 MarketScale QA Framework - Simple Demo")
     print("=" * 60)
@@ -54,11 +83,12 @@ def main():
     # Health Checks
     print("\n🏥 HEALTH CHECKS")
     print("-" * 30)
-    tests.append(run_test("Node.js Version", "node --version", "health"))
-    tests.append(run_test("PHP Version", "php --version", "health"))
-    tests.append(run_test("k6 Version", "k6 version", "health"))
-    tests.append(run_test("Cypress Version", "npx cypress --version", "health"))
-    tests.append(run_test("Playwright Version", "npx playwright --version", "health"))
+    probes = probe_tools(['node', 'php', 'k6', 'cypress', 'playwright'])
+    tests.append(probe_test("Node.js Version", probes['node']))
+    tests.append(probe_test("PHP Version", probes['php']))
+    tests.append(probe_test("k6 Version", probes['k6']))
+    tests.append(probe_test("Cypress Version", probes['cypress']))
+    tests.append(probe_test("Playwright Version", probes['playwright']))
     
     # Tool Demonstrations
     print("\n🛠️ TOOL DEMONSTRATIONS")
@@ -105,6 +135,8 @@ def main():
             'tests': tests
         }, f, indent=2)
     
+    record_results('demo', {test['name']: test for test in tests})
+    
     print(f"\n📄 Results saved to: test-results/demo-results.json")
     
     if success_rate >= 70:
@@ -27,7 +27,7 @@ export const options = {
   },
 };
 
-const BASE_URL = 'http://localhost:8000/api';
+const BASE_URL = __ENV.API_BASE_URL || 'http://localhost:8000/api';
 let authToken = '';
 
 export function setup() {
@@ -21,8 +21,8 @@ export default defineConfig({
   ],
   /* Shared settings for all the projects below. See https://playwright.dev/docs/api/class-testoptions. */
   use: {
-    /* Base URL to use in actions like `await page.goto('/')`. */
-    baseURL: 'http://localhost:8000',
+    /* Base URL to use in actions like `await page.goto('/')`. The QA runner's server pool overrides it per worker. */
+    baseURL: process.env.PLAYWRIGHT_BASE_URL || 'http://localhost:8000',
 
     /* Collect trace when retrying the failed test. See https://playwright.dev/docs/trace-viewer */
     trace: 'on-first-retry',
@@ -78,8 +78,8 @@ export default defineConfig({
     },
   ],
 
-  /* Run your local dev server before starting the tests */
-  webServer: {
+  /* Run your local dev server before starting the tests, unless the QA runner already started one */
+  webServer: process.env.PLAYWRIGHT_BASE_URL ? undefined : {
     command: 'php artisan serve --host=0.0.0.0 --port=8000',
     url: 'http://localhost:8000',
     reuseExistingServer: !process.env.CI,
@@ -0,0 +1,3 @@
+"""
+MarketScale QA runner support modules used by run_tiered_tests.py
+"""
@@ -0,0 +1,115 @@
+"""
+MarketScale QA Accounting - Per-command CPU, memory, context-switch and block I/O usage via wait4/rusage
+
+Commands are started under this file run as a script: it becomes a child subreaper, runs the
+command, reaps it and any orphaned descendants, and writes their combined rusage as JSON.
+It is executed from the component's working directory, so it imports nothing from qa_runner.
+"""
+import ctypes
+import json
+import os
+import signal
+import sys
+
+WRAPPER = os.path.abspath(__file__)
+
+PR_SET_CHILD_SUBREAPER = 36
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def supported():
+    """Whether rusage for a child process tree can be collected on this platform"""
+    return hasattr(os, 'wait4')
+
+
+def wrap_command(argv, output_path):
+    """Argument vector that runs argv under the accounting wrapper"""
+    return [sys.executable, WRAPPER, os.path.abspath(output_path), '--'] + list(argv)
+
+
+def read_usage(path, duration):
+    """Usage written by the wrapper, or None if it never got to write it; the file is removed"""
+    try:
+        with open(path) as f:
+            usage = json.load(f)
+        os.remove(path)
+    except (OSError, ValueError):
+        return None
+    cpu_seconds = usage['user_cpu'] + usage['system_cpu']
+    usage['cpu_seconds'] = round(cpu_seconds, 2)
+    usage['avg_cores'] = round(cpu_seconds / duration, 2) if duration else None
+    # The largest single process until /proc samples of the whole tree say otherwise
+    usage['peak_rss_mb'] = usage['max_rss_mb']
+    return usage
+
+
+def _become_subreaper():
+    """Have orphaned grandchildren reparent to this process so their usage is counted too"""
+    if not sys.platform.startswith('linux'):
+        return
+    try:
+        ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _reap_exited():
+    """Reap descendants that have already exited without waiting on ones still running"""
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+
+def main():
+    import resource
+
+    output_path, argv = sys.argv[1], sys.argv[3:]
+    # The whole process group receives the runner's signals, so the command handles them itself
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(sig, signal.SIG_IGN)
+    _become_subreaper()
+
+    pid = os.fork()
+    if pid == 0:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+        try:
+            os.execvp(argv[0], argv)
+        except OSError as e:
+            sys.stderr.write(f"{argv[0]}: {e}\n")
+            os._exit(127)
+
+    _, status, _ = os.wait4(pid, 0)
+    # Descendants still running are killed by the runner along with the process group
+    _reap_exited()
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    with open(output_path, 'w') as f:
+        json.dump({
+            'user_cpu': round(usage.ru_utime, 3),
+            'system_cpu': round(usage.ru_stime, 3),
+            'max_rss_mb': round(usage.ru_maxrss * MAXRSS_UNIT / (1024 * 1024), 1),
+            'voluntary_ctx_switches': usage.ru_nvcsw,
+            'involuntary_ctx_switches': usage.ru_nivcsw,
+            'block_reads': usage.ru_inblock,
+            'block_writes': usage.ru_oublock,
+        }, f)
+
+    if os.WIFSIGNALED(status):
+        # Die the same way so the runner still sees the signal
+        try:
+            signal.signal(os.WTERMSIG(status), signal.SIG_DFL)
+        except (OSError, ValueError):
+            pass
+        os.kill(os.getpid(), os.WTERMSIG(status))
+    sys.exit(os.waitstatus_to_exitcode(status))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+MarketScale QA Admission Control - CPU and memory budgets for starting jobs on a shared runner
+"""
+import os
+import time
+
+# (command substring, cores, MB) for commands without learned costs; the first match wins
+RESOURCE_DEFAULTS = [
+    ('--project=webkit', 2.0, 1500),
+    ("--project='Mobile Safari'", 2.0, 1500),
+    ('playwright test --project', 1.5, 1200),
+    # Without --project Playwright runs every browser project in one process tree
+    ('playwright test', 3.0, 3000),
+    ('cypress run', 1.5, 1200),
+    ('lighthouse', 1.5, 800),
+    ('k6 run', 1.0, 400),
+    ('qa_runner.loadgen', 1.0, 200),
+    ('php artisan test', 1.0, 300),
+    ('newman run', 0.5, 200),
+    ('curl', 0.1, 20),
+]
+DEFAULT_COST = (1.0, 500)
+
+# Seconds between /proc samples and admission re-checks while jobs are held back
+SAMPLE_INTERVAL = 1.0
+
+
+def default_cost(cmd):
+    """(cores, MB) a command is assumed to need before it has any history"""
+    for pattern, cores, memory_mb in RESOURCE_DEFAULTS:
+        if pattern in cmd:
+            return cores, memory_mb
+    return DEFAULT_COST
+
+
+def load_average():
+    """One-minute load average, or None where the platform has none"""
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+
+def memory_available_mb():
+    """MemAvailable from /proc/meminfo in MB, or None outside Linux"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class ProcessGroupSampler:
+    """CPU time and resident memory of running process groups, sampled from /proc"""
+
+    def __init__(self):
+        self.enabled = os.path.isdir('/proc')
+        self.groups = {}
+        if self.enabled:
+            self._ticks = os.sysconf('SC_CLK_TCK')
+            self._page_mb = os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+    def watch(self, slot, pgid):
+        """Start tracking the process group a worker slot is running"""
+        self.groups[slot] = {'pgid': pgid, 'started': time.time(), 'cpu_seconds': 0.0,
+                             'rss_mb': 0.0, 'peak_rss_mb': 0.0}
+
+    def sample(self):
+        """One pass over /proc, summing CPU time and RSS per watched group"""
+        groups = dict(self.groups)
+        if not self.enabled or not groups:
+            return
+        by_pgid = {group['pgid']: group for group in groups.values()}
+        totals = {pgid: [0.0, 0.0] for pgid in by_pgid}
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except (OSError, IndexError):
+                continue
+            pgid = int(fields[2])
+            if pgid in totals:
+                # utime, stime, cutime and cstime: reaped children are counted by their parent
+                totals[pgid][0] += sum(int(value) for value in fields[11:15]) / self._ticks
+                totals[pgid][1] += int(fields[21]) * self._page_mb
+        for pgid, (cpu_seconds, rss_mb) in totals.items():
+            group = by_pgid[pgid]
+            group['cpu_seconds'] = max(group['cpu_seconds'], cpu_seconds)
+            group['rss_mb'] = rss_mb
+            group['peak_rss_mb'] = max(group['peak_rss_mb'], rss_mb)
+
+    def current_rss_mb(self, slot):
+        group = self.groups.get(slot)
+        return group['rss_mb'] if group else 0.0
+
+    def release(self, slot):
+        """Stop tracking a slot and return what its group used, if it was ever sampled"""
+        group = self.groups.pop(slot, None)
+        if group is None or not group['peak_rss_mb']:
+            return None
+        duration = time.time() - group['started']
+        return {
+            'cpu_seconds': round(group['cpu_seconds'], 2),
+            'avg_cores': round(group['cpu_seconds'] / duration, 2) if duration else None,
+            'peak_rss_mb': round(group['peak_rss_mb'], 1)
+        }
+
+
+class AdmissionController:
+    """Starts a job only while the running jobs' costs plus live load and free memory stay within budget"""
+
+    def __init__(self, max_load=None, mem_reserve_mb=1024, sampler=None):
+        self.max_load = max_load or float(os.cpu_count() or 1)
+        self.mem_reserve_mb = mem_reserve_mb
+        self.sampler = sampler or ProcessGroupSampler()
+        self.running = {}
+        self.held = {}
+        self.decisions = []
+
+    def admit(self, job, label):
+        """Whether a job may start now; logs when it is first held back and when it is let through"""
+        reason = self._over_budget(job) if self.running else None
+        if reason is not None:
+            if job.id not in self.held:
+                self.held[job.id] = time.time()
+                print(f"   ⏸️  Holding {label}: {reason}")
+            return False
+
+        self.running[job.id] = job
+        held_since = self.held.pop(job.id, None)
+        if held_since is not None:
+            waited = time.time() - held_since
+            self.decisions.append({'job': label, 'waited': round(waited, 2)})
+            print(f"   ▶️  Admitting {label} after {waited:.1f}s")
+        return True
+
+    def finish(self, job):
+        self.running.pop(job.id, None)
+
+    def _over_budget(self, job):
+        committed = sum(other.cpu_cost for other in self.running.values())
+        # The load average trails by about a minute, so freshly started jobs count at their estimate
+        load = max(load_average() or 0.0, committed)
+        if load + job.cpu_cost > self.max_load:
+            return f"needs {job.cpu_cost:.1f} cores, load {load:.1f} of {self.max_load:.1f}"
+
+        available = memory_available_mb()
+        if available is None:
+            return None
+        # Memory a running job is expected to grow into has not left MemAvailable yet
+        growing = sum(max(other.mem_cost - self.sampler.current_rss_mb(other.worker), 0.0)
+                      for other in self.running.values())
+        free = available - growing
+        if free - job.mem_cost < self.mem_reserve_mb:
+            return (f"needs {job.mem_cost:.0f} MB, {free:.0f} MB free "
+                    f"with {self.mem_reserve_mb:.0f} MB reserved")
+        return None
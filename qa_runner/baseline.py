@@ -0,0 +1,176 @@
+"""
+MarketScale QA Performance Baseline - SQLite history of k6 and Lighthouse runs with regression checks
+"""
+import json
+import math
+import os
+import re
+import sqlite3
+import statistics
+import subprocess
+import time
+from urllib.parse import urlparse
+
+BASELINE_DB = os.path.join('test-results', 'perf-baseline.sqlite')
+
+# Percentiles kept per endpoint and stage; throughput is kept alongside them
+LATENCY_STATS = ('p50', 'p95', 'p99')
+
+LIGHTHOUSE_AUDITS = {
+    'first-contentful-paint': 'fcp_ms',
+    'largest-contentful-paint': 'lcp_ms',
+    'speed-index': 'speed_index_ms',
+    'interactive': 'tti_ms',
+    'total-blocking-time': 'tbt_ms',
+    'cumulative-layout-shift': 'cls',
+}
+
+LIGHTHOUSE_OUTPUT = re.compile(r"--output-path[= ](\S+\.json)")
+
+# Metrics where a drop, not a rise, is the regression
+HIGHER_IS_BETTER = {'rps', 'score'}
+
+# Series with fewer samples than this in a run are too noisy to judge
+MIN_SERIES_COUNT = 20
+# Past runs needed before a series is judged at all
+MIN_BASELINE_RUNS = 5
+# Robust z-score (distance from the median in scaled MADs) a change must also exceed to count as a regression
+Z_THRESHOLD = 3.0
+MAD_SCALE = 1.4826
+# A handful of runs understates the noise, so it is never taken as less than this share of the median
+NOISE_FLOOR = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS perf_samples (
+    id INTEGER PRIMARY KEY,
+    recorded_at REAL NOT NULL,
+    commit_sha TEXT NOT NULL,
+    source TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS perf_samples_series
+    ON perf_samples (scenario, endpoint, stage, metric, recorded_at);
+CREATE INDEX IF NOT EXISTS perf_samples_commit ON perf_samples (commit_sha);
+"""
+
+
+def current_commit():
+    """HEAD commit of the working tree, or 'unknown' outside a git checkout"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def format_change(change):
+    """Relative change as a signed percentage; None means the baseline was zero"""
+    return f"{change * 100:+.1f}%" if change is not None else "from zero"
+
+
+def k6_samples(scenario, latency):
+    """Baseline samples for one k6 run from its latency summary"""
+    samples = []
+    rows = [(row, row['endpoint'], '*') for row in latency['endpoints']]
+    rows += [(row, '*', row['stage']) for row in latency.get('stages', [])]
+    for row, endpoint, stage in rows:
+        if row['count'] < MIN_SERIES_COUNT:
+            continue
+        for stat in LATENCY_STATS:
+            samples.append(('k6', scenario, endpoint, stage, f"{row['metric']}.{stat}", row[stat]))
+        if row['metric'] == 'http_req_duration' and row.get('rps'):
+            samples.append(('k6', scenario, endpoint, stage, 'rps', row['rps']))
+    for metric, rate in latency['rates'].items():
+        if rate['count'] >= MIN_SERIES_COUNT:
+            samples.append(('k6', scenario, '*', '*', f"{metric}.rate", rate['rate']))
+    return samples
+
+
+def lighthouse_output_path(cmd):
+    """JSON report a Lighthouse command writes, if any"""
+    match = LIGHTHOUSE_OUTPUT.search(cmd)
+    return match.group(1) if match and 'lighthouse' in cmd else None
+
+
+def lighthouse_samples(path):
+    """Baseline samples from a Lighthouse JSON report"""
+    with open(path) as f:
+        report = json.load(f)
+    scenario = f"lighthouse {urlparse(report.get('requestedUrl') or report.get('finalUrl') or '').path or '/'}"
+    samples = []
+    for category, data in report.get('categories', {}).items():
+        if data.get('score') is not None:
+            samples.append(('lighthouse', scenario, category, '*', 'score', data['score'] * 100))
+    for audit, metric in LIGHTHOUSE_AUDITS.items():
+        value = report.get('audits', {}).get(audit, {}).get('numericValue')
+        if value is not None:
+            samples.append(('lighthouse', scenario, '*', '*', metric, value))
+    return samples
+
+
+class PerfBaseline:
+    """Indexed per-commit history of performance samples and a rolling-baseline regression check"""
+
+    def __init__(self, path=BASELINE_DB):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def record(self, commit, samples, recorded_at=None):
+        """Append one run's samples in a single transaction"""
+        recorded_at = recorded_at or time.time()
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO perf_samples (recorded_at, commit_sha, source, scenario, endpoint, stage, metric, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(recorded_at, commit) + tuple(sample) for sample in samples]
+            )
+
+    def baseline(self, scenario, endpoint, stage, metric, exclude_commit, window):
+        """Values of a series from the most recent runs on other commits"""
+        rows = self.db.execute(
+            "SELECT value FROM perf_samples WHERE scenario = ? AND endpoint = ? AND stage = ? AND metric = ? "
+            "AND commit_sha != ? ORDER BY recorded_at DESC LIMIT ?",
+            (scenario, endpoint, stage, metric, exclude_commit, window)
+        )
+        return [value for (value,) in rows]
+
+    def check(self, commit, samples, tolerance=0.10, window=10):
+        """Samples that are worse than their rolling baseline by more than the tolerance and the noise"""
+        regressions = []
+        for source, scenario, endpoint, stage, metric, value in samples:
+            history = self.baseline(scenario, endpoint, stage, metric, commit, window)
+            if len(history) < MIN_BASELINE_RUNS:
+                continue
+            median = statistics.median(history)
+            mad = statistics.median(abs(past - median) for past in history) * MAD_SCALE
+            noise = max(mad, abs(median) * NOISE_FLOOR)
+            worse = (median - value) if metric.split('.')[0] in HIGHER_IS_BETTER else (value - median)
+            if median:
+                change = worse / abs(median)
+            else:
+                change = float('inf') if worse > 0 else 0.0
+            # A flat history at zero leaves only the tolerance to decide
+            z_score = worse / noise if noise else (float('inf') if worse > 0 else 0.0)
+            if change > tolerance and z_score > Z_THRESHOLD:
+                regressions.append({
+                    'source': source,
+                    'scenario': scenario,
+                    'endpoint': endpoint,
+                    'stage': stage,
+                    'metric': metric,
+                    'value': round(value, 4),
+                    'baseline_median': round(median, 4),
+                    'change': round(change, 4) if math.isfinite(change) else None,
+                    'z_score': round(z_score, 2) if math.isfinite(z_score) else None,
+                    'baseline_runs': len(history)
+                })
+        return regressions
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,154 @@
+"""
+MarketScale QA Result Cache - Replay passing results whose inputs have not changed
+"""
+import hashlib
+import json
+import os
+import re
+
+# Source trees and config files each component's suites depend on
+APP_SOURCES = ['app', 'routes', 'config', 'bootstrap/app.php', 'composer.lock']
+FRONTEND_SOURCES = APP_SOURCES + ['resources', 'package-lock.json', 'vite.config.js']
+
+COMPONENT_INPUTS = {
+    'frontend': FRONTEND_SOURCES + ['cypress/support', 'cypress.config.js'],
+    'e2e': FRONTEND_SOURCES + ['cypress/support', 'cypress.config.js'],
+    'smoke': FRONTEND_SOURCES + ['cypress/support', 'cypress.config.js', 'tests'],
+    'cross-browser': FRONTEND_SOURCES + ['playwright.config.js'],
+    'mobile': FRONTEND_SOURCES + ['playwright.config.js'],
+    'visual': FRONTEND_SOURCES + ['playwright-tests', 'playwright.config.js'],
+    'accessibility': FRONTEND_SOURCES + ['playwright-tests', 'playwright.config.js'],
+    'backend': APP_SOURCES + ['database', 'tests', 'phpunit.xml'],
+    'security': APP_SOURCES + ['database', 'tests', 'phpunit.xml', 'cypress/support', 'cypress.config.js'],
+    'api': APP_SOURCES + ['database', 'postman'],
+}
+
+# Playwright project commands run every spec under playwright-tests/
+PLAYWRIGHT_SPECS = 'playwright-tests'
+
+# Test types that measure the live environment rather than the code
+UNCACHEABLE_TYPES = {'load', 'stress', 'lighthouse', 'health'}
+
+PATH_PATTERN = re.compile(r"[\w./-]+\.(?:js|jsx|ts|tsx|json|php|xml)")
+
+
+def command_inputs(cmd, component):
+    """Files and directories whose contents determine a command's outcome"""
+    inputs = list(COMPONENT_INPUTS.get(component, APP_SOURCES))
+    inputs.extend(path for path in PATH_PATTERN.findall(cmd) if os.path.exists(path))
+    if 'playwright test' in cmd:
+        inputs.append(PLAYWRIGHT_SPECS)
+    return sorted(set(inputs))
+
+
+class ResultCache:
+    """Content-addressed cache of passing command results with LRU size eviction"""
+
+    def __init__(self, cache_dir='.qa-cache', max_bytes=256 * 1024 * 1024, max_entries=5000):
+        self.results_dir = os.path.join(cache_dir, 'results')
+        self.digest_path = os.path.join(cache_dir, 'file-digests.json')
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._digests = self._load_digests()
+        self._digests_dirty = False
+        os.makedirs(self.results_dir, exist_ok=True)
+
+    def _load_digests(self):
+        try:
+            with open(self.digest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _file_digest(self, path):
+        """Content digest of a file, memoised on size and mtime so unchanged files are not re-read"""
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        memo = self._digests.get(path)
+        if memo and memo[0] == stamp:
+            return memo[1]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        self._digests[path] = [stamp, digest.hexdigest()]
+        self._digests_dirty = True
+        return digest.hexdigest()
+
+    def _walk(self, path):
+        if os.path.isfile(path):
+            yield path
+            return
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                yield os.path.join(root, name)
+
+    def key_for(self, command):
+        """Hash of a command line and every input file it depends on"""
+        cmd, component, tier, test_type = command
+        key = hashlib.sha256()
+        key.update(f"{cmd}\0{component}\0{test_type}\0".encode())
+        for path in command_inputs(cmd, component):
+            if not os.path.exists(path):
+                key.update(f"missing:{path}\0".encode())
+                continue
+            for file_path in self._walk(path):
+                key.update(f"{file_path}\0{self._file_digest(file_path)}\0".encode())
+        return key.hexdigest()
+
+    def cacheable(self, command):
+        return command[3] not in UNCACHEABLE_TYPES
+
+    def _entry_path(self, key):
+        return os.path.join(self.results_dir, f"{key}.json")
+
+    def lookup(self, key):
+        """Return the cached result for a key, marking it recently used"""
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return entry
+
+    def store(self, key, result):
+        """Cache a passing result"""
+        entry = {name: value for name, value in result.items() if not name.endswith('_tail')}
+        tmp_path = self._entry_path(key) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._entry_path(key))
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits its size and count limits"""
+        entries = []
+        for name in os.listdir(self.results_dir):
+            path = os.path.join(self.results_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+            _, size, path = entries.pop(0)
+            os.remove(path)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def save(self):
+        """Persist the file digest memo and apply eviction"""
+        if self._digests_dirty:
+            self._digests = {path: memo for path, memo in self._digests.items() if os.path.exists(path)}
+            with open(self.digest_path, 'w') as f:
+                json.dump(self._digests, f)
+            self._digests_dirty = False
+        return self.evict()
@@ -0,0 +1,76 @@
+"""
+MarketScale QA Output Capture - Stream command output to log files in bounded memory
+"""
+import gzip
+import os
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# Bytes of each stream kept in memory for failure excerpts
+DEFAULT_TAIL_BYTES = 16 * 1024
+
+COMPRESSION_SUFFIXES = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def resolve_compression(compression):
+    """Fall back to gzip when zstd is requested but zstandard is not installed"""
+    if compression == 'zstd' and zstandard is None:
+        print("⚠️  zstandard is not installed, compressing logs with gzip instead")
+        return 'gzip'
+    return compression or 'none'
+
+
+class OutputCapture:
+    """Streams one output stream of a command to a log file, keeping only a bounded tail in memory"""
+
+    def __init__(self, path, compression='none', tail_bytes=DEFAULT_TAIL_BYTES):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.compression = compression
+        self.path = path + COMPRESSION_SUFFIXES[compression]
+        self.tail_bytes = tail_bytes
+        self.tail = bytearray()
+        self.bytes_written = 0
+
+        self._raw = open(self.path, 'wb')
+        if compression == 'gzip':
+            self._file = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=6)
+        elif compression == 'zstd':
+            self._file = zstandard.ZstdCompressor().stream_writer(self._raw)
+        else:
+            self._file = self._raw
+
+    def write(self, data):
+        """Append a chunk to the log and the tail ring buffer"""
+        self._file.write(data)
+        self.bytes_written += len(data)
+        self.tail += data
+        if len(self.tail) > self.tail_bytes:
+            del self.tail[:len(self.tail) - self.tail_bytes]
+
+    def close(self):
+        """Flush and close the log file"""
+        if self._file is not self._raw:
+            self._file.close()
+        if not self._raw.closed:
+            self._raw.close()
+
+    def tail_text(self):
+        """Decoded tail of the stream for failure excerpts"""
+        return self.tail.decode(errors='replace')
+
+    def describe(self):
+        """Report entry locating the log and its tail by uncompressed byte offsets"""
+        return {
+            'path': self.path,
+            'compression': self.compression,
+            'bytes': self.bytes_written,
+            'tail_offset': self.bytes_written - len(self.tail),
+            'tail_bytes': len(self.tail)
+        }
@@ -0,0 +1,101 @@
+"""
+MarketScale QA Coalescing - One Playwright invocation for several projects, split back into per-project results
+"""
+import shlex
+
+PLAYWRIGHT_TEST = ['npx', 'playwright', 'test']
+
+# Options that give a command its own output or parallelism, so it cannot share an invocation
+OWN_RUN_OPTIONS = ('--reporter', '--workers', '--shard', '-j')
+
+# Component a merged command reports under when its commands came from several
+MERGED_COMPONENT = 'playwright'
+
+
+def project_command(cmd):
+    """(projects, other arguments) of a plain per-project Playwright command, else None"""
+    argv = shlex.split(cmd)
+    if argv[:3] != PLAYWRIGHT_TEST or any(arg.startswith(OWN_RUN_OPTIONS) for arg in argv):
+        return None
+    projects = [arg.split('=', 1)[1] for arg in argv if arg.startswith('--project=')]
+    if not projects:
+        return None
+    return projects, tuple(arg for arg in argv[3:] if not arg.startswith('--project='))
+
+
+def coalesce_commands(commands, workers_for):
+    """Merge Playwright commands of a tier that differ only in --project into one invocation each
+
+    Returns the new command list, with each merged command where its first member was, and
+    a map from every merged command string to the commands it replaced.
+    """
+    groups = {}
+    for command in commands:
+        parsed = project_command(command[0])
+        if parsed is not None:
+            groups.setdefault((command[2], parsed[1]), []).append(command)
+
+    coalesced = []
+    merged = {}
+    for command in commands:
+        parsed = project_command(command[0])
+        group = groups.get((command[2], parsed[1])) if parsed is not None else None
+        if group is None or len(group) < 2:
+            coalesced.append(command)
+            continue
+        if command is not group[0]:
+            continue
+        projects = [project for member in group for project in project_command(member[0])[0]]
+        cmd = shlex.join(PLAYWRIGHT_TEST + [f"--project={project}" for project in projects] + list(parsed[1])
+                         + [f"--workers={workers_for(group)}"])
+        components = {member[1] for member in group}
+        test_types = {member[3] for member in group}
+        coalesced.append((cmd, components.pop() if len(components) == 1 else MERGED_COMPONENT, command[2],
+                          test_types.pop() if len(test_types) == 1 else 'e2e'))
+        merged[cmd] = group
+    return coalesced, merged
+
+
+def _combine(summaries):
+    """One test summary out of several projects' summaries"""
+    combined = {'total': 0, 'passed': 0, 'failed': 0, 'flaky': 0, 'skipped': 0, 'duration': 0.0,
+                'failed_tests': [], 'flaky_tests': []}
+    for summary in summaries:
+        for field, value in summary.items():
+            combined[field] += value
+    return combined
+
+
+def split_result(result, group):
+    """One result per command a merged run replaced, judged by its own projects' tests"""
+    projects = result.get('projects') or {}
+    shared = {field: value for field, value in result.items()
+              if field not in ('projects', 'resources', 'tests', 'startup_saved', 'tool_startup')}
+    entries = []
+    for cmd, component, tier, test_type in group:
+        tests = _combine(projects[name] for name in project_command(cmd)[0] if name in projects)
+        entry = dict(shared, command=cmd, component=component, tier=tier, test_type=test_type)
+        entry['coalesced'] = {
+            'command': result['command'],
+            'duration': result['duration'],
+            'resources': result.get('resources'),
+            'commands': len(group)
+        }
+        if tests['total']:
+            entry['tests'] = {field: value for field, value in tests.items() if field != 'duration'}
+            # Projects run side by side in the merged run; their own test time is the closest thing to a duration
+            entry['duration'] = 0.0 if result.get('cached') else round(tests['duration'], 2)
+        if not tests['failed'] and not tests['flaky']:
+            # Only the projects whose tests were retried share the merged run's retries
+            entry.pop('retries', None)
+            entry.pop('recovered_by_retry', None)
+        if not result['success'] and not any(result.get(flag) for flag in ('cancelled', 'skipped', 'timed_out')):
+            # The run failed, but only projects with failing (or no) tests did
+            entry['success'] = bool(tests['total']) and not tests['failed']
+            entry['returncode'] = 0 if entry['success'] else result['returncode']
+        entries.append(entry)
+    # The merged run started its tool once, so its startup (and what npx would have added) is counted once
+    for field in ('startup_saved', 'tool_startup'):
+        if result.get(field) and entries:
+            entries[0][field] = result[field]
+    return entries
@@ -0,0 +1,254 @@
+"""
+MarketScale QA Distributed Execution - HTTP work queue served by a coordinator and pulled by workers
+"""
+import hmac
+import json
+import secrets
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Workers heartbeat this often while running a job; a worker silent for LEASE_TIMEOUT is presumed dead
+HEARTBEAT_INTERVAL = 5
+LEASE_TIMEOUT = 20
+# Seconds an idle worker waits before asking for work again
+POLL_INTERVAL = 1
+# A job lost with this many workers is reported as an error instead of being handed out again
+MAX_ATTEMPTS = 3
+# Seconds a worker keeps retrying an unreachable coordinator before giving up
+COORDINATOR_GRACE = 60
+# Seconds the coordinator waits without a live worker before failing the jobs still outstanding
+WORKER_WAIT = 300
+# Shared secret every worker request must carry; the coordinator makes one up when none is given
+TOKEN_ENV = 'QA_COORDINATOR_TOKEN'
+
+
+class Coordinator:
+    """Leases job descriptors to workers over HTTP and re-queues the jobs of workers that stop heartbeating"""
+
+    def __init__(self, host='127.0.0.1', port=8765, lease_timeout=LEASE_TIMEOUT, token=None):
+        self.lease_timeout = lease_timeout
+        self.token = token or secrets.token_urlsafe(24)
+        self.lock = threading.Condition()
+        self.queue = []
+        self.leases = {}
+        self.workers = {}
+        self.finished = []
+        self.closed = False
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://{socket.gethostname() if host == '0.0.0.0' else host}:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def _handler(self):
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                supplied = self.headers.get('Authorization', '')
+                if not hmac.compare_digest(supplied.encode(), f"Bearer {coordinator.token}".encode()):
+                    self.send_error(403, 'Missing or wrong coordinator token')
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                    action = getattr(coordinator, f"handle_{self.path.strip('/')}", None)
+                    if action is None:
+                        self.send_error(404)
+                        return
+                    body = json.dumps(action(request)).encode()
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def live_workers(self):
+        with self.lock:
+            return sum(1 for worker in self.workers.values() if not worker.get('lost'))
+
+    def submit(self, descriptor):
+        with self.lock:
+            self.queue.append(dict(descriptor, attempt=1))
+            self.lock.notify_all()
+
+    def withdraw(self, job_ids):
+        """Take jobs no worker has leased yet back off the queue, returning the ids withdrawn"""
+        with self.lock:
+            withdrawn = [descriptor['id'] for descriptor in self.queue if descriptor['id'] in job_ids]
+            self.queue = [descriptor for descriptor in self.queue if descriptor['id'] not in job_ids]
+            return withdrawn
+
+    def abandon(self, job_ids):
+        """Forget queued and leased jobs for good, so results that still arrive for them are turned away"""
+        with self.lock:
+            self.queue = [descriptor for descriptor in self.queue if descriptor['id'] not in job_ids]
+            for job_id in job_ids:
+                self.leases.pop(job_id, None)
+
+    def wait_results(self, timeout):
+        """Results that arrived since the last call, waiting up to timeout for the first one"""
+        with self.lock:
+            self._reap()
+            if not self.finished:
+                self.lock.wait(timeout)
+                self._reap()
+            finished, self.finished = self.finished, []
+            return finished
+
+    def _reap(self):
+        """Re-queue the leases of workers that missed their heartbeats; called with the lock held"""
+        now = time.time()
+        for worker_id, worker in self.workers.items():
+            if worker.get('lost') or now - worker['last_seen'] <= self.lease_timeout:
+                continue
+            worker['lost'] = True
+            for job_id, lease in list(self.leases.items()):
+                if lease['worker'] != worker_id:
+                    continue
+                del self.leases[job_id]
+                descriptor = lease['descriptor']
+                if descriptor['attempt'] >= MAX_ATTEMPTS:
+                    print(f"   💀 {descriptor['label']} was lost with {descriptor['attempt']} workers - giving up")
+                    self.finished.append((descriptor, {'error': f"lost with {descriptor['attempt']} workers"}))
+                    continue
+                print(f"   💀 Worker {worker['name']} stopped heartbeating - re-queueing {descriptor['label']}")
+                self.queue.insert(0, dict(descriptor, attempt=descriptor['attempt'] + 1))
+        self.lock.notify_all()
+
+    def handle_register(self, request):
+        worker_id = uuid.uuid4().hex[:12]
+        with self.lock:
+            self.workers[worker_id] = {'name': request.get('name') or worker_id, 'last_seen': time.time(),
+                                       'jobs': 0}
+        print(f"🛰️  Worker {request.get('name') or worker_id} joined")
+        return {'worker_id': worker_id, 'heartbeat_interval': HEARTBEAT_INTERVAL, 'poll_interval': POLL_INTERVAL}
+
+    def _touch(self, worker_id):
+        worker = self.workers.get(worker_id)
+        if worker is None:
+            raise ValueError(f"Unknown worker {worker_id}")
+        worker['last_seen'] = time.time()
+        if worker.pop('lost', False):
+            print(f"🛰️  Worker {worker['name']} is back")
+        return worker
+
+    def handle_lease(self, request):
+        with self.lock:
+            worker = self._touch(request['worker_id'])
+            self._reap()
+            if not self.queue:
+                return {'job': None, 'done': self.closed}
+            descriptor = self.queue.pop(0)
+            self.leases[descriptor['id']] = {'worker': request['worker_id'], 'descriptor': descriptor}
+            worker['jobs'] += 1
+            return {'job': descriptor, 'done': False}
+
+    def handle_heartbeat(self, request):
+        with self.lock:
+            self._touch(request['worker_id'])
+            return {'ok': True}
+
+    def handle_result(self, request):
+        with self.lock:
+            self._touch(request['worker_id'])
+            lease = self.leases.get(request['job_id'])
+            # A job re-queued from a presumed-dead worker may come back twice; the first result wins
+            if lease is None:
+                return {'accepted': False}
+            del self.leases[request['job_id']]
+            self.queue = [descriptor for descriptor in self.queue if descriptor['id'] != request['job_id']]
+            self.finished.append((lease['descriptor'], dict(request['payload'],
+                                                            node=self.workers[request['worker_id']]['name'])))
+            self.lock.notify_all()
+            return {'accepted': True}
+
+    def close(self, grace=POLL_INTERVAL * 3):
+        """Tell idle workers there is no more work, then stop serving"""
+        with self.lock:
+            self.closed = True
+        time.sleep(grace)
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _post(url, path, payload, token, timeout=30):
+    request = urllib.request.Request(f"{url.rstrip('/')}/{path}", data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json', 'Authorization': f"Bearer {token}"},
+                                     method='POST')
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def _post_retrying(url, path, payload, token):
+    """POST to the coordinator, retrying through restarts and network blips for COORDINATOR_GRACE seconds"""
+    deadline = time.time() + COORDINATOR_GRACE
+    while True:
+        try:
+            return _post(url, path, payload, token)
+        except urllib.error.HTTPError as e:
+            if e.code == 403:
+                raise PermissionError(f"Coordinator {url} rejected the token (set --coordinator-token or {TOKEN_ENV})")
+            if time.time() > deadline:
+                raise ConnectionError(f"Coordinator {url} unreachable: {e}")
+            time.sleep(POLL_INTERVAL)
+        except (OSError, ValueError) as e:
+            if time.time() > deadline:
+                raise ConnectionError(f"Coordinator {url} unreachable: {e}")
+            time.sleep(POLL_INTERVAL)
+
+
+def run_worker(url, execute, name=None, token=None):
+    """Pull jobs from a coordinator until it closes, running each with execute(descriptor) -> payload"""
+    name = name or socket.gethostname()
+    registration = _post_retrying(url, 'register', {'name': name}, token)
+    worker_id = registration['worker_id']
+    print(f"🛰️  {name} registered with {url}")
+    executed = 0
+
+    while True:
+        lease = _post_retrying(url, 'lease', {'worker_id': worker_id}, token)
+        if lease['job'] is None:
+            if lease['done']:
+                print(f"🛰️  Coordinator finished - {name} ran {executed} jobs")
+                return executed
+            time.sleep(registration['poll_interval'])
+            continue
+
+        descriptor = lease['job']
+        stopped = threading.Event()
+
+        def heartbeat():
+            while not stopped.is_set():
+                try:
+                    _post(url, 'heartbeat', {'worker_id': worker_id}, token,
+                          timeout=registration['heartbeat_interval'])
+                except (OSError, ValueError):
+                    pass
+                stopped.wait(registration['heartbeat_interval'])
+
+        beats = threading.Thread(target=heartbeat, daemon=True)
+        beats.start()
+        try:
+            payload = execute(descriptor)
+        except Exception as e:
+            # A job that blows up is reported as a failure; the worker stays around for the next lease
+            print(f"   ❌ {descriptor['label']} crashed on {name}: {type(e).__name__}: {e}")
+            payload = {'error': f"{type(e).__name__}: {e}"}
+        finally:
+            stopped.set()
+        _post_retrying(url, 'result', {'worker_id': worker_id, 'job_id': descriptor['id'], 'payload': payload}, token)
+        executed += 1
@@ -0,0 +1,175 @@
+"""
+MarketScale QA Fixtures - Golden SQLite database, migrated and seeded once, restored per suite
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import time
+
+DB_DIR = os.path.join('test-results', 'db')
+GOLDEN_DB = os.path.join(DB_DIR, 'golden.sqlite')
+SHARED_DB = os.path.join('database', 'database.sqlite')
+
+# Files that decide what the golden database contains
+FIXTURE_INPUTS = [
+    os.path.join('database', 'migrations', '*.php'),
+    os.path.join('database', 'seeders', '*.php'),
+    os.path.join('database', 'factories', '*.php'),
+]
+SEEDER = os.path.join('database', 'seeders', 'DatabaseSeeder.php')
+
+# Journal files SQLite keeps next to a database; stale ones would corrupt a restored copy
+SQLITE_SIDE_FILES = ('-journal', '-wal', '-shm')
+
+RESTORE_METHODS = ['auto', 'reflink', 'copy', 'backup']
+
+# linux/fs.h: clone the extents of one file into another (btrfs, xfs, overlayfs on top of them)
+FICLONE = 0x40049409
+
+
+def sqlite_env(path):
+    """Environment that points Laravel at a specific SQLite file"""
+    return {'DB_CONNECTION': 'sqlite', 'DB_DATABASE': os.path.abspath(path)}
+
+
+def fixture_fingerprint():
+    """Hash of the migrations, seeders and factories that build the golden database"""
+    digest = hashlib.sha256()
+    for path in sorted(path for pattern in FIXTURE_INPUTS for path in glob.glob(pattern)):
+        digest.update(path.encode())
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _reflink(source, target):
+    try:
+        import fcntl
+    except ImportError:
+        # Windows has no ioctl; --db-restore auto falls back to a plain copy
+        raise OSError('reflink needs fcntl, which this platform does not have')
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def _backup(source, target):
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def restore_sqlite(source, target, method='auto'):
+    """Reset target to a copy of source and return the method that did it
+
+    reflink and copy build the new file next to the target and swap it in atomically;
+    backup writes through SQLite's online backup API, which is safe while the file is open.
+    """
+    if method == 'backup':
+        _backup(source, target)
+        return 'backup'
+
+    partial = f"{target}.{os.getpid()}.partial"
+    used = None
+    if method in ('auto', 'reflink'):
+        try:
+            _reflink(source, partial)
+            used = 'reflink'
+        except OSError:
+            if method == 'reflink':
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+    if used is None:
+        shutil.copyfile(source, partial)
+        used = 'copy'
+
+    for suffix in SQLITE_SIDE_FILES:
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    os.replace(partial, target)
+    return used
+
+
+class GoldenDatabase:
+    """Migrated and seeded SQLite snapshot that suites restore instead of re-migrating"""
+
+    def __init__(self, path=GOLDEN_DB):
+        self.path = path
+        self.meta_path = path + '.json'
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def fresh(self):
+        return os.path.exists(self.path) and self._load_meta().get('fingerprint') == fixture_fingerprint()
+
+    def build(self):
+        """Run the migrations and seeders into a new golden database"""
+        started = time.time()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        partial = self.path + '.partial'
+        open(partial, 'w').close()
+        env = dict(os.environ, **sqlite_env(partial))
+
+        subprocess.run(['php', 'artisan', 'migrate', '--force'], env=env, check=True, capture_output=True)
+        seeded = os.path.exists(SEEDER)
+        if seeded:
+            subprocess.run(['php', 'artisan', 'db:seed', '--force'], env=env, check=True, capture_output=True)
+
+        os.replace(partial, self.path)
+        meta = {
+            'fingerprint': fixture_fingerprint(),
+            'seeded': seeded,
+            'build_seconds': time.time() - started,
+            'built_at': time.time()
+        }
+        with open(self.meta_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+    def ensure(self):
+        """Build the golden database unless one from the current migrations exists"""
+        if not self.fresh():
+            self.build()
+        return self.path
+
+    def restore(self, target, method='auto'):
+        """Reset a database file to the golden snapshot, returning the method and milliseconds taken"""
+        started = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        used = restore_sqlite(self.path, target, method)
+        return {'method': used, 'ms': round((time.time() - started) * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MarketScale QA golden database fixtures')
+    parser.add_argument('action', choices=['build', 'restore'])
+    parser.add_argument('target', nargs='?', default=SHARED_DB,
+                        help='Database file to restore (defaults to the app database)')
+    parser.add_argument('--method', choices=RESTORE_METHODS, default='auto')
+    args = parser.parse_args()
+
+    golden = GoldenDatabase()
+    if args.action == 'build' or not golden.fresh():
+        meta = golden.build()
+        print(f"🗄️  Golden database built in {meta['build_seconds']:.1f}s ({'seeded' if meta['seeded'] else 'migrations only'})")
+    if args.action == 'restore':
+        restored = golden.restore(args.target, args.method)
+        print(f"🗄️  Restored {args.target} from the golden database ({restored['method']}, {restored['ms']:.1f}ms)")
+
+
+if __name__ == '__main__':
+    main()
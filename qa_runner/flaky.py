@@ -0,0 +1,225 @@
+"""
+MarketScale QA Flaky Tests - Per-test outcomes, targeted retries, flakiness scores and quarantine
+"""
+import glob
+import os
+import re
+import shlex
+import sqlite3
+import xml.etree.ElementTree as ET
+
+from qa_runner.ingest import TITLE_SEPARATOR, junit_records, playwright_records
+from qa_runner.sharding import cypress_specs
+
+TEST_REPORT_DIR = os.path.join('test-results', 'tests')
+
+# Recent runs a flakiness score is taken over, and how many a test needs before it can be quarantined
+FLAKY_WINDOW = 30
+MIN_FLAKY_RUNS = 5
+QUARANTINE_SCORE = 0.2
+
+# Tools whose tests can be retried on their own and moved into the quarantine lane
+RETRYABLE_TOOLS = ('cypress', 'playwright')
+
+JS_REGEX_SPECIAL = re.compile(r"[\\^$.*+?()[\]{}|/-]")
+
+
+def command_tool(cmd):
+    """Test runner a command invokes, if it reports per-test outcomes"""
+    if 'cypress run' in cmd:
+        return 'cypress'
+    if 'playwright test' in cmd:
+        return 'playwright'
+    if 'artisan test' in cmd:
+        return 'phpunit'
+    return None
+
+
+def with_test_report(cmd, report_dir):
+    """Have a Cypress, Playwright or PHPUnit command write a per-test report into report_dir, unless it already writes one"""
+    tool = command_tool(cmd)
+    if tool is None or '--reporter' in cmd or '--log-junit' in cmd:
+        return cmd
+    if tool == 'phpunit':
+        return f"{cmd} --log-junit {shlex.quote(os.path.join(report_dir, 'junit.xml'))}"
+    if tool == 'cypress':
+        mocha_file = 'mochaFile=' + os.path.join(report_dir, 'results-[hash].xml')
+        return f"{cmd} --reporter junit --reporter-options {shlex.quote(mocha_file)}"
+    json_report = os.path.join(report_dir, 'results.json')
+    return f"env PLAYWRIGHT_JSON_OUTPUT_NAME={shlex.quote(json_report)} {cmd} --reporter=list,json"
+
+
+def report_paths(cmd, cwd='.'):
+    """Per-test report files a command wrote, found from its reporter options"""
+    argv = shlex.split(cmd)
+    for token, following in zip(argv, argv[1:] + [None]):
+        if token == '--log-junit' and following:
+            path = os.path.join(cwd, following)
+            return [path] if os.path.exists(path) else []
+        if token.startswith('mochaFile='):
+            pattern = token.split('=', 1)[1].replace('[hash]', '*')
+            return sorted(glob.glob(os.path.join(cwd, pattern)))
+        if token.startswith('PLAYWRIGHT_JSON_OUTPUT_NAME='):
+            path = os.path.join(cwd, token.split('=', 1)[1])
+            return [path] if os.path.exists(path) else []
+    return []
+
+
+def test_outcomes(cmd, cwd='.'):
+    """Every test outcome a Cypress, Playwright or PHPUnit command reported"""
+    tool = command_tool(cmd)
+    outcomes = []
+    for path in report_paths(cmd, cwd):
+        try:
+            outcomes.extend(playwright_records(path) if tool == 'playwright' else junit_records(path, tool))
+        except (OSError, ValueError, ET.ParseError) as e:
+            print(f"⚠️  Skipping unreadable test report {path}: {e}")
+    return outcomes
+
+
+def test_id(outcome):
+    return outcome['tool'], outcome['project'], outcome['file'], outcome['title']
+
+
+def test_name(outcome):
+    """Spec file and title as stored in the results database"""
+    return f"{outcome['file']}{TITLE_SEPARATOR}{outcome['title']}"
+
+
+def merge_attempt(outcomes, retried):
+    """Fold a retry's outcomes into the original ones; a test seen both passing and failing is flaky"""
+    again = {test_id(outcome): outcome for outcome in retried}
+    merged = []
+    for outcome in outcomes:
+        retry = again.get(test_id(outcome))
+        if retry is not None:
+            retries = outcome.get('retries', 0) + 1 + retry.get('retries', 0)
+            if retry['status'] == 'flaky' or {outcome['status'], retry['status']} == {'passed', 'failed'}:
+                outcome = dict(outcome, status='flaky', retries=retries)
+            else:
+                outcome = dict(outcome, retries=retries)
+        merged.append(outcome)
+    return merged
+
+
+def summarize(outcomes):
+    """Counts per status plus the names of the failing and flaky tests"""
+    summary = {'total': len(outcomes), 'passed': 0, 'failed': 0, 'flaky': 0, 'skipped': 0}
+    for outcome in outcomes:
+        summary[outcome['status']] += 1
+    for status in ('failed', 'flaky'):
+        summary[f"{status}_tests"] = [
+            f"[{outcome['project']}] {test_name(outcome)}" if outcome['project'] else test_name(outcome)
+            for outcome in outcomes if outcome['status'] == status
+        ]
+    return summary
+
+
+def js_pattern(titles):
+    """Playwright --grep pattern matching any of the given titles literally"""
+    return '|'.join(JS_REGEX_SPECIAL.sub(r"\\\g<0>", title.replace(TITLE_SEPARATOR, ' ')) for title in sorted(titles))
+
+
+def retry_command(failed):
+    """Command that re-runs only the failed tests: their specs for Cypress, file:line locations for Playwright"""
+    tool = failed[0]['tool']
+    if tool not in RETRYABLE_TOOLS:
+        return None
+    if tool == 'cypress':
+        if any(not outcome['file'] for outcome in failed):
+            return None
+        specs = sorted({outcome['file'] for outcome in failed})
+        return f"npx cypress run --spec {shlex.quote(','.join(specs))} --headless"
+
+    if any(not outcome['file'] or not outcome['line'] for outcome in failed):
+        return None
+    projects = sorted({outcome['project'] for outcome in failed if outcome['project']})
+    locations = sorted({f"{outcome['file']}:{outcome['line']}" for outcome in failed})
+    return ' '.join(['npx playwright test'] + [shlex.quote(f"--project={project}") for project in projects]
+                    + [shlex.quote(location) for location in locations])
+
+
+def flakiness_scores(db_path, window=FLAKY_WINDOW):
+    """Per-test flakiness over the last runs in the results database
+
+    A run counts against a test when the test was flaky in it (failed, then passed on a retry)
+    or when its outcome flipped from the previous run's. Tests that fail every time score zero:
+    they are broken, not flaky.
+    """
+    if not os.path.exists(db_path):
+        return {}
+    db = sqlite3.connect(db_path)
+    try:
+        rows = db.execute(
+            "SELECT tool, suite, name, status FROM test_cases "
+            "WHERE run_id IN (SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?) ORDER BY finished_at, id",
+            (window,)
+        ).fetchall()
+    except sqlite3.Error:
+        return {}
+    finally:
+        db.close()
+
+    history = {}
+    for tool, suite, name, status in rows:
+        if status != 'skipped' and TITLE_SEPARATOR in name:
+            history.setdefault((tool, suite, name), []).append(status)
+
+    scores = {}
+    for (tool, project, name), statuses in history.items():
+        unstable = 0
+        for previous, status in zip([None] + statuses, statuses):
+            if status == 'flaky' or (previous in ('passed', 'failed') and status in ('passed', 'failed')
+                                     and status != previous):
+                unstable += 1
+        file, title = name.split(TITLE_SEPARATOR, 1)
+        scores[(tool, project, file, title)] = {'score': round(unstable / len(statuses), 3), 'runs': len(statuses)}
+    return scores
+
+
+def quarantined_tests(db_path, threshold=QUARANTINE_SCORE, window=FLAKY_WINDOW):
+    """Tests flaky often enough over enough runs to be moved out of the blocking lane"""
+    return {test: score for test, score in flakiness_scores(db_path, window).items()
+            if test[0] in RETRYABLE_TOOLS and score['runs'] >= MIN_FLAKY_RUNS and score['score'] >= threshold}
+
+
+def quarantine_commands(commands, quarantined):
+    """Split commands into blocking ones without the quarantined tests and lane commands running only them
+
+    Cypress has no per-test filter here, so a quarantined test moves its whole spec into the lane;
+    Playwright tests are excluded from blocking commands with --grep-invert.
+    """
+    cypress_quarantined = {file for tool, project, file, title in quarantined if tool == 'cypress'}
+    playwright_quarantined = [(project, file, title) for tool, project, file, title in quarantined
+                              if tool == 'playwright']
+
+    blocking, lane = [], []
+    playwright_seen = None
+    for command in commands:
+        cmd, component, tier, test_type = command
+        tool = command_tool(cmd)
+        specs = cypress_specs(cmd) if tool == 'cypress' else None
+        if specs and cypress_quarantined & set(specs):
+            moved = [spec for spec in specs if spec in cypress_quarantined]
+            kept = [spec for spec in specs if spec not in cypress_quarantined]
+            lane.append((f"npx cypress run --spec {shlex.quote(','.join(moved))} --headless", component, tier, test_type))
+            if kept:
+                argv = shlex.split(cmd)
+                argv[argv.index('--spec') + 1] = ','.join(kept)
+                blocking.append((shlex.join(argv), component, tier, test_type))
+        elif tool == 'playwright' and playwright_quarantined:
+            pattern = js_pattern({title for project, file, title in playwright_quarantined})
+            blocking.append((f"{cmd} --grep-invert {shlex.quote(pattern)}", component, tier, test_type))
+            playwright_seen = playwright_seen or command
+        else:
+            blocking.append(command)
+
+    if playwright_seen:
+        _, component, tier, test_type = playwright_seen
+        projects = sorted({project for project, file, title in playwright_quarantined if project})
+        files = sorted({file for project, file, title in playwright_quarantined if file})
+        pattern = js_pattern({title for project, file, title in playwright_quarantined})
+        lane.append((' '.join(['npx playwright test'] + [shlex.quote(f"--project={project}") for project in projects]
+                              + [shlex.quote(file) for file in files] + ['--grep', shlex.quote(pattern)]),
+                     component, tier, test_type))
+    return blocking, lane
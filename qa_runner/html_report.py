@@ -0,0 +1,161 @@
+"""
+MarketScale QA HTML Report - Streams the report to disk section by section with client-side paged tables
+"""
+import json
+from html import escape
+
+STYLE = """
+        body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
+        .container { max-width: 1200px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+        .header { text-align: center; margin-bottom: 30px; }
+        .summary { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px; }
+        .metric { background: #f8f9fa; padding: 20px; border-radius: 8px; text-align: center; }
+        .metric h3 { margin: 0 0 10px 0; color: #333; }
+        .metric .value { font-size: 2em; font-weight: bold; color: #007bff; }
+        .tier-section { margin-bottom: 30px; }
+        .tier-header { background: #007bff; color: white; padding: 10px 20px; border-radius: 5px 5px 0 0; }
+        .tier-content { background: #f8f9fa; padding: 20px; border-radius: 0 0 5px 5px; }
+        .status { font-weight: bold; }
+        .status.passed { color: #28a745; }
+        .status.failed { color: #dc3545; }
+        .status.flaky { color: #fd7e14; }
+        .status.skipped { color: #6c757d; }
+        .paged { width: 100%; border-collapse: collapse; background: white; }
+        .paged th, .paged td { padding: 8px; text-align: right; border-bottom: 1px solid #dee2e6; }
+        .paged th { cursor: pointer; user-select: none; white-space: nowrap; }
+        .paged th.text, .paged td.text { text-align: left; }
+        .paged th.asc::after { content: " \\25B2"; }
+        .paged th.desc::after { content: " \\25BC"; }
+        .pager { display: flex; gap: 10px; align-items: center; margin: 10px 0; }
+"""
+
+# Renders only the visible page of each table from its embedded JSON rows
+SCRIPT = """
+document.querySelectorAll('table.paged').forEach(function (table) {
+    var rows = JSON.parse(document.getElementById(table.dataset.rows).textContent);
+    var headers = Array.prototype.slice.call(table.querySelectorAll('th'));
+    var kinds = headers.map(function (th) { return th.className; });
+    var pager = table.previousElementSibling;
+    var filter = pager.querySelector('input');
+    var info = pager.querySelector('span');
+    var size = parseInt(table.dataset.pageSize, 10);
+    var view = rows, page = 0;
+
+    function cell(value, kind) {
+        if (value === null || value === undefined) { return '<td class="' + kind + '"></td>'; }
+        var text = String(value).replace(/&/g, '&amp;').replace(/</g, '&lt;');
+        if (kind === 'status') { return '<td class="status ' + text + '">' + text.toUpperCase() + '</td>'; }
+        return '<td class="' + kind + '">' + text + '</td>';
+    }
+
+    function render() {
+        var pages = Math.max(1, Math.ceil(view.length / size));
+        page = Math.min(page, pages - 1);
+        var html = '';
+        view.slice(page * size, (page + 1) * size).forEach(function (row) {
+            html += '<tr>' + row.map(function (value, i) { return cell(value, kinds[i]); }).join('') + '</tr>';
+        });
+        table.tBodies[0].innerHTML = html;
+        info.textContent = 'Page ' + (page + 1) + ' of ' + pages + ' (' + view.length + ' rows)';
+    }
+
+    headers.forEach(function (th, i) {
+        th.addEventListener('click', function () {
+            var descending = th.classList.contains('asc');
+            headers.forEach(function (other) { other.classList.remove('asc', 'desc'); });
+            th.classList.add(descending ? 'desc' : 'asc');
+            var numeric = kinds[i] === 'num';
+            view = view.slice().sort(function (a, b) {
+                var x = a[i], y = b[i];
+                if (x === y) { return 0; }
+                if (x === null) { return 1; }
+                if (y === null) { return -1; }
+                var order = numeric ? x - y : String(x).localeCompare(String(y));
+                return descending ? -order : order;
+            });
+            render();
+        });
+    });
+    pager.querySelector('.prev').addEventListener('click', function () { page = Math.max(0, page - 1); render(); });
+    pager.querySelector('.next').addEventListener('click', function () { page += 1; render(); });
+    filter.addEventListener('input', function () {
+        var needle = filter.value.toLowerCase();
+        view = needle ? rows.filter(function (row) { return row.join(' ').toLowerCase().indexOf(needle) !== -1; }) : rows;
+        page = 0;
+        render();
+    });
+    render();
+});
+"""
+
+
+class HtmlReportWriter:
+    """Writes the HTML report straight to a file; tables are streamed as JSON rows and paged in the browser"""
+
+    def __init__(self, path, title):
+        self.path = path
+        self.title = title
+        self._file = None
+        self._tables = 0
+
+    def __enter__(self):
+        self._file = open(self.path, 'w')
+        self.write(f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>{escape(self.title)}</title>
+    <style>{STYLE}    </style>
+</head>
+<body>
+    <div class="container">
+""")
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.write(f"""
+    </div>
+    <script>{SCRIPT}</script>
+</body>
+</html>
+""")
+        self._file.close()
+
+    def write(self, html):
+        self._file.write(html)
+
+    def open_section(self, title, subtitle='', color=None):
+        style = f' style="background: {color};"' if color else ''
+        self.write(f"""
+        <div class="tier-section">
+            <div class="tier-header"{style}>
+                <h2>{escape(title)}</h2>
+                <p>{escape(subtitle)}</p>
+            </div>
+            <div class="tier-content">
+""")
+
+    def close_section(self):
+        self.write("""
+            </div>
+        </div>
+""")
+
+    def table(self, columns, rows, page_size=100):
+        """Stream a sortable, filterable table; columns are (label, kind) with kind text, num or status"""
+        self._tables += 1
+        table_id = f"rows-{self._tables}"
+        self.write(f"""
+                <div class="pager">
+                    <button class="prev">&larr;</button><button class="next">&rarr;</button>
+                    <input type="search" placeholder="Filter"><span></span>
+                </div>
+                <table class="paged" data-rows="{table_id}" data-page-size="{page_size}">
+                    <thead><tr>{''.join(f'<th class="{kind}">{escape(label)}</th>' for label, kind in columns)}</tr></thead>
+                    <tbody></tbody>
+                </table>
+                <script type="application/json" id="{table_id}">[""")
+        for index, row in enumerate(rows):
+            # "</" inside the JSON would close the script element early
+            self.write((',\n' if index else '') + json.dumps(list(row)).replace('</', '<\\/'))
+        self.write("]</script>\n")
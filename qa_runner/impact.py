@@ -0,0 +1,196 @@
+"""
+MarketScale QA Impact Selection - Map changed files to the suites that exercise them
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import shlex
+import subprocess
+
+VIDEO_SUITES = [
+    'cypress/e2e/video-recording.cy.js',
+    'cypress/e2e/api-testing.cy.js',
+    'k6-tests/video-processing-load.js',
+    'phpunit:Feature',
+]
+
+CONTENT_REQUEST_SUITES = [
+    'cypress/e2e/content-requests.cy.js',
+    'cypress/e2e/api-testing.cy.js',
+    'k6-tests/api-stress-test.js',
+    'postman/collections/marketscale-api.json',
+    'phpunit:Feature',
+]
+
+API_SUITES = [
+    'cypress/e2e/api-testing.cy.js',
+    'postman/collections/marketscale-api.json',
+    'k6-tests/video-processing-load.js',
+    'k6-tests/api-stress-test.js',
+    'phpunit:Feature',
+    'phpunit:Security',
+]
+
+# Changed-path globs and the suite targets they exercise, first match wins.
+# A '{path}' target stands for the changed file itself.
+IMPACT_MAP = [
+    # Backend
+    ('app/Http/Controllers/Api/VideoController.php', VIDEO_SUITES),
+    ('app/Services/VideoProcessingService.php', VIDEO_SUITES + ['phpunit:Unit']),
+    ('app/Services/AiEditingService.php', VIDEO_SUITES + ['k6-tests/api-stress-test.js', 'phpunit:Unit']),
+    ('app/Models/Video.php', VIDEO_SUITES + ['phpunit:Unit']),
+    ('app/Http/Controllers/Api/ContentRequestController.php', CONTENT_REQUEST_SUITES),
+    ('app/Services/NotificationService.php', CONTENT_REQUEST_SUITES + ['phpunit:Unit']),
+    ('app/Models/ContentRequest.php', CONTENT_REQUEST_SUITES + ['phpunit:Unit']),
+    ('app/Http/Controllers/Api/AuthController.php', API_SUITES),
+    ('app/Models/User.php', API_SUITES + ['phpunit:Unit']),
+    ('routes/api.php', API_SUITES + ['phpunit:Integration']),
+
+    # Frontend
+    ('resources/js/components/VideoRecorder.vue', [
+        'playwright-tests/video-recording.spec.js',
+        'cypress/e2e/video-recording.cy.js',
+    ]),
+    ('resources/js/stores/video.js', [
+        'playwright-tests/video-recording.spec.js',
+        'cypress/e2e/video-recording.cy.js',
+    ]),
+    ('resources/js/stores/contentRequest.js', ['cypress/e2e/content-requests.cy.js']),
+
+    # Test sources select themselves
+    ('cypress/e2e/*.cy.js', ['{path}']),
+    ('playwright-tests/*', ['{path}']),
+    ('k6-tests/*.js', ['{path}']),
+    ('postman/*', ['postman/collections/marketscale-api.json']),
+    ('tests/Unit/*', ['phpunit:Unit']),
+    ('tests/Feature/*', ['phpunit:Feature']),
+    ('tests/Integration/*', ['phpunit:Integration']),
+    ('tests/Security/*', ['phpunit:Security']),
+
+    # Files no suite depends on
+    ('*.md', []),
+    ('requests.jsonl', []),
+]
+
+PLAYWRIGHT_SPEC_PATTERN = re.compile(r"^playwright-tests/.+\.(?:spec|test)\.[jt]sx?$")
+
+
+def _git_lines(*args):
+    output = subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout
+    return [line for line in output.splitlines() if line]
+
+
+def changed_files(ref):
+    """Files that differ from ref in the working tree, plus untracked files"""
+    return sorted(set(_git_lines('diff', '--name-only', ref)) |
+                  set(_git_lines('ls-files', '--others', '--exclude-standard')))
+
+
+def _expand(targets, path):
+    return [path if target == '{path}' else target for target in targets]
+
+
+def _explicit_playwright_specs(argv):
+    return {arg for arg in argv if PLAYWRIGHT_SPEC_PATTERN.match(arg)}
+
+
+def command_targets(cmd, playwright_specs):
+    """Suite targets a command runs, or None when it cannot be narrowed"""
+    argv = shlex.split(cmd)
+    if 'cypress' in argv and '--spec' in argv:
+        return set(argv[argv.index('--spec') + 1].split(','))
+    if 'playwright' in argv and 'test' in argv:
+        return _explicit_playwright_specs(argv) or set(playwright_specs)
+    if argv[:2] == ['k6', 'run'] or 'qa_runner.loadgen' in argv:
+        return {arg for arg in argv if arg.endswith('.js')}
+    if 'newman' in argv:
+        return {argv[argv.index('run') + 1]}
+    if 'artisan' in argv and 'test' in argv:
+        suites = {arg.split('=', 1)[1] for arg in argv if arg.startswith('--testsuite=')}
+        if suites:
+            return {f"phpunit:{suite}" for suite in suites}
+    return None
+
+
+class ImpactIndex:
+    """Precomputed path-to-suite index, cached and rebuilt only when the map or tracked files change"""
+
+    def __init__(self, cache_path='.qa-cache/impact-index.json'):
+        self.cache_path = cache_path
+        self._patterns = [(re.compile(fnmatch.translate(glob)), targets) for glob, targets in IMPACT_MAP]
+        tracked = _git_lines('ls-files')
+        signature = hashlib.sha256(json.dumps([IMPACT_MAP, tracked]).encode()).hexdigest()
+
+        cached = self._load()
+        if cached and cached.get('signature') == signature:
+            self.paths = cached['paths']
+            self.playwright_specs = cached['playwright_specs']
+            return
+
+        self.paths = {}
+        for path in tracked:
+            targets = self._match(path)
+            if targets is not None:
+                self.paths[path] = targets
+        self.playwright_specs = sorted(path for path in tracked if PLAYWRIGHT_SPEC_PATTERN.match(path))
+        self._save(signature)
+
+    def _load(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, signature):
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        with open(self.cache_path, 'w') as f:
+            json.dump({
+                'signature': signature,
+                'paths': self.paths,
+                'playwright_specs': self.playwright_specs
+            }, f)
+
+    def _match(self, path):
+        for pattern, targets in self._patterns:
+            if pattern.match(path):
+                return _expand(targets, path)
+        return None
+
+    def lookup(self, path):
+        """Targets for a changed path; untracked or deleted paths fall back to the glob map"""
+        if path in self.paths:
+            return self.paths[path]
+        return self._match(path)
+
+    def select(self, paths):
+        """Return (targets, unmapped_paths) for a set of changed paths"""
+        targets = set()
+        unmapped = []
+        for path in paths:
+            path_targets = self.lookup(path)
+            if path_targets is None:
+                unmapped.append(path)
+            else:
+                targets.update(path_targets)
+        return targets, unmapped
+
+    def narrow(self, commands, targets):
+        """Keep commands that exercise a selected target, narrowing Playwright runs to the selected specs"""
+        selected = []
+        for command in commands:
+            cmd = command[0]
+            command_suites = command_targets(cmd, self.playwright_specs)
+            if command_suites is None:
+                selected.append(command)
+                continue
+            hits = command_suites & targets
+            if not hits:
+                continue
+            argv = shlex.split(cmd)
+            if 'playwright' in argv and not _explicit_playwright_specs(argv) and hits != command_suites:
+                cmd = ' '.join([cmd] + sorted(hits))
+            selected.append((cmd,) + tuple(command[1:]))
+        return selected
@@ -0,0 +1,226 @@
+"""
+MarketScale QA Test Ingestion - Per-test records streamed out of JUnit XML and Playwright JSON reports
+"""
+import heapq
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+
+PLAYWRIGHT_STATUS = {'expected': 'passed', 'unexpected': 'failed', 'flaky': 'flaky', 'skipped': 'skipped'}
+
+# Joins a spec file to a test title in the results database, e.g. "video.spec.js › Upload › rejects large files"
+TITLE_SEPARATOR = ' › '
+
+# Characters read from a JSON report at a time; one array element at most is held beyond this
+JSON_CHUNK = 1 << 20
+
+# A complete JSON string, or the opening quote of one cut off at the end of the buffer
+JSON_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]"]', re.S)
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+SLOWEST_TESTS = 20
+
+# Every test record of a run, one JSON object per line
+TEST_RECORDS = os.path.join('test-results', 'tests.jsonl')
+
+
+def test_record(tool, file, title, status, duration, project=None, suite=None, line=None, retries=0):
+    """One test's outcome in the shape every parser produces"""
+    return {'tool': tool, 'project': project, 'suite': suite, 'file': file, 'line': line, 'title': title,
+            'status': status, 'duration': duration, 'retries': retries}
+
+
+def _case_status(case):
+    if case.find('failure') is not None or case.find('error') is not None:
+        return 'failed'
+    if case.find('skipped') is not None:
+        return 'skipped'
+    return 'passed'
+
+
+def _relative(path):
+    """PHPUnit writes absolute test file paths; keep them relative to the project like the other tools"""
+    if path and os.path.isabs(path):
+        relative = os.path.relpath(path)
+        return path if relative.startswith('..') else relative
+    return path
+
+
+def junit_records(path, tool):
+    """Test records from a JUnit report, parsed one <testcase> at a time
+
+    Every finished element is cleared and detached from its parent, so memory stays flat however
+    many suites and cases the file holds. A case without a file of its own takes the nearest
+    suite's, or failing that the first file named in the report (mocha puts it on the root suite).
+    """
+    stack = []
+    suites = []
+    first_file = None
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            if elem.tag == 'testsuite':
+                suites.append((elem.get('name'), elem.get('file')))
+                first_file = first_file or elem.get('file')
+            continue
+
+        stack.pop()
+        if elem.tag == 'testcase':
+            file = elem.get('file') or next((file for _, file in reversed(suites) if file), None) or first_file
+            line = elem.get('line')
+            yield test_record(tool, _relative(file), elem.get('name'), _case_status(elem),
+                              float(elem.get('time') or 0), suite=suites[-1][0] if suites else None,
+                              line=int(line) if line and line.isdigit() else None)
+        elif elem.tag == 'testsuite':
+            suites.pop()
+        elif any(parent.tag == 'testcase' for parent in stack):
+            # <failure>, <skipped> and friends are read when their test case ends
+            continue
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+
+def iter_json_array(path, key, chunk_size=JSON_CHUNK):
+    """Yield the objects of a top-level JSON array one at a time, decoding each on its own
+
+    Only the element being read is kept in memory, so a report far larger than any one of
+    its elements streams through in bounded space.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    depth = 0
+    last_key = None
+    in_array = False
+    with open(path, encoding='utf-8') as f:
+        while True:
+            # An element longer than a chunk doubles the read, keeping its re-decoding linear overall
+            chunk = f.read(max(chunk_size, len(buffer) - pos))
+            buffer += chunk
+            if not in_array:
+                for match in JSON_TOKEN.finditer(buffer, pos):
+                    token = match.group()
+                    if token == '"':
+                        # A string cut off by the chunk boundary; rescan it once more has been read
+                        pos = match.start()
+                        break
+                    pos = match.end()
+                    if token in '{[':
+                        depth += 1
+                        if depth == 2 and token == '[' and last_key == key:
+                            in_array = True
+                            break
+                    elif token in '}]':
+                        depth -= 1
+                    elif depth == 1:
+                        # In the root object, the last string before a '[' is that array's key
+                        last_key = json.loads(token)
+                else:
+                    pos = len(buffer)
+
+            while in_array:
+                pos = JSON_SEPARATORS.match(buffer, pos).end()
+                if pos == len(buffer):
+                    break
+                if buffer[pos] == ']':
+                    return
+                try:
+                    element, pos = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if not chunk:
+                        raise
+                    break
+                yield element
+
+            if not chunk:
+                if depth:
+                    raise ValueError(f"{path} ends in the middle of its JSON document")
+                return
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def playwright_records(path):
+    """Test records from a Playwright JSON report, one per test and project, read a file suite at a time"""
+
+    def walk(suite, titles):
+        for spec in suite.get('specs', []):
+            title = TITLE_SEPARATOR.join(titles + [spec['title']])
+            for test in spec.get('tests', []):
+                results = test.get('results', [])
+                yield test_record(
+                    'playwright', spec.get('file'), title,
+                    PLAYWRIGHT_STATUS.get(test.get('status'), 'failed'),
+                    sum(result.get('duration', 0) for result in results) / 1000,
+                    project=test.get('projectName') or None,
+                    suite=TITLE_SEPARATOR.join(titles) or None,
+                    line=spec.get('line'),
+                    retries=max(len(results) - 1, 0)
+                )
+        for child in suite.get('suites', []):
+            yield from walk(child, titles + [child['title']])
+
+    # Top-level suites are files; only describe blocks below them are part of a test's title
+    for suite in iter_json_array(path, 'suites'):
+        yield from walk(suite, [])
+
+
+class TestRecordLog:
+    """A run's test records, appended to a JSON lines file as they arrive; only counts and a few tests stay in memory"""
+
+    def __init__(self, path=TEST_RECORDS, slowest=SLOWEST_TESTS):
+        self.path = path
+        self.slowest_count = slowest
+        self.counts = {'total': 0, 'passed': 0, 'failed': 0, 'flaky': 0, 'skipped': 0}
+        self.flaky = []
+        self._slowest = []
+        self._file = None
+        self._written = False
+
+    def add(self, records):
+        """Write records out and fold them into the counts; a log without a path only counts"""
+        for record in records:
+            if self.path is not None:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    # The first record of a run replaces the last run's file; later ones append after a read-back
+                    self._file = open(self.path, 'a' if self._written else 'w')
+                    self._written = True
+                self._file.write(json.dumps(record) + '\n')
+            self.counts['total'] += 1
+            self.counts[record['status']] += 1
+            if record['status'] == 'flaky':
+                self.flaky.append(record)
+            if record['status'] != 'skipped' and self.slowest_count > 0:
+                # Ties keep the test reported first, as heapq.nlargest would
+                entry = (record['duration'], -self.counts['total'], record)
+                if len(self._slowest) < self.slowest_count:
+                    heapq.heappush(self._slowest, entry)
+                else:
+                    heapq.heappushpop(self._slowest, entry)
+
+    def slowest(self):
+        """The longest-running tests so far, slowest first"""
+        return [record for _, _, record in sorted(self._slowest, key=lambda entry: entry[:2], reverse=True)]
+
+    def close(self):
+        """Flush the file, creating it empty when the run reported no tests so a stale one is not left behind"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        elif not self._written and self.path is not None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            open(self.path, 'w').close()
+            self._written = True
+
+    def __iter__(self):
+        """Read every record written so far back from the file, one at a time"""
+        self.close()
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
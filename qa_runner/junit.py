@@ -0,0 +1,59 @@
+"""
+MarketScale QA JUnit Helpers - Stream, summarise and merge JUnit XML reports
+"""
+import os
+import xml.etree.ElementTree as ET
+
+
+def iter_testsuites(path):
+    """Yield the top-level <testsuite> elements of a report one at a time, clearing each after use"""
+    depth = 0
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if elem.tag == 'testsuite' and depth <= 1:
+            yield elem
+            elem.clear()
+
+
+def suite_summary(suite):
+    """Counts and duration of a <testsuite>, falling back to its test cases when attributes are missing"""
+    cases = suite.findall('.//testcase')
+    failures = sum(1 for case in cases if case.find('failure') is not None or case.find('error') is not None)
+    skipped = sum(1 for case in cases if case.find('skipped') is not None)
+    duration = suite.get('time')
+    if duration is None:
+        duration = sum(float(case.get('time') or 0) for case in cases)
+    return {
+        'name': suite.get('name'),
+        'file': suite.get('file'),
+        'hostname': suite.get('hostname'),
+        'tests': len(cases),
+        'failures': failures,
+        'skipped': skipped,
+        'duration': float(duration or 0)
+    }
+
+
+def merge_junit(paths, output_path, name='merged'):
+    """Stream the suites of several JUnit reports into one file, returning the combined totals"""
+    totals = {'tests': 0, 'failures': 0, 'skipped': 0, 'duration': 0.0}
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write(f'<testsuites name="{name}">\n')
+        for path in paths:
+            try:
+                for suite in iter_testsuites(path):
+                    summary = suite_summary(suite)
+                    for field in ('tests', 'failures', 'skipped', 'duration'):
+                        totals[field] += summary[field]
+                    suite.tail = None
+                    out.write(ET.tostring(suite, encoding='unicode'))
+                    out.write('\n')
+            except ET.ParseError as e:
+                print(f"⚠️  Skipping unreadable JUnit report {path}: {e}")
+        out.write('</testsuites>\n')
+    return totals
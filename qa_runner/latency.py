@@ -0,0 +1,326 @@
+"""
+MarketScale QA Latency - Streaming k6 metrics ingestion into mergeable percentile histograms
+"""
+import gzip
+import json
+import math
+import os
+import re
+from datetime import datetime
+
+K6_OUTPUT_DIR = 'test-results/k6'
+
+# Trend metrics get percentile histograms, rate metrics a pass/fail count
+TREND_METRICS = ('http_req_duration', 'api_response_time')
+RATE_METRICS = ('errors', 'http_req_failed')
+
+# Point tags that get their own series alongside the per-endpoint ones
+TAG_DIMENSIONS = ('status', 'group', 'scenario')
+
+PERCENTILES = (50, 90, 95, 99)
+
+OUT_JSON_PATTERN = re.compile(r"--out[= ]json=(\S+)")
+STAGES_BLOCK = re.compile(r"stages\s*:\s*\[(.*?)\]", re.S)
+STAGE_PATTERN = re.compile(r"duration\s*:\s*['\"](\d+(?:\.\d+)?)(ms|s|m|h)['\"]\s*,\s*target\s*:\s*(\d+)")
+STAGE_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+# Command-line options that replace a script's stages with a different load shape
+SHAPE_OPTIONS = ('--vus', '--duration', '--iterations', '--stage')
+# The Python load driver runs the same scripts; its arrival model changes the load shape too
+LOADGEN_MODULE = 'qa_runner.loadgen'
+LOADGEN_SHAPE_OPTIONS = ('--model', '--max-vus')
+TIME_FRACTION = re.compile(r"(\.\d{6})\d+")
+ID_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{24,})$", re.I)
+URL_PREFIX = re.compile(r"^[a-z]+://[^/]+", re.I)
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram in the style of HDR histograms, mergeable and bounded in size
+
+    Bucket i holds values in (base**(i-1), base**i] with base = 1 + precision, so every
+    quantile is within `precision` relative error however many samples are added.
+    """
+
+    MIN_VALUE = 0.001
+
+    def __init__(self, precision=0.01):
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value, count=1):
+        value = max(value, self.MIN_VALUE)
+        bucket = math.ceil(math.log(value) / self._log_base)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('Histograms with different precision cannot be merged')
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q (0-1), the midpoint of the bucket holding that rank"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                upper = math.exp(bucket * self._log_base)
+                lower = math.exp((bucket - 1) * self._log_base)
+                return min(max((lower + upper) / 2, self.min), self.max)
+        return self.max
+
+    def stats(self):
+        stats = {
+            'count': self.count,
+            'mean': round(self.total / self.count, 2) if self.count else None,
+            'min': round(self.min, 2) if self.count else None,
+            'max': round(self.max, 2) if self.count else None,
+        }
+        for percentile in PERCENTILES:
+            value = self.quantile(percentile / 100)
+            stats[f"p{percentile}"] = round(value, 2) if value is not None else None
+        return stats
+
+    def to_dict(self):
+        return {
+            'precision': self.precision,
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'counts': {str(bucket): count for bucket, count in sorted(self.counts.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['precision'])
+        histogram.counts = {int(bucket): count for bucket, count in data['counts'].items()}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+
+def k6_output_path(cmd):
+    """File a k6 command streams its --out json points to, if any"""
+    match = OUT_JSON_PATTERN.search(cmd)
+    return match.group(1) if match else None
+
+
+def k6_script(cmd):
+    """The .js script a k6 command runs"""
+    scripts = [arg for arg in cmd.split() if arg.endswith('.js')]
+    return scripts[-1] if scripts else None
+
+
+def k6_scenario(cmd):
+    """Script name plus any load-shape overrides, so differently shaped runs never share a baseline"""
+    script = k6_script(cmd)
+    name = os.path.splitext(os.path.basename(script))[0] if script else 'k6'
+    if LOADGEN_MODULE in cmd:
+        # The Python driver's numbers are not comparable with k6's
+        name = f"loadgen {name}"
+    overrides = [arg for arg in cmd.split() if arg.startswith(SHAPE_OPTIONS + LOADGEN_SHAPE_OPTIONS)]
+    return f"{name} {' '.join(overrides)}" if overrides else name
+
+
+def script_stages(script):
+    """(seconds, target) pairs from the options.stages block of a k6 script"""
+    try:
+        with open(script) as f:
+            block = STAGES_BLOCK.search(f.read())
+    except OSError:
+        return []
+    if block is None:
+        return []
+    return [(float(amount) * STAGE_UNITS[unit], int(target))
+            for amount, unit, target in STAGE_PATTERN.findall(block.group(1))]
+
+
+def stage_offsets(stages, unit='vu'):
+    """(start, end, label) offsets in seconds for a list of (seconds, target) stages"""
+    offsets = []
+    offset = 0.0
+    for index, (seconds, target) in enumerate(stages, start=1):
+        offsets.append((offset, offset + seconds, f"{index}:{target}{unit}"))
+        offset += seconds
+    return offsets
+
+
+def k6_stages(cmd):
+    """(start, end, label) offsets in seconds for the options.stages of the script a command runs"""
+    script = k6_script(cmd)
+    if script is None or any(arg.startswith(SHAPE_OPTIONS) for arg in cmd.split()):
+        return []
+    return stage_offsets(script_stages(script), 'it/s' if '--model=open' in cmd else 'vu')
+
+
+def sketch_path(output):
+    """Where the histograms folded from a k6 output file are kept"""
+    return re.sub(r"\.json(\.gz)?$", "", output) + '.sketch.json'
+
+
+def point_time(value):
+    """Epoch seconds of a k6 point timestamp (nanosecond fractions and a Z suffix allowed)"""
+    value = TIME_FRACTION.sub(r"\1", value.replace('Z', '+00:00'))
+    return datetime.fromisoformat(value).timestamp()
+
+
+def endpoint_name(tags):
+    """Method plus URL path with host and ID segments stripped, e.g. GET /api/videos/{id}"""
+    name = tags.get('name') or tags.get('url')
+    if not name:
+        return '*'
+    path = URL_PREFIX.sub('', name).split('?')[0]
+    path = '/'.join('{id}' if ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+    method = tags.get('method')
+    return f"{method} {path}" if method else path
+
+
+class K6Metrics:
+    """Constant-memory aggregation of k6 NDJSON points per metric, endpoint, tag and stage"""
+
+    def __init__(self, precision=0.01, stages=None):
+        self.precision = precision
+        self.stages = stages or []
+        self.trends = {}
+        self.rates = {}
+        self.points = 0
+        self.elapsed = 0.0
+        self.stage_seconds = {}
+
+    def _histogram(self, key):
+        if key not in self.trends:
+            self.trends[key] = LatencyHistogram(self.precision)
+        return self.trends[key]
+
+    def stage_for(self, offset):
+        for start, end, label in self.stages:
+            if start <= offset < end:
+                return label
+        return None
+
+    def add_point(self, metric, value, tags, stage=None):
+        self.points += 1
+        if metric in RATE_METRICS:
+            rate = self.rates.setdefault(metric, {'count': 0, 'hits': 0})
+            rate['count'] += 1
+            rate['hits'] += 1 if value else 0
+            return
+
+        self._histogram((metric, 'endpoint', '*')).add(value)
+        endpoint = endpoint_name(tags)
+        if endpoint != '*':
+            self._histogram((metric, 'endpoint', endpoint)).add(value)
+        for dimension in TAG_DIMENSIONS:
+            if tags.get(dimension):
+                self._histogram((metric, dimension, tags[dimension])).add(value)
+        if stage:
+            self._histogram((metric, 'stage', stage)).add(value)
+
+    def ingest(self, path):
+        """Stream a k6 --out json file (optionally gzipped) one line at a time"""
+        opener = gzip.open if path.endswith('.gz') else open
+        first = last = None
+        try:
+            with opener(path, 'rt') as f:
+                for line in f:
+                    if '"Point"' not in line:
+                        continue
+                    try:
+                        point = json.loads(line)
+                    except ValueError:
+                        continue
+                    metric = point.get('metric')
+                    if metric not in TREND_METRICS and metric not in RATE_METRICS:
+                        continue
+                    data = point.get('data', {})
+                    stage = None
+                    if data.get('time'):
+                        last = data['time']
+                        if first is None:
+                            first = point_time(last)
+                        if self.stages:
+                            stage = self.stage_for(point_time(last) - first)
+                    self.add_point(metric, data.get('value', 0), data.get('tags') or {}, stage)
+        finally:
+            if first is not None:
+                elapsed = max(point_time(last) - first, 0.0)
+                self.elapsed += elapsed
+                for start, end, label in self.stages:
+                    seconds = max(min(end, elapsed) - start, 0.0)
+                    self.stage_seconds[label] = self.stage_seconds.get(label, 0.0) + seconds
+        return self
+
+    def merge(self, other):
+        for key, histogram in other.trends.items():
+            self._histogram(key).merge(histogram)
+        for metric, rate in other.rates.items():
+            mine = self.rates.setdefault(metric, {'count': 0, 'hits': 0})
+            mine['count'] += rate['count']
+            mine['hits'] += rate['hits']
+        self.points += other.points
+        self.elapsed += other.elapsed
+        for label, seconds in other.stage_seconds.items():
+            self.stage_seconds[label] = self.stage_seconds.get(label, 0.0) + seconds
+        return self
+
+    def _throughput(self, count, seconds):
+        return round(count / seconds, 2) if seconds else None
+
+    def summary(self):
+        """Percentile tables for the JSON and HTML reports"""
+        endpoints, tags, stages = [], [], []
+        for (metric, dimension, value), histogram in sorted(self.trends.items()):
+            row = {'metric': metric}
+            if dimension == 'endpoint':
+                row.update({'endpoint': value, 'rps': self._throughput(histogram.count, self.elapsed)})
+                endpoints.append(dict(row, **histogram.stats()))
+            elif dimension == 'stage':
+                row.update({'stage': value, 'rps': self._throughput(histogram.count, self.stage_seconds.get(value))})
+                stages.append(dict(row, **histogram.stats()))
+            else:
+                row.update({'tag': dimension, 'value': value})
+                tags.append(dict(row, **histogram.stats()))
+        rates = {metric: {'count': rate['count'], 'rate': rate['hits'] / rate['count'] if rate['count'] else 0.0}
+                 for metric, rate in sorted(self.rates.items())}
+        return {'points': self.points, 'elapsed': round(self.elapsed, 2), 'endpoints': endpoints,
+                'tags': tags, 'stages': stages, 'rates': rates}
+
+    def to_dict(self):
+        return {
+            'precision': self.precision,
+            'points': self.points,
+            'elapsed': self.elapsed,
+            'stage_seconds': self.stage_seconds,
+            'trends': [[list(key), histogram.to_dict()] for key, histogram in sorted(self.trends.items())],
+            'rates': self.rates
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        metrics = cls(data['precision'])
+        metrics.points = data['points']
+        metrics.elapsed = data.get('elapsed', 0.0)
+        metrics.stage_seconds = data.get('stage_seconds', {})
+        metrics.trends = {tuple(key): LatencyHistogram.from_dict(histogram) for key, histogram in data['trends']}
+        metrics.rates = data['rates']
+        return metrics
@@ -0,0 +1,564 @@
+"""
+MarketScale QA Load Generator - asyncio HTTP load driver for the k6 scenarios, without the k6 binary
+
+Runs the flows of k6-tests/*.js as Python coroutines over pooled keep-alive connections,
+following the script's options.stages either as virtual users (closed model, like k6's
+ramping-vus) or as iterations per second (open model, like ramping-arrival-rate).
+Latencies go straight into the same mergeable histograms the k6 output is folded into.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import ssl
+import sys
+import time
+from urllib.parse import urlsplit
+
+from qa_runner.latency import K6Metrics, STAGE_UNITS, script_stages, sketch_path, stage_offsets
+
+DEFAULT_BASE_URL = 'http://localhost:8000/api'
+LOGIN = {'email': 'test@marketscale.com', 'password': 'password123'}
+
+# Seconds between checks of the stage target
+TICK = 0.05
+# Seconds virtual users get to finish their iteration once ramped down or at the end
+GRACEFUL_STOP = 30
+# Same exit code k6 uses when a threshold is crossed
+THRESHOLD_EXIT_CODE = 99
+
+STAGE_ARGUMENT = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m|h):(\d+)$")
+THRESHOLDS_BLOCK = re.compile(r"thresholds\s*:\s*\{(.*?)\n\s*\}", re.S)
+THRESHOLD_ENTRY = re.compile(r"(\w+)\s*:\s*\[([^\]]*)\]")
+THRESHOLD_EXPRESSION = re.compile(r"['\"](p\((\d+(?:\.\d+)?)\)|avg|min|max|med|rate)\s*(<=|<|>=|>)\s*(\d+(?:\.\d+)?)['\"]")
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, shared by every virtual user"""
+
+    def __init__(self, base_url, size):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.slots = asyncio.Semaphore(size)
+        self.idle = []
+        self.opened = 0
+
+    async def request(self, method, path, body=b'', headers=None):
+        """(status, body, milliseconds) for one request; the connection is kept for the next one"""
+        async with self.slots:
+            for attempt in (0, 1):
+                connection = self.idle.pop() if self.idle else None
+                reused = connection is not None
+                if connection is None:
+                    connection = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+                    # Requests go out in one write; don't let Nagle hold them back waiting for ACKs
+                    connection[1].get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self.opened += 1
+                try:
+                    status, data, keep_alive, elapsed = await self._exchange(connection, method, path, body, headers)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    connection[1].close()
+                    # The server may close an idle keep-alive connection just as it is reused
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                if keep_alive:
+                    self.idle.append(connection)
+                else:
+                    connection[1].close()
+                return status, data, elapsed
+
+    async def _exchange(self, connection, method, path, body, headers):
+        reader, writer = connection
+        lines = [f"{method} {self.prefix}{path} HTTP/1.1", f"Host: {self.netloc}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        start = time.perf_counter()
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed before the response')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        keep_alive = response_headers.get('connection', '').lower() != 'close'
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            data = b''
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            data = await reader.readexactly(int(response_headers['content-length']))
+        else:
+            data = await reader.read()
+            keep_alive = False
+        return status, data, keep_alive, (time.perf_counter() - start) * 1000
+
+    def close(self):
+        for reader, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+def _json(body):
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _created_id(body):
+    data = _json(body).get('data')
+    return data.get('id') if isinstance(data, dict) else None
+
+
+class VirtualUser:
+    """One simulated user: its requests are timed and tagged with the scenario it is running"""
+
+    def __init__(self, driver, vu, recorded=True):
+        self.driver = driver
+        self.vu = vu
+        self.token = driver.token
+        self.scenario = None
+        # Teardown traffic is not load; leaving it out keeps it from the histograms and thresholds
+        self.recorded = recorded
+
+    async def request(self, method, path, payload=None, name=None):
+        headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        body = json.dumps(payload).encode() if payload is not None else b''
+        try:
+            status, data, elapsed = await self.driver.pool.request(method, path, body, headers)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, data, elapsed = 0, b'', None
+        if self.recorded:
+            self.driver.record_request(method, path, name, status, elapsed, self.scenario)
+        if method == 'POST' and status == 201 and path.strip('/') in CREATED_RESOURCES:
+            created = _created_id(data)
+            if created is not None:
+                self.driver.created.append((path.strip('/'), created))
+        return status, data
+
+    def get(self, path, name=None):
+        return self.request('GET', path, name=name)
+
+    def post(self, path, payload=None, name=None):
+        return self.request('POST', path, payload, name=name)
+
+    def delete(self, path, name=None):
+        return self.request('DELETE', path, name=name)
+
+    def check(self, ok):
+        self.driver.metrics.add_point('errors', 0 if ok else 1, {'scenario': self.scenario})
+        return ok
+
+    async def login(self):
+        status, body = await self.post('/auth/login', LOGIN)
+        token = (_json(body).get('data') or {}).get('token') if status == 200 else None
+        if token:
+            self.token = token
+        return token
+
+
+async def video_operations(user):
+    """List videos, create one and read it back"""
+    status, body = await user.get('/videos')
+    user.check(status == 200 and _json(body).get('success'))
+    status, body = await user.post('/videos', {
+        'title': f"Stress Test Video {user.vu}_{int(time.time() * 1000)}",
+        'description': 'Stress test video description',
+        'recording_type': 'video',
+        'duration': random.randint(60, 360)
+    })
+    video_id = _created_id(body)
+    user.check(status == 201 and video_id)
+    if video_id:
+        status, body = await user.get(f"/videos/{video_id}", name='/videos/{id}')
+        user.check(status == 200 and _created_id(body) == video_id)
+
+
+async def content_request_operations(user):
+    """List content requests and create one"""
+    status, body = await user.get('/content-requests')
+    user.check(status == 200 and _json(body).get('success'))
+    status, body = await user.post('/content-requests', {
+        'title': f"Stress Test Request {user.vu}_{int(time.time() * 1000)}",
+        'description': 'Stress test content request description',
+        'type': 'video',
+        'invitees': [{'email': f"test{user.vu}@example.com", 'name': f"Test User {user.vu}"}]
+    })
+    user.check(status == 201 and _created_id(body))
+
+
+async def concurrent_operations(user):
+    """Three reads in flight at once from the same user"""
+    responses = await asyncio.gather(user.get('/videos'), user.get('/content-requests'), user.get('/videos'))
+    for status, body in responses:
+        user.check(status == 200 and _json(body).get('success'))
+
+
+async def content_approval(user):
+    """Log in, list videos, create a content request and approve it"""
+    user.check(await user.login())
+    status, body = await user.get('/videos')
+    user.check(status == 200)
+    status, body = await user.post('/content-requests', {
+        'title': f"Load Test Request {user.vu}_{int(time.time() * 1000)}",
+        'description': 'Load test content request',
+        'type': 'video',
+        'invitees': [{'email': f"test{user.vu}@example.com", 'name': f"Test User {user.vu}"}]
+    })
+    request_id = _created_id(body)
+    if user.check(status == 201 and request_id):
+        status, body = await user.post(f"/content-requests/{request_id}/approve",
+                                       name='/content-requests/{id}/approve')
+        user.check(status == 200)
+
+
+async def video_processing(user):
+    """The video-processing-load.js journey, with its one-second pauses between steps"""
+    status, body = await user.get('/videos')
+    user.check(status == 200 and _json(body).get('success'))
+    await asyncio.sleep(1)
+    status, body = await user.post('/videos', {
+        'title': f"Load Test Video {user.vu}",
+        'description': 'Load test video description',
+        'recording_type': 'video',
+        'duration': 120
+    })
+    video_id = _created_id(body)
+    user.check(status == 201 and video_id)
+    await asyncio.sleep(1)
+    if video_id:
+        status, body = await user.get(f"/videos/{video_id}", name='/videos/{id}')
+        user.check(status == 200)
+        await asyncio.sleep(1)
+    status, body = await user.get('/content-requests')
+    user.check(status == 200)
+    await asyncio.sleep(1)
+    status, body = await user.post('/content-requests', {
+        'title': f"Load Test Request {user.vu}",
+        'description': 'Load test content request',
+        'type': 'video',
+        'invitees': [{'email': f"test{user.vu}@example.com", 'name': f"Test User {user.vu}"}]
+    })
+    user.check(status == 201)
+    await asyncio.sleep(1)
+
+
+SCENARIOS = {
+    'video_operations': video_operations,
+    'content_request_operations': content_request_operations,
+    'concurrent_operations': concurrent_operations,
+    'content_approval': content_approval,
+    'video_processing': video_processing,
+}
+
+# Scenarios each k6 script picks from per iteration; the AI and analytics flows call routes the API does not have
+SCRIPT_SCENARIOS = {
+    'api-stress-test': ['video_operations', 'content_request_operations', 'concurrent_operations'],
+    'video-processing-load': ['video_processing'],
+}
+
+# Seconds of think time after each iteration, as the scripts' trailing sleep()
+SCRIPT_THINK = {'api-stress-test': 2.0, 'video-processing-load': 0.0}
+
+# Collections whose records the scenarios create; teardown deletes exactly the ones this run created
+CREATED_RESOURCES = ('videos', 'content-requests')
+
+
+def script_thresholds(script):
+    """(metric, statistic, operator, limit) thresholds from a k6 script's options"""
+    try:
+        with open(script) as f:
+            block = THRESHOLDS_BLOCK.search(f.read())
+    except OSError:
+        return []
+    if block is None:
+        return []
+    thresholds = []
+    for metric, expressions in THRESHOLD_ENTRY.findall(block.group(1)):
+        for statistic, percentile, operator, limit in THRESHOLD_EXPRESSION.findall(expressions):
+            thresholds.append((metric, f"p{percentile}" if percentile else statistic, operator, float(limit)))
+    return thresholds
+
+
+def parse_stage(value):
+    """A --stage DURATION:TARGET argument, e.g. 30s:20"""
+    match = STAGE_ARGUMENT.match(value)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"expected DURATION:TARGET such as 30s:20, got {value}")
+    amount, unit, target = match.groups()
+    return float(amount) * STAGE_UNITS[unit], int(target)
+
+
+class LoadDriver:
+    """Drives scenarios through the stages, as virtual users (closed) or iterations per second (open)"""
+
+    def __init__(self, base_url, scenarios, stages, model='closed', max_vus=200, think=0.0, connections=None):
+        self.base_url = base_url
+        self.scenarios = scenarios
+        self.stages = stages
+        self.model = model
+        self.max_vus = max_vus
+        self.think = think
+        self.connections = connections or max_vus
+        self.metrics = K6Metrics(stages=stage_offsets(stages, 'it/s' if model == 'open' else 'vu'))
+        self.pool = None
+        self.token = None
+        self.started = None
+        self.iterations = 0
+        self.dropped = 0
+        self.peak_vus = 0
+        self.created = []
+        self._vu_ids = 0
+
+    def offset(self):
+        return time.perf_counter() - self.started
+
+    def target_at(self, offset):
+        """Stage target at an offset, ramping linearly from the previous stage's; None once the stages are over"""
+        previous = 0
+        for seconds, target in self.stages:
+            if offset < seconds:
+                return previous + (target - previous) * (offset / seconds if seconds else 1)
+            offset -= seconds
+            previous = target
+        return None
+
+    def record_request(self, method, path, name, status, elapsed, scenario):
+        tags = {'method': method, 'url': f"{self.pool.prefix}{path}", 'status': str(status)}
+        if name:
+            tags['name'] = f"{self.pool.prefix}{name}"
+        if scenario:
+            tags['scenario'] = scenario
+        stage = self.metrics.stage_for(self.offset()) if self.started else None
+        if elapsed is not None:
+            self.metrics.add_point('http_req_duration', elapsed, tags, stage)
+        self.metrics.add_point('http_req_failed', 1 if status == 0 or status >= 400 else 0, tags)
+
+    async def iteration(self, user):
+        user.scenario = random.choice(self.scenarios)
+        start = time.perf_counter()
+        await SCENARIOS[user.scenario](user)
+        self.iterations += 1
+        stage = self.metrics.stage_for(self.offset())
+        self.metrics.add_point('api_response_time', (time.perf_counter() - start) * 1000,
+                               {'scenario': user.scenario}, stage)
+
+    def _new_user(self):
+        self._vu_ids += 1
+        return VirtualUser(self, self._vu_ids)
+
+    async def run(self):
+        self.pool = ConnectionPool(self.base_url, self.connections)
+        try:
+            setup = VirtualUser(self, 0)
+            self.token = await setup.login()
+            if not self.token:
+                print(f"⚠️  Login to {self.base_url} failed - requests run unauthenticated")
+            self.started = time.perf_counter()
+            if self.model == 'open':
+                await self._open_model()
+            else:
+                await self._closed_model()
+            elapsed = self.offset()
+            await self.teardown()
+        finally:
+            self.pool.close()
+
+        self.metrics.elapsed = elapsed
+        for start, end, label in self.metrics.stages:
+            self.metrics.stage_seconds[label] = max(min(end, elapsed) - start, 0.0)
+        return self.metrics
+
+    async def _user_loop(self, user, stop):
+        while not stop.is_set():
+            await self.iteration(user)
+            if self.think:
+                try:
+                    await asyncio.wait_for(stop.wait(), random.uniform(0, self.think))
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _closed_model(self):
+        """Start and stop virtual users to follow the stage targets; stopped users finish their iteration"""
+        users = []
+        while True:
+            target = self.target_at(self.offset())
+            if target is None:
+                break
+            wanted = min(round(target), self.max_vus)
+            while len(users) < wanted:
+                stop = asyncio.Event()
+                users.append((asyncio.ensure_future(self._user_loop(self._new_user(), stop)), stop))
+            while len(users) > wanted:
+                users.pop()[1].set()
+            self.peak_vus = max(self.peak_vus, len(users))
+            # A user whose iteration raised is replaced on the next tick
+            users = [(task, stop) for task, stop in users if not task.done()]
+            await asyncio.sleep(TICK)
+        for task, stop in users:
+            stop.set()
+        await self._drain([task for task, stop in users])
+
+    async def _open_model(self):
+        """Start iterations at the stage's arrival rate whatever the response times; late ones are dropped"""
+        running = set()
+        # Arrivals owed so far: the integral of the (ramping) rate, so spacing follows the rate as it changes
+        owed = 0.0
+        previous = 0.0
+        while True:
+            offset = self.offset()
+            rate = self.target_at(offset)
+            if rate is None:
+                break
+            owed += rate * (offset - previous)
+            previous = offset
+            while owed >= 1:
+                owed -= 1
+                if len(running) >= self.max_vus:
+                    self.dropped += 1
+                    continue
+                task = asyncio.ensure_future(self.iteration(self._new_user()))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            self.peak_vus = max(self.peak_vus, len(running))
+            await asyncio.sleep(min((1 - owed) / rate, TICK) if rate > 0 else TICK)
+        await self._drain(list(running))
+
+    async def _drain(self, tasks):
+        if not tasks:
+            return
+        done, unfinished = await asyncio.wait(tasks, timeout=GRACEFUL_STOP)
+        for task in unfinished:
+            task.cancel()
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                print(f"⚠️  An iteration failed: {task.exception()!r}")
+
+    async def teardown(self):
+        """Delete the videos and content requests this run's scenarios created, by the ids they got back"""
+        if not self.token:
+            return
+        cleaner = VirtualUser(self, 0, recorded=False)
+        created, self.created = self.created, []
+        # The pool bounds how many deletes are in flight at once
+        deleted = await asyncio.gather(*(cleaner.delete(f"/{resource}/{record_id}")
+                                         for resource, record_id in created))
+        left = sum(1 for status, body in deleted if status not in (200, 204, 404))
+        if left:
+            print(f"⚠️  Teardown could not delete {left} of {len(created)} records it created")
+
+    def check_thresholds(self, thresholds):
+        """Thresholds that were crossed, as readable strings"""
+        crossed = []
+        for metric, statistic, operator, limit in thresholds:
+            if metric in self.metrics.rates:
+                rate = self.metrics.rates[metric]
+                value = rate['hits'] / rate['count'] if rate['count'] else 0.0
+            elif (metric, 'endpoint', '*') in self.metrics.trends:
+                histogram = self.metrics.trends[(metric, 'endpoint', '*')]
+                if statistic.startswith('p'):
+                    value = histogram.quantile(float(statistic[1:]) / 100)
+                elif statistic == 'med':
+                    value = histogram.quantile(0.5)
+                elif statistic == 'avg':
+                    value = histogram.total / histogram.count if histogram.count else None
+                else:
+                    value = getattr(histogram, statistic)
+            else:
+                continue
+            if value is None:
+                continue
+            passed = {'<': value < limit, '<=': value <= limit, '>': value > limit, '>=': value >= limit}[operator]
+            if not passed:
+                crossed.append(f"{metric} {statistic}={value:.3f} (wanted {operator} {limit:g})")
+        return crossed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a k6 script\'s scenarios with the Python load driver')
+    parser.add_argument('script', help='k6 script whose stages, thresholds and scenarios are used')
+    parser.add_argument('--out', default=None,
+                        help='k6-style json=PATH; the histograms are written to PATH\'s .sketch.json')
+    parser.add_argument('--model', choices=['closed', 'open'], default='closed',
+                        help='closed: stage targets are virtual users; open: they are iterations per second')
+    parser.add_argument('--stage', action='append', type=parse_stage, default=None,
+                        help='DURATION:TARGET stage replacing the script\'s stages (repeatable)')
+    parser.add_argument('--max-vus', type=int, default=200,
+                        help='Cap on concurrent virtual users; open-model arrivals past it are dropped')
+    parser.add_argument('--connections', type=int, default=None,
+                        help='Keep-alive connections in the pool (defaults to --max-vus)')
+    parser.add_argument('--think', type=float, default=None,
+                        help='Longest random pause after each iteration in the closed model')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append', default=None,
+                        help='Scenario to run instead of the script\'s own (repeatable)')
+    parser.add_argument('--base-url', default=os.environ.get('API_BASE_URL', DEFAULT_BASE_URL))
+    args = parser.parse_args()
+
+    name = os.path.splitext(os.path.basename(args.script))[0]
+    scenarios = args.scenario or SCRIPT_SCENARIOS.get(name)
+    if not scenarios:
+        parser.error(f"No Python scenarios for {args.script}; pass --scenario")
+    stages = args.stage or script_stages(args.script)
+    if not stages:
+        parser.error(f"{args.script} has no options.stages; pass --stage")
+    think = args.think if args.think is not None else SCRIPT_THINK.get(name, 0.0)
+    if args.model == 'open':
+        think = 0.0
+
+    driver = LoadDriver(args.base_url, scenarios, stages, args.model, args.max_vus, think, args.connections)
+    print(f"🏋️  {name}: {args.model} model, {len(stages)} stages over {sum(s for s, t in stages):.0f}s "
+          f"against {args.base_url}")
+    metrics = asyncio.run(driver.run())
+
+    summary = metrics.summary()
+    overall = next((row for row in summary['endpoints']
+                    if row['metric'] == 'http_req_duration' and row['endpoint'] == '*'), None)
+    # Requests that never got a response have no duration but still count
+    requests = metrics.rates.get('http_req_failed', {}).get('count', 0)
+    print(f"   {requests} requests, {driver.iterations} iterations in {metrics.elapsed:.1f}s "
+          f"({requests / metrics.elapsed if metrics.elapsed else 0:.1f} req/s), peak {driver.peak_vus} VUs, "
+          f"{driver.pool.opened} connections opened, {driver.dropped} iterations dropped")
+    if overall:
+        print(f"   http_req_duration p50 {overall['p50']} | p90 {overall['p90']} | p95 {overall['p95']} | "
+              f"p99 {overall['p99']} ms")
+
+    if args.out:
+        output = args.out.split('=', 1)[-1]
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(sketch_path(output), 'w') as f:
+            json.dump(metrics.to_dict(), f)
+
+    crossed = driver.check_thresholds(script_thresholds(args.script))
+    for threshold in crossed:
+        print(f"   ✗ threshold crossed: {threshold}")
+    sys.exit(THRESHOLD_EXIT_CODE if crossed else 0)
+
+
+if __name__ == '__main__':
+    main()
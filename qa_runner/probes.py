@@ -0,0 +1,148 @@
+"""
+MarketScale QA Tool Probes - Concurrent, cached version checks for the toolchain
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import signal
+import time
+
+PROBE_CACHE = os.path.join('.qa-cache', 'tool-probes.json')
+NODE_LOCKFILE = os.path.join('node_modules', '.package-lock.json')
+NODE_BIN = os.path.join('node_modules', '.bin')
+
+TOOL_PROBES = {
+    'node': ['node', '--version'],
+    'npm': ['npm', '--version'],
+    'php': ['php', '--version'],
+    'composer': ['composer', '--version'],
+    'k6': ['k6', 'version'],
+    'python': ['python3', '--version'],
+    'cypress': ['npx', 'cypress', '--version'],
+    'playwright': ['npx', 'playwright', '--version'],
+    'vite': ['npx', 'vite', '--version'],
+}
+
+# Seconds every probe together may take; stragglers are killed and reported as timed out
+PROBE_DEADLINE = 30
+
+
+def _stamp(path):
+    """Resolved path, mtime and size of a file, or None when it is missing"""
+    if path is None or not os.path.exists(path):
+        return None
+    real = os.path.realpath(path)
+    stat = os.stat(real)
+    return [real, stat.st_mtime_ns, stat.st_size]
+
+
+def probe_key(argv):
+    """Cache key for a probe: PATH plus the binaries and lockfile that decide its answer"""
+    parts = {
+        'argv': argv,
+        'path': os.environ.get('PATH', ''),
+        'binary': _stamp(shutil.which(argv[0])),
+    }
+    if argv[0] == 'npx':
+        parts['lockfile'] = _stamp(NODE_LOCKFILE)
+        parts['package'] = _stamp(os.path.join(NODE_BIN, argv[1]))
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, entries):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.partial"
+    with open(partial, 'w') as f:
+        json.dump(entries, f, indent=2)
+    os.replace(partial, path)
+
+
+async def _run_probe(name, argv, deadline):
+    """Run one probe, killing its process group if the shared deadline passes"""
+    loop = asyncio.get_running_loop()
+    start = time.time()
+    result = {'name': name, 'command': ' '.join(argv), 'cached': False, 'timed_out': False}
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            stdin=asyncio.subprocess.DEVNULL,
+            start_new_session=True
+        )
+    except OSError as e:
+        result.update({'success': False, 'returncode': 127, 'version': None, 'output': '', 'error': str(e),
+                       'duration': time.time() - start})
+        return result
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), max(deadline - loop.time(), 0))
+    except asyncio.TimeoutError:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        await process.wait()
+        result.update({'success': False, 'returncode': process.returncode, 'version': None, 'output': '',
+                       'error': 'Probe did not finish before the deadline', 'timed_out': True,
+                       'duration': time.time() - start})
+        return result
+
+    output = stdout.decode(errors='replace')
+    success = process.returncode == 0
+    lines = output.strip().splitlines()
+    result.update({
+        'success': success,
+        'returncode': process.returncode,
+        'version': lines[0].strip() if success and lines else None,
+        'output': output,
+        'error': None if success else stderr.decode(errors='replace'),
+        'duration': time.time() - start
+    })
+    return result
+
+
+async def _run_probes(probes, timeout):
+    deadline = asyncio.get_running_loop().time() + timeout
+    results = await asyncio.gather(*(_run_probe(name, argv, deadline) for name, argv in probes.items()))
+    return {result['name']: result for result in results}
+
+
+def probe_tools(names, timeout=PROBE_DEADLINE, cache_path=PROBE_CACHE, use_cache=True):
+    """Version-check tools concurrently, answering unchanged ones from the probe cache
+
+    Returns one result dict per name, in the order given.
+    """
+    probes = {name: TOOL_PROBES[name] for name in names}
+    keys = {name: probe_key(argv) for name, argv in probes.items()}
+    cache = _load_cache(cache_path) if use_cache else {}
+
+    results = {}
+    for name in names:
+        entry = cache.get(name)
+        if entry and entry['key'] == keys[name]:
+            results[name] = dict(entry['result'], cached=True, duration=0.0)
+
+    missing = {name: argv for name, argv in probes.items() if name not in results}
+    if missing:
+        fresh = asyncio.run(_run_probes(missing, timeout))
+        results.update(fresh)
+        # Timeouts say more about the machine than the toolchain, so they are retried next time
+        cache.update({name: {'key': keys[name], 'result': result}
+                      for name, result in fresh.items() if not result['timed_out']})
+        try:
+            _save_cache(cache_path, cache)
+        except OSError:
+            pass
+
+    return {name: results[name] for name in names}
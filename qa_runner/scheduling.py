@@ -0,0 +1,219 @@
+"""
+MarketScale QA Scheduling - Duration history and longest-job-first planning
+"""
+import heapq
+import json
+import os
+
+# Fallback estimates (seconds) for commands that have never been run
+DEFAULT_ESTIMATES = {
+    'load': 16 * 60,
+    'stress': 15 * 60,
+    'e2e': 120,
+    'api': 60,
+    'unit': 30,
+    'feature': 60,
+    'contract': 30,
+    'integration': 90,
+    'regression': 180,
+    'security': 60,
+    'a11y': 120,
+    'workflow': 180,
+    'lighthouse': 60,
+    'health': 5,
+}
+
+DEFAULT_ESTIMATE = 60
+
+
+class DurationHistory:
+    """Per-command duration history learned from past test-report.json runs"""
+
+    def __init__(self, path='test-results/duration-history.json', alpha=0.3):
+        self.path = path
+        self.alpha = alpha
+        self.commands = {}
+        self.ingested_reports = []
+        self.load()
+
+    def load(self):
+        """Load the persisted history, starting empty if it is missing or corrupt"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.commands = data.get('commands', {})
+            self.ingested_reports = data.get('ingested_reports', [])
+        except (OSError, ValueError):
+            self.commands = {}
+            self.ingested_reports = []
+
+    def save(self):
+        """Persist the history next to the test reports"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump({
+                'commands': self.commands,
+                'ingested_reports': self.ingested_reports[-20:]
+            }, f, indent=2)
+
+    def update(self, command, duration):
+        """Fold one observed duration into the command's moving average"""
+        entry = self.commands.get(command)
+        if entry is None:
+            self.commands[command] = {'ewma': duration, 'last': duration, 'runs': 1}
+            return
+        entry['ewma'] = self.alpha * duration + (1 - self.alpha) * entry['ewma']
+        entry['last'] = duration
+        entry['runs'] += 1
+
+    def update_resources(self, command, resources):
+        """Fold the CPU cores and peak memory a run used into the command's moving averages"""
+        entry = self.commands.get(command)
+        if entry is None:
+            return
+        for field, value in (('cores', resources.get('avg_cores')), ('mem_mb', resources.get('peak_rss_mb'))):
+            if value is not None:
+                previous = entry.get(field)
+                entry[field] = value if previous is None else self.alpha * value + (1 - self.alpha) * previous
+
+    def ingest_report(self, report_path='test-results/test-report.json'):
+        """Learn durations from a test report, skipping reports already ingested"""
+        try:
+            with open(report_path) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        report_id = report.get('timestamp')
+        if not report_id or report_id in self.ingested_reports:
+            return False
+
+        merged_runs = {}
+        for result in report.get('test_results', {}).values():
+            command = result.get('command')
+            # Replayed, skipped, cancelled and timed-out runs say nothing about how long a command takes
+            if command and not any(result.get(flag) for flag in ('cached', 'skipped', 'cancelled', 'timed_out')):
+                self.update(command, result['duration'])
+                # A failed run often dies early and says little about what the suite really needs
+                if result.get('resources') and result.get('success'):
+                    self.update_resources(command, result['resources'])
+                # Every project of a coalesced Playwright run carries the merged command's own numbers
+                if result.get('coalesced'):
+                    merged = merged_runs.setdefault(result['coalesced']['command'], dict(result['coalesced'], success=True))
+                    merged['success'] = merged['success'] and result.get('success')
+
+        for command, merged in merged_runs.items():
+            self.update(command, merged['duration'])
+            if merged.get('resources') and merged['success']:
+                self.update_resources(command, merged['resources'])
+
+        self.ingested_reports.append(report_id)
+        return True
+
+    def estimate(self, command, test_type=None):
+        """Predicted duration of a command in seconds"""
+        entry = self.commands.get(command)
+        if entry is not None:
+            return entry['ewma']
+        return DEFAULT_ESTIMATES.get(test_type, DEFAULT_ESTIMATE)
+
+    def resource_cost(self, command):
+        """Learned (cores, MB) of a command, or None for either it has never reported"""
+        entry = self.commands.get(command, {})
+        return entry.get('cores'), entry.get('mem_mb')
+
+
+class Job:
+    """A command in the run queue, with the jobs that must pass before it starts"""
+
+    def __init__(self, job_id, command, deps=()):
+        self.id = job_id
+        self.command = command
+        self.deps = set(deps)
+        self.estimate = DEFAULT_ESTIMATE
+        self.rank = 0.0
+        self.predicted_finish = None
+        self.cache_key = None
+        self.cached_result = None
+        self.worker = None
+        self.cpu_cost = 1.0
+        self.mem_cost = 0.0
+        self.blocking = True
+        self.retry_of = None
+        self.attempt = 0
+        self.result = None
+
+    @property
+    def cmd(self):
+        return self.command[0]
+
+    @property
+    def tier(self):
+        return self.command[2]
+
+    @property
+    def test_type(self):
+        return self.command[3]
+
+
+def topological_order(jobs):
+    """Order jobs so every job comes after its dependencies"""
+    by_id = {job.id: job for job in jobs}
+    remaining = {job.id: len(job.deps & by_id.keys()) for job in jobs}
+    children = {job.id: [] for job in jobs}
+    for job in jobs:
+        for dep in job.deps & by_id.keys():
+            children[dep].append(job)
+
+    ready = [job for job in jobs if remaining[job.id] == 0]
+    ordered = []
+    while ready:
+        job = ready.pop()
+        ordered.append(job)
+        for child in children[job.id]:
+            remaining[child.id] -= 1
+            if remaining[child.id] == 0:
+                ready.append(child)
+
+    if len(ordered) != len(jobs):
+        raise ValueError("Job graph contains a dependency cycle")
+    return ordered
+
+
+def assign_ranks(jobs):
+    """Rank each job by its estimate plus the longest chain of work waiting on it"""
+    children = {job.id: [] for job in jobs}
+    for job in jobs:
+        for dep in job.deps:
+            if dep in children:
+                children[dep].append(job)
+
+    for job in reversed(topological_order(jobs)):
+        job.rank = job.estimate + max((child.rank for child in children[job.id]), default=0.0)
+
+
+def simulate_schedule(jobs, workers, priority):
+    """
+    Simulate list scheduling of a job graph onto a worker pool, assuming
+    every job passes. Sets predicted_finish on each job and returns the makespan.
+    """
+    workers = max(1, workers)
+    pending = sorted(jobs, key=priority)
+    done = set()
+    running = []
+    now = 0.0
+
+    while pending or running:
+        for job in [j for j in pending if j.deps <= done]:
+            if len(running) >= workers:
+                break
+            pending.remove(job)
+            job.predicted_finish = now + job.estimate
+            heapq.heappush(running, (job.predicted_finish, job.id))
+
+        if not running:
+            break
+        now, job_id = heapq.heappop(running)
+        done.add(job_id)
+
+    return now
@@ -0,0 +1,126 @@
+"""
+MarketScale QA Server Pool - Isolated Laravel servers with per-worker SQLite databases
+"""
+import os
+import signal
+import socket
+import subprocess
+import time
+
+from qa_runner.fixtures import DB_DIR, SQLITE_SIDE_FILES, GoldenDatabase, sqlite_env
+
+# URL baked into the suites for the shared development server
+DEFAULT_APP_URL = 'http://localhost:8000'
+
+
+class AppInstance:
+    """One `php artisan serve` process bound to its own port and database copy"""
+
+    def __init__(self, index, host, port, database):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.database = database
+        self.process = None
+        self.started_at = None
+        self.ready_at = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def env(self):
+        """Variables that point every tool at this instance"""
+        return dict(sqlite_env(self.database), **{
+            'APP_URL': self.url,
+            'CYPRESS_baseUrl': self.url,
+            'CYPRESS_API_BASE_URL': f"{self.url}/api",
+            'PLAYWRIGHT_BASE_URL': self.url,
+            'API_BASE_URL': f"{self.url}/api",
+        })
+
+    def adapt_command(self, cmd):
+        """Rewrite a command's hard-coded server URL and tool options for this instance"""
+        cmd = cmd.replace(DEFAULT_APP_URL, self.url)
+        if cmd.startswith('newman ') or ' newman ' in cmd:
+            cmd += f" --env-var baseUrl={self.url}/api"
+        return cmd
+
+    def start(self, golden, method='auto'):
+        self.started_at = time.time()
+        golden.restore(self.database, method)
+        self.process = subprocess.Popen(
+            ['php', 'artisan', 'serve', f'--host={self.host}', f'--port={self.port}'],
+            env=dict(os.environ, **self.env),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+
+    def ready(self):
+        try:
+            with socket.create_connection((self.host, self.port), timeout=0.5):
+                return True
+        except OSError:
+            return False
+
+    def stop(self, grace=5):
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            self.process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.process.pid, signal.SIGKILL)
+            self.process.wait()
+        except ProcessLookupError:
+            pass
+        self.process = None
+
+
+class AppServerPool:
+    """Pool of app instances on distinct ports, one per worker slot"""
+
+    def __init__(self, base_port=8100, host='127.0.0.1', startup_timeout=30, golden=None, restore_method='auto'):
+        self.base_port = base_port
+        self.host = host
+        self.startup_timeout = startup_timeout
+        self.golden = golden or GoldenDatabase()
+        self.restore_method = restore_method
+        self.instances = []
+
+    def ensure(self, size):
+        """Start instances until the pool has at least size of them"""
+        if len(self.instances) >= size:
+            return
+        self.golden.ensure()
+
+        os.makedirs(DB_DIR, exist_ok=True)
+        started = []
+        for index in range(len(self.instances), size):
+            instance = AppInstance(index, self.host, self.base_port + index,
+                                   os.path.join(DB_DIR, f"worker-{index}.sqlite"))
+            instance.start(self.golden, self.restore_method)
+            started.append(instance)
+            self.instances.append(instance)
+
+        deadline = time.time() + self.startup_timeout
+        while True:
+            for instance in started:
+                if instance.ready_at is None and instance.ready():
+                    instance.ready_at = time.time()
+            if all(instance.ready_at for instance in started):
+                break
+            if time.time() > deadline:
+                raise RuntimeError(f"App servers did not start within {self.startup_timeout}s")
+            time.sleep(0.2)
+
+    def stop(self):
+        """Tear down every instance and its database copy"""
+        for instance in self.instances:
+            instance.stop()
+            for path in [instance.database] + [instance.database + suffix for suffix in SQLITE_SIDE_FILES]:
+                if os.path.exists(path):
+                    os.remove(path)
+        self.instances = []
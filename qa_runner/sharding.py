@@ -0,0 +1,112 @@
+"""
+MarketScale QA Sharding - Split Cypress and Playwright specs into duration-balanced shards
+"""
+import glob
+import heapq
+import os
+import shlex
+
+from qa_runner.junit import iter_testsuites, suite_summary
+
+CYPRESS_SPEC_GLOB = 'cypress/e2e/**/*.cy.js'
+PLAYWRIGHT_SPEC_GLOBS = ('playwright-tests/**/*.spec.js', 'playwright-tests/**/*.spec.ts')
+PLAYWRIGHT_TEST_DIR = 'playwright-tests'
+
+SHARD_DIR = os.path.join('test-results', 'shards')
+
+# Estimate for specs that have never been timed
+DEFAULT_SPEC_ESTIMATE = 60
+
+
+def discover_specs(patterns):
+    """Spec files matching the given glob patterns, sorted for stable sharding"""
+    if isinstance(patterns, str):
+        patterns = (patterns,)
+    specs = set()
+    for pattern in patterns:
+        specs.update(path.replace(os.sep, '/') for path in glob.glob(pattern, recursive=True))
+    return sorted(specs)
+
+
+def balance_shards(specs, shard_count, estimate):
+    """Pack specs into at most shard_count shards, longest first onto the lightest shard"""
+    shard_count = max(1, min(shard_count, len(specs)))
+    shards = [(0.0, index, []) for index in range(shard_count)]
+    heapq.heapify(shards)
+    for spec in sorted(specs, key=lambda spec: (-estimate(spec), spec)):
+        load, index, members = heapq.heappop(shards)
+        members.append(spec)
+        heapq.heappush(shards, (load + estimate(spec), index, members))
+    return [sorted(members) for _, _, members in sorted(shards, key=lambda shard: shard[1]) if members]
+
+
+def cypress_history_key(spec):
+    return f"spec:cypress:{spec}"
+
+
+def playwright_history_key(project, spec):
+    return f"spec:playwright:{project}:{spec}"
+
+
+def cypress_specs(cmd):
+    """Spec paths passed to a Cypress command via --spec"""
+    argv = shlex.split(cmd)
+    if 'cypress' not in argv or '--spec' not in argv:
+        return None
+    return argv[argv.index('--spec') + 1].split(',')
+
+
+def playwright_project(cmd):
+    """(project, explicit specs) for a plain per-project Playwright command, else None"""
+    argv = shlex.split(cmd)
+    if 'playwright' not in argv or 'test' not in argv:
+        return None
+    if any(arg.startswith('--grep') for arg in argv):
+        return None
+    projects = [arg.split('=', 1)[1] for arg in argv if arg.startswith('--project=')]
+    if len(projects) != 1:
+        return None
+    specs = [arg for arg in argv if arg.startswith(PLAYWRIGHT_TEST_DIR + '/')]
+    return projects[0], specs
+
+
+def cypress_shard_command(specs, shard):
+    """Cypress invocation for one shard, writing one JUnit file per spec"""
+    report = os.path.join(SHARD_DIR, f"cypress-{shard}", 'results-[hash].xml')
+    return (f"npx cypress run --spec {shlex.quote(','.join(specs))} --headless "
+            f"--reporter junit --reporter-options {shlex.quote('mochaFile=' + report)}")
+
+
+def playwright_shard_command(project, specs, shard):
+    """Playwright invocation for one shard of a project, with JUnit and JSON output"""
+    slug = project.lower().replace(' ', '-')
+    junit = os.path.join(SHARD_DIR, f"playwright-{slug}-{shard}.xml")
+    json_report = os.path.join(SHARD_DIR, f"playwright-{slug}-{shard}.json")
+    return (f"env PLAYWRIGHT_JUNIT_OUTPUT_NAME={shlex.quote(junit)} "
+            f"PLAYWRIGHT_JSON_OUTPUT_NAME={shlex.quote(json_report)} "
+            f"npx playwright test --project={shlex.quote(project)} {' '.join(shlex.quote(spec) for spec in specs)} "
+            f"--reporter=junit,json")
+
+
+def collect_spec_timings():
+    """Per-spec results from the shard JUnit reports, as (tool, project, spec, summary) tuples"""
+    timings = []
+
+    for path in sorted(glob.glob(os.path.join(SHARD_DIR, 'cypress-*', '*.xml'))):
+        spec = None
+        totals = {'tests': 0, 'failures': 0, 'skipped': 0, 'duration': 0.0}
+        for suite in iter_testsuites(path):
+            summary = suite_summary(suite)
+            spec = spec or summary['file']
+            for field in totals:
+                totals[field] += summary[field]
+        if spec:
+            timings.append(('cypress', None, spec, totals))
+
+    for path in sorted(glob.glob(os.path.join(SHARD_DIR, 'playwright-*.xml'))):
+        for suite in iter_testsuites(path):
+            summary = suite_summary(suite)
+            spec = f"{PLAYWRIGHT_TEST_DIR}/{summary['name']}"
+            timings.append(('playwright', summary['hostname'], spec, summary))
+
+    return timings
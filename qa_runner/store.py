@@ -0,0 +1,311 @@
+"""
+MarketScale QA Results Store - Append-only SQLite history of every command run by every entry point
+"""
+import argparse
+import os
+import re
+import sqlite3
+import statistics
+import time
+import uuid
+from datetime import datetime
+
+from qa_runner.baseline import current_commit
+
+RESULTS_DB = os.path.join('test-results', 'results.sqlite')
+
+# Buffered rows are written in one transaction once this many are waiting
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    entry_point TEXT NOT NULL,
+    label TEXT,
+    commit_sha TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    total INTEGER NOT NULL,
+    failed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_commit ON runs (commit_sha);
+
+CREATE TABLE IF NOT EXISTS executions (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    entry_point TEXT NOT NULL,
+    commit_sha TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    name TEXT NOT NULL,
+    command TEXT,
+    component TEXT,
+    tier TEXT,
+    test_type TEXT,
+    success INTEGER NOT NULL,
+    returncode INTEGER,
+    duration REAL NOT NULL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    timed_out INTEGER NOT NULL DEFAULT 0,
+    worker INTEGER
+);
+CREATE INDEX IF NOT EXISTS executions_command ON executions (command, finished_at);
+CREATE INDEX IF NOT EXISTS executions_tier ON executions (tier, finished_at);
+CREATE INDEX IF NOT EXISTS executions_component ON executions (component, finished_at);
+CREATE INDEX IF NOT EXISTS executions_commit ON executions (commit_sha);
+CREATE INDEX IF NOT EXISTS executions_finished ON executions (finished_at);
+CREATE INDEX IF NOT EXISTS executions_run ON executions (run_id);
+
+CREATE TABLE IF NOT EXISTS test_cases (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    commit_sha TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    tool TEXT NOT NULL,
+    suite TEXT,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS test_cases_name ON test_cases (tool, suite, name, finished_at);
+CREATE INDEX IF NOT EXISTS test_cases_run ON test_cases (run_id);
+CREATE INDEX IF NOT EXISTS test_cases_duration ON test_cases (run_id, duration);
+"""
+
+EXECUTION_COLUMNS = ('run_id', 'entry_point', 'commit_sha', 'finished_at', 'name', 'command', 'component',
+                     'tier', 'test_type', 'success', 'returncode', 'duration', 'cached', 'timed_out', 'worker')
+TEST_CASE_COLUMNS = ('run_id', 'commit_sha', 'finished_at', 'tool', 'suite', 'name', 'status', 'duration')
+
+RELATIVE_TIME = re.compile(r"^(\d+)([mhdw])$")
+RELATIVE_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+class ResultsStore:
+    """One run's worth of buffered, batch-inserted rows in the shared results database"""
+
+    def __init__(self, entry_point, label=None, path=RESULTS_DB):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.run_id = uuid.uuid4().hex
+        self.entry_point = entry_point
+        self.label = label
+        self.commit = current_commit()
+        self.started_at = time.time()
+        self.total = 0
+        self.failed = 0
+        self._pending = {'executions': [], 'test_cases': []}
+
+    def add_execution(self, name, result):
+        """Buffer one command execution from a result dict"""
+        self.total += 1
+        self.failed += 0 if result['success'] else 1
+        row = {
+            'run_id': self.run_id,
+            'entry_point': self.entry_point,
+            'commit_sha': self.commit,
+            'finished_at': result.get('finished_at') or time.time(),
+            'name': name,
+            'command': result.get('command'),
+            'component': result.get('component'),
+            'tier': result.get('tier'),
+            'test_type': result.get('test_type') or result.get('type'),
+            'success': int(bool(result['success'])),
+            'returncode': result.get('returncode'),
+            'duration': result.get('duration') or 0.0,
+            'cached': int(bool(result.get('cached'))),
+            'timed_out': int(bool(result.get('timed_out'))),
+            'worker': result.get('worker'),
+        }
+        self._buffer('executions', tuple(row[column] for column in EXECUTION_COLUMNS))
+
+    def add_test_case(self, tool, suite, name, status, duration):
+        """Buffer one test case reported by a tool"""
+        self._buffer('test_cases', (self.run_id, self.commit, time.time(), tool, suite, name, status, duration))
+
+    def _buffer(self, table, row):
+        self._pending[table].append(row)
+        if len(self._pending[table]) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered row in a single transaction"""
+        with self.db:
+            for table, columns in (('executions', EXECUTION_COLUMNS), ('test_cases', TEST_CASE_COLUMNS)):
+                if self._pending[table]:
+                    self.db.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        self._pending[table]
+                    )
+                    self._pending[table] = []
+
+    def close(self):
+        """Flush the remaining rows and append the run itself"""
+        self.flush()
+        with self.db:
+            self.db.execute(
+                "INSERT INTO runs (run_id, entry_point, label, commit_sha, started_at, finished_at, total, failed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, self.entry_point, self.label, self.commit, self.started_at, time.time(),
+                 self.total, self.failed)
+            )
+        self.db.close()
+
+
+def record_results(entry_point, results, label=None, path=RESULTS_DB):
+    """Append a whole run of name -> result dicts, the usual way an entry point records itself"""
+    try:
+        store = ResultsStore(entry_point, label, path)
+        for name, result in results.items():
+            store.add_execution(name, result)
+        store.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  Could not record results in {path}: {e}")
+
+
+def parse_time(value):
+    """Epoch seconds from an ISO date/time or a relative age such as 30m, 12h, 7d or 2w"""
+    match = RELATIVE_TIME.match(value)
+    if match:
+        return time.time() - int(match.group(1)) * RELATIVE_UNITS[match.group(2)]
+    return datetime.fromisoformat(value).timestamp()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def query_executions(db, command=None, tier=None, component=None, commit=None, since=None, until=None,
+                     entry_point=None, runs=None, limit=None):
+    """Executions matching the filters, newest first"""
+    clauses, params = [], []
+    for column, value in (('tier', tier), ('component', component), ('entry_point', entry_point)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if command:
+        clauses.append("command LIKE ?")
+        params.append(f"%{command}%")
+    if commit:
+        clauses.append("commit_sha LIKE ?")
+        params.append(f"{commit}%")
+    if since:
+        clauses.append("finished_at >= ?")
+        params.append(parse_time(since))
+    if until:
+        clauses.append("finished_at <= ?")
+        params.append(parse_time(until))
+    if runs:
+        clauses.append("run_id IN (SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?)")
+        params.append(runs)
+
+    sql = "SELECT * FROM executions"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY finished_at DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    db.row_factory = sqlite3.Row
+    return [dict(row) for row in db.execute(sql, params)]
+
+
+def command_trends(executions, slowest=10):
+    """Per-command duration percentiles and failure rates, slowest median first"""
+    by_command = {}
+    for execution in executions:
+        if execution['cached']:
+            continue
+        by_command.setdefault(execution['command'] or execution['name'], []).append(execution)
+
+    trends = []
+    for command, rows in by_command.items():
+        durations = [row['duration'] for row in rows]
+        trends.append({
+            'command': command,
+            'runs': len(rows),
+            'failures': sum(1 for row in rows if not row['success']),
+            'p50': statistics.median(durations),
+            'p90': percentile(durations, 0.90),
+            'p95': percentile(durations, 0.95),
+            'max': max(durations),
+        })
+    trends.sort(key=lambda trend: -trend['p50'])
+    return trends[:slowest]
+
+
+def test_trends(db, runs=20, slowest=10, tool=None):
+    """Slowest individual tests by average duration over the last runs, aggregated in SQLite"""
+    sql = ("SELECT tool, suite, name, COUNT(*) AS runs, AVG(duration) AS avg, MAX(duration) AS max, "
+           "SUM(status = 'failed') AS failures, SUM(status = 'flaky') AS flaky FROM test_cases "
+           "WHERE run_id IN (SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?) AND status != 'skipped'")
+    params = [runs]
+    if tool:
+        sql += " AND tool = ?"
+        params.append(tool)
+    sql += " GROUP BY tool, suite, name ORDER BY avg DESC LIMIT ?"
+    params.append(slowest)
+    db.row_factory = sqlite3.Row
+    return [dict(row) for row in db.execute(sql, params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MarketScale QA results history')
+    subcommands = parser.add_subparsers(dest='action', required=True)
+    for name, help_text in (('trends', 'Slowest commands and duration percentiles over recent runs'),
+                            ('query', 'List matching command executions')):
+        sub = subcommands.add_parser(name, help=help_text)
+        sub.add_argument('--db', default=RESULTS_DB)
+        sub.add_argument('--command', help='Substring of the command line')
+        sub.add_argument('--tier')
+        sub.add_argument('--component')
+        sub.add_argument('--commit', help='Commit SHA or prefix')
+        sub.add_argument('--entry-point', choices=['tiered', 'simple', 'demo', 'comprehensive'])
+        sub.add_argument('--since', help='ISO date/time or age such as 7d')
+        sub.add_argument('--until', help='ISO date/time or age such as 1d')
+    subcommands.choices['trends'].add_argument('--last', type=int, default=20, help='Number of recent runs')
+    subcommands.choices['trends'].add_argument('--slowest', type=int, default=10)
+    subcommands.choices['query'].add_argument('--limit', type=int, default=50)
+    tests = subcommands.add_parser('tests', help='Slowest individual tests over recent runs')
+    tests.add_argument('--db', default=RESULTS_DB)
+    tests.add_argument('--tool', choices=['cypress', 'playwright', 'phpunit'])
+    tests.add_argument('--last', type=int, default=20, help='Number of recent runs')
+    tests.add_argument('--slowest', type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.exit(1, f"No results recorded yet at {args.db}\n")
+    db = sqlite3.connect(args.db)
+    if args.action == 'tests':
+        print(f"🐢 Slowest tests over the last {args.last} runs")
+        print(f"{'avg':>9} {'max':>9} {'runs':>5} {'fail':>5} {'flaky':>5}  test")
+        for test in test_trends(db, args.last, args.slowest, args.tool):
+            suite = f"[{test['suite']}] " if test['suite'] else ''
+            print(f"{test['avg']:8.2f}s {test['max']:8.2f}s {test['runs']:5d} {test['failures']:5d} "
+                  f"{test['flaky']:5d}  {test['tool']} {suite}{test['name']}")
+        return
+
+    filters = {'command': args.command, 'tier': args.tier, 'component': args.component, 'commit': args.commit,
+               'since': args.since, 'until': args.until, 'entry_point': args.entry_point}
+
+    if args.action == 'query':
+        for row in query_executions(db, limit=args.limit, **filters):
+            status = "✅" if row['success'] else "❌"
+            finished = datetime.fromtimestamp(row['finished_at']).strftime('%Y-%m-%d %H:%M')
+            print(f"{status} {finished} {row['commit_sha'][:8]} {row['tier'] or '-':<12} "
+                  f"{row['duration']:8.2f}s  {row['command'] or row['name']}")
+        return
+
+    trends = command_trends(query_executions(db, runs=args.last, **filters), args.slowest)
+    print(f"📈 Slowest commands over the last {args.last} runs")
+    print(f"{'p50':>9} {'p90':>9} {'p95':>9} {'max':>9} {'runs':>5} {'fail':>5}  command")
+    for trend in trends:
+        print(f"{trend['p50']:8.2f}s {trend['p90']:8.2f}s {trend['p95']:8.2f}s {trend['max']:8.2f}s "
+              f"{trend['runs']:5d} {trend['failures']:5d}  {trend['command']}")
+
+
+if __name__ == '__main__':
+    main()
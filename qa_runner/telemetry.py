@@ -0,0 +1,311 @@
+"""
+MarketScale QA Telemetry - Live queue, worker and CPU metrics over HTTP (OpenMetrics) and as a JSON-lines event stream
+"""
+import collections
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from qa_runner.admission import load_average
+
+TELEMETRY_LOG = os.path.join('test-results', 'telemetry.jsonl')
+
+# Seconds between 'sample' events; job and batch events are written as they happen
+SAMPLE_EVENT_INTERVAL = 5
+# Recent events kept for clients that connect to /events part-way through a run
+EVENT_BACKLOG = 1000
+
+OPENMETRICS_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def cpu_times():
+    """(busy, total) jiffies across every CPU from /proc/stat, or None outside Linux"""
+    try:
+        with open('/proc/stat') as f:
+            fields = [int(value) for value in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    # idle and iowait are the only fields a CPU spends not running anything
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    return sum(fields) - idle, sum(fields)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Telemetry:
+    """Scheduler state published while a run is in progress, for scraping and for tailing"""
+
+    def __init__(self, host='127.0.0.1', port=None, log_path=None, sampler=None):
+        self.lock = threading.Condition()
+        self.sampler = sampler
+        self.started = time.time()
+        self.gauges = {'queued': 0, 'ready': 0, 'held': 0, 'running': 0, 'workers': 0}
+        self.counters = collections.Counter()
+        self.busy_seconds = 0.0
+        self.running = {}
+        self.batch = None
+        self.cpu_busy = None
+        self._cpu = cpu_times()
+        self._observed = time.time()
+        self._sampled = 0.0
+        self.seq = 0
+        self.backlog = collections.deque(maxlen=EVENT_BACKLOG)
+        self.closed = False
+        self.log = None
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+            self.log = open(log_path, 'a', buffering=1)
+        self.server = None
+        self.url = None
+        if port is not None:
+            self.server = ThreadingHTTPServer((host, port), self._handler())
+            self.server.daemon_threads = True
+            self.url = f"http://{host}:{self.server.server_port}"
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.event('run_started', pid=os.getpid())
+
+    def _handler(self):
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    openmetrics = 'application/openmetrics-text' in (self.headers.get('Accept') or '')
+                    self._send(telemetry.render(openmetrics).encode(),
+                               OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+                elif path == '/status':
+                    self._send(json.dumps(telemetry.snapshot(), indent=2).encode(), 'application/json')
+                elif path == '/events':
+                    self._stream_events()
+                else:
+                    self.send_error(404)
+
+            def _send(self, body, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream_events(self):
+                """Replay the backlog, then follow new events until the run ends or the client leaves"""
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.end_headers()
+                seq = 0
+                try:
+                    while True:
+                        lines, seq, closed = telemetry.events_after(seq)
+                        if lines:
+                            self.wfile.write(''.join(lines).encode())
+                            self.wfile.flush()
+                        elif closed:
+                            return
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def event(self, kind, **fields):
+        """Append one event to the JSON-lines log and the live /events stream"""
+        line = json.dumps(dict({'ts': round(time.time(), 3), 'event': kind}, **fields), default=str) + '\n'
+        with self.lock:
+            self.seq += 1
+            self.backlog.append((self.seq, line))
+            if self.log is not None:
+                self.log.write(line)
+            self.lock.notify_all()
+
+    def events_after(self, seq, timeout=1.0):
+        """Event lines newer than seq, waiting up to timeout for one; returns the lines, the new seq and whether the run ended"""
+        with self.lock:
+            if self.seq <= seq and not self.closed:
+                self.lock.wait(timeout)
+            lines = [line for number, line in self.backlog if number > seq]
+            return lines, self.seq, self.closed
+
+    def batch_started(self, tier, jobs, workers, predicted):
+        with self.lock:
+            self.batch = {'tier': tier, 'jobs': jobs, 'started': time.time()}
+            self.gauges['workers'] = workers
+        self.event('batch_started', tier=tier, jobs=jobs, workers=workers, predicted_makespan=round(predicted, 1))
+
+    def batch_finished(self, actual):
+        with self.lock:
+            tier = self.batch['tier'] if self.batch else None
+            self.batch = None
+        self.event('batch_finished', tier=tier, actual_makespan=round(actual, 1))
+
+    def job_started(self, job, label):
+        with self.lock:
+            self.running[job.id] = {'label': label, 'command': job.cmd, 'component': job.command[1],
+                                    'tier': job.tier, 'worker': job.worker, 'started': time.time()}
+            self.counters[('started', job.tier, None)] += 1
+        self.event('job_started', job=job.id, label=label, command=job.cmd, tier=job.tier, worker=job.worker,
+                   retry=job.retry_of is not None)
+
+    def job_ended(self, job):
+        """A job's process is done, whatever its result turns out to be"""
+        with self.lock:
+            self.running.pop(job.id, None)
+
+    def job_finished(self, job, result):
+        """Count a job's outcome; a retried job finishes once, with the verdict after its retries"""
+        if result.get('cached'):
+            status = 'cached'
+        elif result.get('skipped'):
+            status = 'skipped'
+        elif result.get('cancelled'):
+            status = 'cancelled'
+        elif result.get('timed_out'):
+            status = 'timed_out'
+        else:
+            status = 'passed' if result['success'] else 'failed'
+        with self.lock:
+            self.counters[('finished', job.tier, status)] += 1
+            self.counters[('duration', job.tier, None)] += result.get('duration') or 0.0
+        self.event('job_finished', job=job.id, command=result['command'], tier=job.tier, status=status,
+                   duration=round(result.get('duration') or 0.0, 2), worker=result.get('worker'),
+                   quarantined=not job.blocking)
+
+    def job_retrying(self, job, retry):
+        with self.lock:
+            self.counters[('retries', job.tier, None)] += 1
+        self.event('job_retrying', job=job.id, retry=retry.id, command=retry.cmd, attempt=job.attempt)
+
+    def observe(self, queued, ready, held, running):
+        """Scheduler gauges, called on every scheduling pass; emits a 'sample' event every few seconds"""
+        now = time.time()
+        cpu = cpu_times()
+        with self.lock:
+            self.busy_seconds += self.gauges['running'] * (now - self._observed)
+            self._observed = now
+            self.gauges.update(queued=queued, ready=ready, held=held, running=running)
+            if cpu is not None and self._cpu is not None and cpu[1] > self._cpu[1]:
+                self.cpu_busy = (cpu[0] - self._cpu[0]) / (cpu[1] - self._cpu[1])
+                self._cpu = cpu
+            sample_due = now - self._sampled >= SAMPLE_EVENT_INTERVAL
+            if sample_due:
+                self._sampled = now
+        if sample_due:
+            snapshot = self.snapshot()
+            self.event('sample', **{field: snapshot[field] for field in
+                                    ('queued', 'ready', 'held', 'running', 'workers', 'utilization',
+                                     'cpu_busy', 'load_average')},
+                       commands=[{'label': command['label'], 'elapsed': command['elapsed'],
+                                  'cores': command['cores']} for command in snapshot['commands']])
+
+    def _command_usage(self, worker):
+        group = self.sampler.groups.get(worker) if self.sampler is not None else None
+        if group is None:
+            return None, None
+        elapsed = time.time() - group['started']
+        return (round(group['cpu_seconds'] / elapsed, 2) if elapsed > 0 else None), round(group['rss_mb'], 1)
+
+    def snapshot(self):
+        """Current state as a dict, the /status response"""
+        now = time.time()
+        with self.lock:
+            gauges = dict(self.gauges)
+            running = list(self.running.values())
+            counters = dict(self.counters)
+            batch = dict(self.batch) if self.batch else None
+        commands = []
+        for command in sorted(running, key=lambda command: command['started']):
+            cores, rss_mb = self._command_usage(command['worker'])
+            commands.append(dict(command, elapsed=round(now - command['started'], 1), cores=cores, rss_mb=rss_mb))
+        finished = collections.Counter()
+        for (kind, tier, status), value in counters.items():
+            if kind == 'finished':
+                finished[status] += value
+        return dict(
+            gauges,
+            uptime=round(now - self.started, 1),
+            batch=batch,
+            utilization=round(gauges['running'] / gauges['workers'], 2) if gauges['workers'] else None,
+            cpu_count=os.cpu_count(),
+            cpu_busy=round(self.cpu_busy, 3) if self.cpu_busy is not None else None,
+            load_average=load_average(),
+            finished=dict(finished),
+            commands=commands
+        )
+
+    def render(self, openmetrics=False):
+        """Metrics in the Prometheus text format, or OpenMetrics when the scraper asks for it"""
+        snapshot = self.snapshot()
+        with self.lock:
+            counters = dict(self.counters)
+            busy_seconds = self.busy_seconds
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            # OpenMetrics names a counter family without its _total suffix
+            family = name[:-len('_total')] if openmetrics and kind == 'counter' else name
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+            for labels, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+
+        metric('qa_uptime_seconds', 'gauge', 'Seconds since the run started', [((), snapshot['uptime'])])
+        metric('qa_queue_depth', 'gauge', 'Jobs not started yet', [((), snapshot['queued'])])
+        metric('qa_queue_ready', 'gauge', 'Queued jobs whose dependencies have passed', [((), snapshot['ready'])])
+        metric('qa_jobs_held', 'gauge', 'Jobs held back by admission control', [((), snapshot['held'])])
+        metric('qa_workers', 'gauge', 'Worker slots in the current batch', [((), snapshot['workers'])])
+        metric('qa_workers_active', 'gauge', 'Worker slots running a command', [((), snapshot['running'])])
+        metric('qa_worker_busy_seconds_total', 'counter', 'Worker slot seconds spent running commands',
+               [((), round(busy_seconds, 1))])
+        metric('qa_cpu_count', 'gauge', 'CPUs on the runner', [((), snapshot['cpu_count'])])
+        metric('qa_cpu_busy_ratio', 'gauge', 'Share of CPU time not idle since the last scheduling pass',
+               [((), snapshot['cpu_busy'])])
+        metric('qa_load_average', 'gauge', 'One-minute load average', [((), snapshot['load_average'])])
+
+        command_labels = [(command, (('command', command['command']), ('component', command['component']),
+                                     ('tier', command['tier']), ('worker', command['worker'])))
+                          for command in snapshot['commands']]
+        metric('qa_command_elapsed_seconds', 'gauge', 'Seconds a running command has been going',
+               [(labels, command['elapsed']) for command, labels in command_labels])
+        metric('qa_command_cpu_cores', 'gauge', 'Average cores a running command has used',
+               [(labels, command['cores']) for command, labels in command_labels])
+        metric('qa_command_rss_mb', 'gauge', 'Resident memory of a running command tree',
+               [(labels, command['rss_mb']) for command, labels in command_labels])
+
+        by_kind = collections.defaultdict(list)
+        for (kind, tier, status), value in sorted(counters.items(), key=lambda item: tuple(map(str, item[0]))):
+            labels = (('tier', tier),) + ((('status', status),) if status else ())
+            by_kind[kind].append((labels, round(value, 2)))
+        metric('qa_jobs_started_total', 'counter', 'Commands started', by_kind['started'])
+        metric('qa_jobs_finished_total', 'counter', 'Commands finished, by outcome', by_kind['finished'])
+        metric('qa_job_duration_seconds_total', 'counter', 'Wall time of finished commands', by_kind['duration'])
+        metric('qa_job_retries_total', 'counter', 'Commands re-run for their failed tests', by_kind['retries'])
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        """End the event stream and stop serving"""
+        self.event('run_finished', uptime=round(time.time() - self.started, 1),
+                   finished=self.snapshot()['finished'])
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.log is not None:
+            self.log.close()
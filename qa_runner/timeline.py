@@ -0,0 +1,326 @@
+"""
+MarketScale QA Run Timeline - Trace-event export of a run, with its critical path and idle worker time
+"""
+import heapq
+import json
+import math
+import os
+
+TRACE_PATH = os.path.join('test-results', 'trace.json')
+
+# A dependency ending this close to the last job before a start is what held that start back
+HANDOFF = 0.5
+
+# Most rows a command's tests are spread over when they ran in parallel
+MAX_TEST_ROWS = 16
+
+# Shorter idle stretches on a worker are scheduling noise rather than lost capacity
+MIN_IDLE_GAP = 0.5
+
+# Trace colours (chrome://tracing reserved names, which Perfetto honours too)
+FAILED_COLOR = 'terrible'
+IDLE_COLOR = 'grey'
+
+RUN_LANE = 0
+CRITICAL_LANE = 1
+
+
+def lane_name(lane):
+    node, worker = lane
+    return f"{node} worker {worker}" if node else f"worker {worker}"
+
+
+def result_label(result):
+    return f"{result['component']} ({result['tier']} {result['test_type']})"
+
+
+def _merge(intervals):
+    """Sorted, non-overlapping union of (start, end) intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class RunTimeline:
+    """Where every command of a run ran and for how long, laid out per worker"""
+
+    def __init__(self, start_time):
+        self.start_time = start_time
+        self.setup = []
+        self.batches = []
+
+    def add_setup(self, name, started, finished, lane=None, **args):
+        """Work done outside any command: app servers booting, the golden database being built or restored"""
+        self.setup.append({'name': name, 'lane': lane, 'start': started, 'end': finished, 'args': args})
+
+    def add_batch(self, label, started, finished, workers, jobs, results, outcomes=None):
+        """Record one scheduled batch; outcomes maps id(result) to the per-test records its run reported"""
+        outcomes = outcomes or {}
+        by_cmd = {job.cmd: job for job in jobs}
+        spans = []
+        markers = []
+        for result in results:
+            job = by_cmd.get(result['command'])
+            if result.get('worker') is None or not result.get('duration'):
+                # Cached, skipped and never-started jobs take no worker time
+                state = next((flag for flag in ('cached', 'skipped', 'cancelled') if result.get(flag)), 'error')
+                markers.append({'name': f"{state}: {result_label(result)}", 'at': result['finished_at']})
+                continue
+            spans.append(self._command_span(result, job, outcomes.get(id(result))))
+            for attempt, retry in enumerate(result.get('retries', []), 1):
+                if retry.get('worker') is None or retry.get('finished_at') is None:
+                    continue
+                spans.append({
+                    'retry_of': spans[-1],
+                    'name': f"{result_label(result)} retry {attempt}",
+                    'job': job.id if job else None,
+                    'lane': (result.get('node'), retry['worker']),
+                    'start': retry['finished_at'] - retry['duration'],
+                    'end': retry['finished_at'],
+                    'failed': retry['returncode'] != 0,
+                    'args': {'command': retry['command'], 'returncode': retry['returncode']},
+                    'children': [],
+                    'tests': []
+                })
+
+        if any(span['lane'][0] for span in spans):
+            lanes = sorted({span['lane'] for span in spans}, key=lambda lane: (lane[0] or '', lane[1]))
+        else:
+            lanes = [(None, worker) for worker in range(workers)]
+        self.batches.append({
+            'label': label, 'start': started, 'end': finished, 'lanes': lanes,
+            'deps': {job.id: set(job.deps) for job in jobs}, 'spans': spans, 'markers': markers
+        })
+
+    def _command_span(self, result, job, tests):
+        """A command's span on its worker, opening with the database restore the scheduler ran just before it"""
+        finished = result['finished_at']
+        started = finished - result['duration']
+        children = []
+        if result.get('db_restore'):
+            restore = result['db_restore']['ms'] / 1000
+            children.append({'name': f"db restore ({result['db_restore']['method']})",
+                             'start': started - restore, 'end': started})
+            started -= restore
+        tests_start = finished - result['duration']
+        startup = result.get('tool_startup')
+        if startup:
+            end = min(tests_start + startup['seconds'], finished)
+            children.append({'name': f"{startup['tool']} startup", 'start': tests_start, 'end': end})
+            tests_start = end
+        args = {'command': result['command'], 'returncode': result.get('returncode')}
+        for field in ('server', 'node', 'startup_saved'):
+            if result.get(field):
+                args[field] = result[field]
+        return {
+            'name': result_label(result),
+            'job': job.id if job else None,
+            'lane': (result.get('node'), result['worker']),
+            'start': started,
+            'end': finished,
+            'failed': not result['success'],
+            'args': args,
+            'children': children,
+            'tests': [record for record in tests or [] if record['duration'] > 0 and record['status'] != 'skipped'],
+            'tests_start': tests_start
+        }
+
+    def _batch_path(self, batch):
+        """Walk back from a batch's last finish to its start, through whatever each job waited on"""
+        spans = batch['spans']
+        if not spans:
+            return []
+        by_job = {}
+        for span in spans:
+            if span['job'] is not None and span['end'] > by_job.get(span['job'], {'end': -math.inf})['end']:
+                by_job[span['job']] = span
+
+        path = []
+        current = max(spans, key=lambda span: span['end'])
+        while current is not None:
+            before = [span for span in spans if span['end'] <= current['start'] and span is not current]
+            latest = max(before, key=lambda span: span['end'], default=None)
+            deps = [by_job[dep] for dep in batch['deps'].get(current['job'], ()) if dep in by_job]
+            gate = max(deps, key=lambda span: span['end'], default=None)
+            if current.get('retry_of') is not None:
+                previous, reason = current['retry_of'], 'retry'
+            elif gate is not None and (latest is None or gate['end'] >= latest['end'] - HANDOFF):
+                previous, reason = gate, 'dependency'
+            elif latest is not None:
+                # Its dependencies were long done: it sat in the queue until a worker (or admission) freed up
+                previous, reason = latest, 'worker'
+            else:
+                previous, reason = None, 'batch start'
+            path.append(dict(current, reason=reason))
+            current = previous
+        path.reverse()
+        return path
+
+    def critical_path(self):
+        """Commands and waits that, end to end, account for the run's wall-clock time"""
+        waits = {'dependency': 'dependency handoff', 'worker': 'queued for a worker', 'retry': 'retry handoff'}
+        entries = []
+        cursor = self.start_time
+        for batch in self.batches:
+            for span in self._batch_path(batch):
+                if span['start'] > cursor:
+                    name = waits.get(span['reason']) or ('between batches' if entries else 'run startup')
+                    entries.append(self._entry(name, 'wait', cursor, span['start']))
+                entries.append(self._entry(span['name'], 'command', span['start'], span['end'], span['reason']))
+                cursor = max(cursor, span['end'])
+            if batch['end'] > cursor:
+                entries.append(self._entry('collecting results', 'wait', cursor, batch['end']))
+                cursor = batch['end']
+        return entries
+
+    def _entry(self, name, kind, start, end, reason=None):
+        entry = {'name': name, 'kind': kind, 'start': round(start - self.start_time, 3),
+                 'end': round(end - self.start_time, 3), 'duration': round(end - start, 3)}
+        if reason:
+            entry['reason'] = reason
+        return entry
+
+    def idle_gaps(self):
+        """Per worker lane, the busy and idle seconds inside batch windows and each idle stretch worth noting"""
+        lanes = {}
+        for batch in self.batches:
+            for lane in batch['lanes']:
+                busy = _merge((max(span['start'], batch['start']), min(span['end'], batch['end']))
+                              for span in batch['spans'] if span['lane'] == lane)
+                stats = lanes.setdefault(lane, {'busy': 0.0, 'idle': 0.0, 'gaps': []})
+                cursor = batch['start']
+                for start, end in busy + [[batch['end'], batch['end']]]:
+                    if start - cursor > 0:
+                        stats['idle'] += start - cursor
+                        if start - cursor >= MIN_IDLE_GAP:
+                            stats['gaps'].append({'batch': batch['label'], 'start': cursor, 'end': start})
+                    stats['busy'] += end - start
+                    cursor = max(cursor, end)
+        return lanes
+
+    def summary(self):
+        """Critical path and worker utilisation for the JSON report"""
+        path = self.critical_path()
+        workers = {}
+        for lane, stats in self.idle_gaps().items():
+            window = stats['busy'] + stats['idle']
+            workers[lane_name(lane)] = {
+                'busy': round(stats['busy'], 2),
+                'idle': round(stats['idle'], 2),
+                'utilization': round(stats['busy'] / window, 3) if window else None,
+                'gaps': [{'batch': gap['batch'], 'start': round(gap['start'] - self.start_time, 2),
+                          'duration': round(gap['end'] - gap['start'], 2)} for gap in stats['gaps']]
+            }
+        return {
+            'critical_path': {
+                'length': round(sum(entry['duration'] for entry in path), 2),
+                'busy': round(sum(entry['duration'] for entry in path if entry['kind'] == 'command'), 2),
+                'waiting': round(sum(entry['duration'] for entry in path if entry['kind'] == 'wait'), 2),
+                'entries': path
+            },
+            'workers': workers
+        }
+
+    def _us(self, t):
+        return round((t - self.start_time) * 1e6)
+
+    def _complete(self, name, tid, start, end, category, cname=None, args=None):
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': tid,
+                 'ts': self._us(start), 'dur': max(self._us(end) - self._us(start), 0)}
+        if cname:
+            event['cname'] = cname
+        if args:
+            event['args'] = args
+        return event
+
+    def _test_layout(self, span):
+        """Place a command's tests back to back, opening extra rows when they add up to more than the command ran
+
+        Reports give each test's duration but not its start, so parallel tests are packed onto
+        as many rows as their total needs (up to MAX_TEST_ROWS), each on the row that frees up first.
+        """
+        tests = span['tests']
+        if not tests or span['end'] <= span['tests_start']:
+            return
+        available = span['end'] - span['tests_start']
+        rows = min(max(1, math.ceil(sum(record['duration'] for record in tests) / available - 1e-9)), MAX_TEST_ROWS)
+        free = [(span['tests_start'], row) for row in range(rows)]
+        for record in tests:
+            at, row = heapq.heappop(free)
+            if at < span['end']:
+                yield row, at, min(at + record['duration'], span['end']), record
+            heapq.heappush(free, (at + record['duration'], row))
+
+    def _events(self):
+        """Every trace event, lanes named as they are first used"""
+        tids = {}
+
+        def tid_for(lane, row=0):
+            if (lane, row) not in tids:
+                tids[(lane, row)] = len(tids) + 2
+                name = lane_name(lane) if row == 0 else f"{lane_name(lane)} tests {row + 1}"
+                yield {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tids[(lane, row)], 'args': {'name': name}}
+                yield {'name': 'thread_sort_index', 'ph': 'M', 'pid': 1, 'tid': tids[(lane, row)],
+                       'args': {'sort_index': tids[(lane, row)]}}
+
+        yield {'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'MarketScale QA run'}}
+        for tid, name in ((RUN_LANE, 'run'), (CRITICAL_LANE, 'critical path')):
+            yield {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+            yield {'name': 'thread_sort_index', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'sort_index': tid}}
+
+        for step in self.setup:
+            if step['lane'] is None:
+                yield self._complete(step['name'], RUN_LANE, step['start'], step['end'], 'setup', args=step['args'])
+            else:
+                yield from tid_for(step['lane'])
+                yield self._complete(step['name'], tids[(step['lane'], 0)], step['start'], step['end'], 'setup',
+                                     args=step['args'])
+
+        for batch in self.batches:
+            yield self._complete(f"batch {batch['label']}", RUN_LANE, batch['start'], batch['end'], 'batch',
+                                 args={'jobs': len(batch['deps']), 'workers': len(batch['lanes'])})
+            for marker in batch['markers']:
+                yield {'name': marker['name'], 'cat': 'job', 'ph': 'i', 's': 't', 'pid': 1, 'tid': RUN_LANE,
+                       'ts': self._us(marker['at'])}
+            for lane in batch['lanes']:
+                yield from tid_for(lane)
+            for span in batch['spans']:
+                tid = tids[(span['lane'], 0)]
+                yield self._complete(span['name'], tid, span['start'], span['end'], 'command',
+                                     FAILED_COLOR if span['failed'] else None, span['args'])
+                for child in span['children']:
+                    yield self._complete(child['name'], tid, child['start'], child['end'], 'startup')
+                for row, start, end, record in self._test_layout(span):
+                    yield from tid_for(span['lane'], row)
+                    args = {field: record[field] for field in ('file', 'line', 'project', 'status', 'duration', 'retries')
+                            if record.get(field) is not None}
+                    yield self._complete(record['title'], tids[(span['lane'], row)], start, end, 'test',
+                                         FAILED_COLOR if record['status'] == 'failed' else None, args)
+
+        for lane, stats in self.idle_gaps().items():
+            yield from tid_for(lane)
+            for gap in stats['gaps']:
+                yield self._complete('idle', tids[(lane, 0)], gap['start'], gap['end'], 'idle', IDLE_COLOR)
+
+        for entry in self.critical_path():
+            start, end = self.start_time + entry['start'], self.start_time + entry['end']
+            yield self._complete(entry['name'], CRITICAL_LANE, start, end, 'critical',
+                                 IDLE_COLOR if entry['kind'] == 'wait' else None,
+                                 {'reason': entry['reason']} if entry.get('reason') else None)
+
+    def write_trace(self, path=TRACE_PATH, metadata=None):
+        """Stream the run out as Trace Event Format JSON, loadable in Perfetto and chrome://tracing"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            f.write('{"traceEvents": [\n')
+            for index, event in enumerate(self._events()):
+                f.write(',\n' if index else '')
+                f.write(json.dumps(event, separators=(',', ':')))
+            f.write('\n],\n"displayTimeUnit": "ms",\n"otherData": ')
+            json.dump(dict(metadata or {}, started=self.start_time), f)
+            f.write('}\n')
+        return path
@@ -0,0 +1,203 @@
+"""
+MarketScale QA Toolchain - Node tool binaries resolved once per lockfile, so commands skip npx and the shell
+"""
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import time
+
+TOOLCHAIN_CACHE = os.path.join('.qa-cache', 'toolchain.json')
+PACKAGE_LOCKFILE = 'package-lock.json'
+NODE_BIN = os.path.join('node_modules', '.bin')
+
+# Node tools the suites launch through npx (or bare, for globally installed newman and lighthouse)
+NODE_TOOLS = ('cypress', 'playwright', 'newman', 'lighthouse', 'vite')
+
+# Timed launches of each tool, with and without npx, when measuring its startup and what npx adds to it
+OVERHEAD_RUNS = 2
+OVERHEAD_TIMEOUT = 60
+
+
+def lockfile_hash(root='.'):
+    """Hash of the npm lockfile, or None when the project has none"""
+    try:
+        with open(os.path.join(root, PACKAGE_LOCKFILE), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def needs_shell(cmd):
+    """Whether a command line uses shell syntax (||, pipes, redirects, substitutions) that an argv cannot express"""
+    if '`' in cmd or '$' in cmd:
+        return True
+    lexer = shlex.shlex(cmd, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        return any(token and all(char in lexer.punctuation_chars for char in token) for token in lexer)
+    except ValueError:
+        return True
+
+
+def shell_argv(cmd):
+    """Argument vector running a command line through the platform shell"""
+    if os.name == 'nt':
+        return [os.environ.get('COMSPEC', 'cmd.exe'), '/c', cmd]
+    return ['/bin/sh', '-c', cmd]
+
+
+def _command_start(argv):
+    """Index of the program in an argv, past a leading `env NAME=value ...`"""
+    start = 0
+    if argv and argv[0] == 'env':
+        start = 1
+        while start < len(argv) and '=' in argv[start] and not argv[start].startswith('-'):
+            start += 1
+    return start
+
+
+def _executable(path):
+    return path is not None and os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def _launch_time(argv, runs=OVERHEAD_RUNS):
+    """Fastest of a few timed runs of a command, or None when it cannot run"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            completed = subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                       stdin=subprocess.DEVNULL, timeout=OVERHEAD_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if completed.returncode != 0:
+            return None
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_launch(tool, binary):
+    """Seconds one direct launch of a tool takes, and the seconds npx adds on top (None when unmeasurable)"""
+    direct = _launch_time([binary, '--version'])
+    if direct is None:
+        return None, None
+    through_npx = _launch_time(['npx', '--no-install', tool, '--version']) if shutil.which('npx') else None
+    if through_npx is None:
+        return round(direct, 3), None
+    return round(direct, 3), round(max(through_npx - direct, 0.0), 3)
+
+
+class Toolchain:
+    """Absolute paths of the project's Node tool binaries, cached until the lockfile changes"""
+
+    def __init__(self, root='.', cache_path=TOOLCHAIN_CACHE, measure=False):
+        self.root = os.path.abspath(root)
+        self.cache_path = cache_path
+        self.lockfile = lockfile_hash(root)
+        self.tools = {}
+        self.launch = {}
+        self.overhead = {}
+        self.measured = False
+        self.cached = False
+        self.resolve(measure)
+
+    def resolve(self, measure=False):
+        """Find each tool in node_modules/.bin, reusing the cached answer for an unchanged lockfile
+
+        Timing the tools costs several launches of each, so it only happens when asked for,
+        and a cache resolved without timings is timed the first time a caller wants them.
+        """
+        cache = self._load()
+        if (cache.get('lockfile') == self.lockfile and cache.get('root') == self.root
+                and all(_executable(path) for path in cache.get('tools', {}).values())):
+            self.tools = cache['tools']
+            self.launch = cache.get('launch', {})
+            self.overhead = cache.get('overhead', {})
+            self.measured = cache.get('measured', False)
+            self.cached = True
+            if measure and not self.measured:
+                self.measure()
+                self._save()
+            return self.tools
+
+        self.tools = {}
+        for tool in NODE_TOOLS:
+            path = os.path.join(self.root, NODE_BIN, tool)
+            if _executable(path):
+                self.tools[tool] = path
+        self.launch, self.overhead, self.measured = {}, {}, False
+        if measure:
+            self.measure()
+        self._save()
+        return self.tools
+
+    def measure(self):
+        """Time each resolved tool's direct launch and what npx adds to it"""
+        for tool, path in self.tools.items():
+            self.launch[tool], self.overhead[tool] = measure_launch(tool, path)
+        self.measured = True
+
+    def _load(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            with open(self.cache_path, 'w') as f:
+                json.dump({'lockfile': self.lockfile, 'root': self.root, 'tools': self.tools, 'measured': self.measured,
+                           'launch': self.launch, 'overhead': self.overhead}, f, indent=2)
+        except OSError:
+            pass
+
+    def argv(self, cmd, cwd='.'):
+        """Argument vector for a command line, with npx and bare tool names replaced by resolved binaries
+
+        Returns the argv and the tool it launched through npx (None when nothing was replaced).
+        A command line that needs a shell runs through one, untouched.
+        """
+        if needs_shell(cmd):
+            return shell_argv(cmd), None
+        argv = shlex.split(cmd)
+        # A leading `env NAME=value ...` stays in front of the command it applies to
+        start = _command_start(argv)
+        rest = argv[start:]
+        # A directory with its own node_modules resolves its own tools; npx is left to find them
+        if not rest or (os.path.isdir(os.path.join(cwd, 'node_modules')) and os.path.abspath(cwd) != self.root):
+            return argv, None
+        if rest[0] == 'npx' and len(rest) > 1 and rest[1] in self.tools:
+            return argv[:start] + [self.tools[rest[1]]] + rest[2:], rest[1]
+        if rest[0] in self.tools:
+            return argv[:start] + [self.tools[rest[0]]] + rest[1:], None
+        return argv, None
+
+    def startup_saved(self, tool):
+        """Measured seconds saved by launching a tool without npx, None when unmeasured"""
+        return self.overhead.get(tool) if tool else None
+
+    def launched(self, argv):
+        """The resolved tool an argument vector runs, or None"""
+        start = _command_start(argv)
+        program = argv[start] if start < len(argv) else None
+        return next((tool for tool, path in self.tools.items() if path == program), None)
+
+    def startup(self, tool):
+        """Measured seconds a tool takes to start when launched directly, None when unmeasured"""
+        return self.launch.get(tool) if tool else None
+
+    def describe(self):
+        return {
+            'lockfile': self.lockfile,
+            'cached': self.cached,
+            'measured': self.measured,
+            'tools': self.tools,
+            'launch': self.launch,
+            'npx_overhead': self.overhead
+        }
@@ -9,9 +9,18 @@ import os
 import json
 from datetime import datetime
 
+from qa_runner.probes import probe_tools
+from qa_runner.store import record_results
+from qa_runner.toolchain import Toolchain
+
+# Tools checked before the suites that need them
+PROBED_TOOLS = ['node', 'php', 'cypress', 'playwright', 'k6']
+
 class SimpleTestRunner:
     def __init__(self):
         self.results = {}
+        self.probes = {}
+        self.toolchain = Toolchain()
         self.start_time = time.time()
     
     def run_command(self, cmd, test_name, test_type='functional'):
@@ -20,9 +29,9 @@ class SimpleTestRunner:
         start = time.time()
         
         try:
+            # Node tools run from their resolved binaries, without npx or a shell
             result = subprocess.run(
-                cmd, 
-                shell=True, 
+                self.toolchain.argv(cmd)[0],
                 capture_output=True, 
                 text=True, 
                 cwd="."
@@ -31,6 +40,7 @@ class SimpleTestRunner:
             
             test_result = {
                 'test_name': test_name,
+                'command': cmd,
                 'test_type': test_type,
                 'duration': duration,
                 'returncode': result.returncode,
@@ -54,6 +64,7 @@ class SimpleTestRunner:
             duration = time.time() - start
             test_result = {
                 'test_name': test_name,
+                'command': cmd,
                 'test_type': test_type,
                 'duration': duration,
                 'returncode': 1,
@@ -67,16 +78,42 @@ class SimpleTestRunner:
             print(f"   ❌ ERROR {test_name} - {duration:.2f}s: {e}")
             return test_result
 
+    def record_probe(self, probe, test_name, test_type='health'):
+        """Store a tool probe as a test result"""
+        test_result = {
+            'test_name': test_name,
+            'command': probe['command'],
+            'test_type': test_type,
+            'duration': probe['duration'],
+            'returncode': probe['returncode'],
+            'stdout': probe['output'],
+            'stderr': probe['error'] or '',
+            'success': probe['success'],
+            'cached': probe['cached'],
+            'timestamp': datetime.now().isoformat()
+        }
+        self.results[test_name] = test_result
+        
+        status = "✅ PASSED" if probe['success'] else "❌ FAILED"
+        source = " (cached)" if probe['cached'] else ""
+        print(f"   {status} {test_name} - {probe['duration']:.2f}s{source}")
+        return test_result
+
+    def tool_installed(self, name):
+        """Whether a tool answers its version probe"""
+        if name not in self.probes:
+            self.probes.update(probe_tools([name]))
+        return self.probes[name]['success']
+
     def run_cypress_tests(self):
         """Run Cypress tests"""
         print("\n🎬 CYPRESS TESTS (Vue3 Frontend)")
         print("=" * 50)
         
         # Check if Cypress is installed
-        try:
-            subprocess.run("npx cypress --version", shell=True, check=True, capture_output=True)
+        if self.tool_installed('cypress'):
             print("✅ Cypress is installed")
-        except:
+        else:
             print("❌ Cypress not installed. Installing...")
             subprocess.run("npm install cypress --save-dev", shell=True)
         
@@ -105,13 +142,12 @@ class SimpleTestRunner:
         print("=" * 50)
         
         # Check if Playwright is installed
-        try:
-            subprocess.run("npx playwright --version", shell=True, check=True, capture_output=True)
+        if self.tool_installed('playwright'):
             print("✅ Playwright is installed")
-        except:
+        else:
             print("❌ Playwright not installed. Installing...")
-            subprocess.run("npm install @playwright/test", shell=True)
-            subprocess.run("npx playwright install", shell=True)
+            subprocess.run(['npm', 'install', '@playwright/test'])
+            subprocess.run(['npx', 'playwright', 'install'])
         
         # Run Playwright tests
         self.run_command(
@@ -132,10 +168,9 @@ class SimpleTestRunner:
         print("=" * 50)
         
         # Check if k6 is installed
-        try:
-            subprocess.run("k6 version", shell=True, check=True, capture_output=True)
+        if self.tool_installed('k6'):
             print("✅ k6 is installed")
-        except:
+        else:
             print("❌ k6 not installed. Please install k6 first:")
             print("   macOS: brew install k6")
             print("   Ubuntu: sudo apt-get install k6")
@@ -167,19 +202,14 @@ class SimpleTestRunner:
             "health"
         )
         
+        # Probe every tool the suites need at once; later installation checks reuse the answers
+        self.probes.update(probe_tools(PROBED_TOOLS))
+        
         # Check if Node.js is available
-        self.run_command(
-            "node --version",
-            "Node.js Version Check",
-            "health"
-        )
+        self.record_probe(self.probes['node'], "Node.js Version Check")
         
         # Check if PHP is available
-        self.run_command(
-            "php --version",
-            "PHP Version Check", 
-            "health"
-        )
+        self.record_probe(self.probes['php'], "PHP Version Check")
 
     def generate_report(self):
         """Generate test report"""
@@ -215,6 +245,8 @@ class SimpleTestRunner:
                 'test_results': self.results
             }, f, indent=2)
         
+        record_results('simple', self.results)
+        
         print(f"\n📄 Report saved to: test-results/simple-test-report.json")
 
 def main():
@@ -3,87 +3,1361 @@
 MarketScale QA Test Runner - Comprehensive Testing Framework
 Demonstrates advanced QA capabilities for B2B video content platform
 """
+import asyncio
+import functools
 import subprocess
+import shlex
+import signal
+import socket
 import sys
+import threading
 import time
 import os
+import glob
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import shutil
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 from datetime import datetime
 
+from qa_runner.accounting import read_usage, supported as accounting_supported, wrap_command
+from qa_runner.admission import SAMPLE_INTERVAL, AdmissionController, ProcessGroupSampler, default_cost
+from qa_runner.baseline import (
+    PerfBaseline, current_commit, format_change, k6_samples, lighthouse_output_path, lighthouse_samples
+)
+from qa_runner.cache import ResultCache
+from qa_runner.capture import OutputCapture, resolve_compression
+from qa_runner.coalesce import coalesce_commands, split_result
+from qa_runner.distributed import TOKEN_ENV, WORKER_WAIT, Coordinator, run_worker
+from qa_runner.flaky import (
+    QUARANTINE_SCORE, TEST_REPORT_DIR, merge_attempt, quarantine_commands, quarantined_tests, retry_command,
+    summarize, test_name, test_outcomes, with_test_report
+)
+from qa_runner.fixtures import RESTORE_METHODS, SHARED_DB, GoldenDatabase
+from qa_runner.impact import ImpactIndex, changed_files
+from qa_runner.ingest import SLOWEST_TESTS, TEST_RECORDS, TestRecordLog
+from qa_runner.junit import merge_junit
+from qa_runner.html_report import HtmlReportWriter
+from qa_runner.latency import K6_OUTPUT_DIR, LOADGEN_MODULE, K6Metrics, k6_output_path, k6_scenario, k6_stages, sketch_path
+from qa_runner.scheduling import DurationHistory, Job, assign_ranks, simulate_schedule
+from qa_runner.servers import AppServerPool
+from qa_runner.store import RESULTS_DB, ResultsStore
+from qa_runner.telemetry import TELEMETRY_LOG, Telemetry
+from qa_runner.timeline import TRACE_PATH, RunTimeline
+from qa_runner.toolchain import Toolchain
+from qa_runner.sharding import (
+    CYPRESS_SPEC_GLOB, DEFAULT_SPEC_ESTIMATE, PLAYWRIGHT_SPEC_GLOBS, SHARD_DIR,
+    balance_shards, collect_spec_timings, cypress_history_key, cypress_shard_command,
+    cypress_specs, discover_specs, playwright_history_key, playwright_project,
+    playwright_shard_command
+)
+
+# Per-command resource usage shown in the HTML report, in column order
+RESOURCE_FIELDS = ('user_cpu', 'system_cpu', 'avg_cores', 'peak_rss_mb', 'voluntary_ctx_switches',
+                   'involuntary_ctx_switches', 'block_reads', 'block_writes')
+
+PARTIAL_REPORT = 'test-results/test-report.partial.json'
+
 class MarketScaleTestRunner:
-    def __init__(self):
+    # Default per-command timeouts in seconds, keyed by test type
+    COMMAND_TIMEOUTS = {
+        'load': 20 * 60,
+        'stress': 20 * 60,
+        'lighthouse': 5 * 60,
+        'health': 60,
+    }
+
+    # Seconds a timed-out process group gets between SIGTERM and SIGKILL
+    KILL_GRACE_PERIOD = 5
+
+    def __init__(self, engine='asyncio', timeout=None, workers=None, log_compression='none',
+                 use_cache=True, cache_dir='.qa-cache', cache_max_mb=256, changed_since=None,
+                 shards=None, server_pool=False, server_base_port=8100, fresh_db=False, db_restore='auto',
+                 perf_tolerance=0.10, perf_window=10, admission=True, max_load=None, mem_reserve_mb=1024,
+                 retries=1, quarantine=True, quarantine_score=QUARANTINE_SCORE, fail_fast=None,
+                 coordinator=None, load_driver='auto', load_model='closed', coalesce=True,
+                 slowest=SLOWEST_TESTS, telemetry=None, telemetry_log=None, trace=TRACE_PATH,
+                 coordinator_token=None, profile_toolchain=False, worker_wait=WORKER_WAIT):
         self.results = {}
+        self._reserved_keys = set()
+        self.key_prefix = ''
+        self._keys_lock = threading.Lock()
+        self.log_dir = os.path.join('test-results', 'logs')
+        self.log_compression = resolve_compression(log_compression)
         self.start_time = time.time()
+        self.engine = engine
+        self.timeout = timeout
+        self.workers = workers
+        self.schedule_stats = []
+        self.history = DurationHistory()
+        self.history.ingest_report()
+        self.cache_dir = cache_dir
+        self.cache = ResultCache(cache_dir, max_bytes=cache_max_mb * 1024 * 1024)
+        self.use_cache = use_cache
+        self.impact = self.load_impact(changed_since) if changed_since else None
+        self.shards = shards
+        self.shard_count = 0
+        self.golden = GoldenDatabase()
+        self.fresh_db = fresh_db
+        self.db_restore = db_restore
+        self.shared_database = os.environ.get('DB_DATABASE', SHARED_DB)
+        self._reset_per_job = False
+        self.perf_tolerance = perf_tolerance
+        self.perf_window = perf_window
+        self.load_driver = load_driver
+        self.load_model = load_model
+        self.coalesce = coalesce
+        self.coalesced = {}
+        self.toolchain = Toolchain(measure=profile_toolchain)
+        self.sampler = ProcessGroupSampler()
+        self.admission = AdmissionController(max_load, mem_reserve_mb, self.sampler) if admission else None
+        self.telemetry = None
+        if telemetry or telemetry_log:
+            host, _, port = (telemetry or '').rpartition(':')
+            self.telemetry = Telemetry(host or '127.0.0.1', int(port) if port else None, telemetry_log, self.sampler)
+            if self.telemetry.url:
+                print(f"📡 Live metrics at {self.telemetry.url}/metrics, events at {self.telemetry.url}/events")
+        self.retries = retries
+        self.quarantine_score = quarantine_score
+        self.quarantined = quarantined_tests(RESULTS_DB, quarantine_score) if quarantine else {}
+        self.quarantine_lane = set()
+        # Test records stream to tests.jsonl as commands finish; reports read them back from there
+        self.test_records = TestRecordLog(TEST_RECORDS, slowest)
+        self.trace = trace
+        self.timeline = RunTimeline(self.start_time)
+        # Per-test records of the current batch's runs, keyed by id(result), for the timeline
+        self._run_outcomes = {}
+        self.fail_fast = fail_fast
+        self.fail_fast_events = []
+        self._cancelled_slots = set()
+        self.coordinator = None
+        self.worker_wait = worker_wait
+        self.coordinator_token = coordinator_token or os.environ.get(TOKEN_ENV)
+        if coordinator:
+            # Workers run whatever the coordinator hands them, so it is only reachable off this host when asked
+            host, _, port = coordinator.rpartition(':')
+            self.coordinator = Coordinator(host or '127.0.0.1', int(port), token=self.coordinator_token)
+            print(f"🛰️  Coordinator listening on {self.coordinator.url} - start workers with --worker")
+            if not self.coordinator_token:
+                print(f"🔑 Workers need {TOKEN_ENV}={self.coordinator.token}")
+        self.server_pool = AppServerPool(base_port=server_base_port, golden=self.golden,
+                                         restore_method=db_restore) if server_pool else None
+        if shards:
+            shutil.rmtree(SHARD_DIR, ignore_errors=True)
         self.test_report = {
             'timestamp': datetime.now().isoformat(),
             'platform': 'MarketScale QA Framework',
             'version': '1.0.0',
             'tests': {}
         }
-    
-    def run_command(self, cmd, component, tier, test_type='functional'):
+
+    def command_timeout(self, test_type):
+        """Resolve the timeout for a command, the --timeout flag wins"""
+        if self.timeout is not None:
+            return self.timeout
+        return self.COMMAND_TIMEOUTS.get(test_type)
+
+    def _command_cwd(self, component):
+        """Working directory for a component, falling back to the repo root"""
+        if component != '.' and os.path.isdir(component):
+            return f"./{component}"
+        return "."
+
+    def _reserve_key(self, component, tier, test_type):
+        """Claim a unique result key, suffixing repeats of the same component/tier/type"""
+        base = f"{self.key_prefix}{component}_{tier}_{test_type}"
+        with self._keys_lock:
+            key = base
+            suffix = 2
+            while key in self._reserved_keys:
+                key = f"{base}_{suffix}"
+                suffix += 1
+            self._reserved_keys.add(key)
+        return key
+
+    def _open_logs(self, key):
+        """Open streaming log captures for a command's stdout and stderr"""
+        return (
+            OutputCapture(os.path.join(self.log_dir, f"{key}.stdout.log"), self.log_compression),
+            OutputCapture(os.path.join(self.log_dir, f"{key}.stderr.log"), self.log_compression)
+        )
+
+    def _usage_path(self, key):
+        return os.path.join(self.log_dir, f"{key}.rusage.json")
+
+    def _launch_argv(self, exec_cmd, component):
+        """Argument vector of a command with its Node tools pre-resolved, and the tool startup facts to record"""
+        argv, via_npx = self.toolchain.argv(exec_cmd, self._command_cwd(component))
+        launch = {}
+        if self.toolchain.startup_saved(via_npx):
+            launch['startup_saved'] = self.toolchain.startup_saved(via_npx)
+        tool = self.toolchain.launched(argv)
+        if self.toolchain.startup(tool):
+            launch['tool_startup'] = {'tool': tool, 'seconds': self.toolchain.startup(tool)}
+        return argv, launch
+
+    def _exec_argv(self, argv, key):
+        """Argument vector to spawn, wrapped so the command tree's rusage is written next to its logs"""
+        if not accounting_supported():
+            return argv
+        os.makedirs(self.log_dir, exist_ok=True)
+        return wrap_command(argv, self._usage_path(key))
+
+    def _record_result(self, key, cmd, component, tier, test_type, duration, returncode, stdout_log, stderr_log,
+                       timed_out=False, worker=None):
+        """Store a command result and print its status line"""
+        stdout_log.close()
+        stderr_log.close()
+        instance = self._instance_for(worker)
+        test_result = {
+            'command': cmd,
+            'component': component,
+            'tier': tier,
+            'test_type': test_type,
+            'duration': duration,
+            'returncode': returncode,
+            'logs': {
+                'stdout': stdout_log.describe(),
+                'stderr': stderr_log.describe()
+            },
+            'success': returncode == 0 and not timed_out,
+            'timed_out': timed_out,
+            'worker': worker,
+            'server': instance.url if instance else None,
+            'finished_at': time.time(),
+            'timestamp': datetime.now().isoformat()
+        }
+
+        usage = read_usage(self._usage_path(key), duration)
+        if usage:
+            test_result['resources'] = usage
+
+        if not test_result['success']:
+            test_result['stdout_tail'] = stdout_log.tail_text()
+            test_result['stderr_tail'] = stderr_log.tail_text()
+
+        self.results[key] = test_result
+
+        if timed_out:
+            print(f"   ⏱️ TIMEOUT {component} ({tier}) - {duration:.2f}s")
+        else:
+            status = "✅ PASSED" if test_result['success'] else "❌ FAILED"
+            print(f"   {status} {component} ({tier}) - {duration:.2f}s")
+
+        if not test_result['success'] and test_result['stderr_tail']:
+            print(f"    Error: ...{test_result['stderr_tail'][-200:]}")
+
+        return test_result
+
+    def _record_error(self, key, cmd, component, tier, test_type, duration, error, worker=None):
+        """Store a result for a command that could not be run at all"""
+        test_result = {
+            'command': cmd,
+            'component': component,
+            'tier': tier,
+            'test_type': test_type,
+            'duration': duration,
+            'returncode': 1,
+            'stdout_tail': '',
+            'stderr_tail': str(error),
+            'success': False,
+            'timed_out': False,
+            'worker': worker,
+            'finished_at': time.time(),
+            'timestamp': datetime.now().isoformat()
+        }
+
+        self.results[key] = test_result
+        print(f"   ❌ ERROR {component} ({tier}) - {duration:.2f}s: {error}")
+        return test_result
+
+    def _signal_group(self, pid, sig):
+        """Send a signal to a process group, ignoring groups that already exited"""
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(pid, sig)
+            else:
+                os.kill(pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _pump_pipe(self, pipe, capture):
+        """Copy a blocking pipe into a log capture until EOF"""
+        for chunk in iter(lambda: pipe.read1(65536), b''):
+            capture.write(chunk)
+        pipe.close()
+
+    def _instance_for(self, worker):
+        """App server instance assigned to a worker slot, if the server pool is enabled"""
+        if self.server_pool is None or worker is None or worker >= len(self.server_pool.instances):
+            return None
+        return self.server_pool.instances[worker]
+
+    def _command_environment(self, cmd, worker):
+        """Command line and environment to execute, pointed at the worker's app server"""
+        instance = self._instance_for(worker)
+        if instance is None:
+            return cmd, None
+        return instance.adapt_command(cmd), dict(os.environ, **instance.env)
+
+    def run_command(self, cmd, component, tier, test_type='functional', worker=None):
         """Run a test command and capture results"""
         print(f"🚀 Running {tier} {test_type} tests for {component}...")
         start = time.time()
+        timeout = self.command_timeout(test_type)
+        key = self._reserve_key(component, tier, test_type)
+        exec_cmd, env = self._command_environment(cmd, worker)
+        exec_cmd = self._with_test_report(exec_cmd, key)
         
         try:
-            result = subprocess.run(
-                cmd, 
-                shell=True, 
-                capture_output=True, 
-                text=True, 
-                cwd=f"./{component}" if component != '.' else "."
+            argv, launch = self._launch_argv(exec_cmd, component)
+            process = subprocess.Popen(
+                self._exec_argv(argv, key),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=self._command_cwd(component),
+                env=env,
+                start_new_session=True
             )
+        except Exception as e:
             duration = time.time() - start
-            
-            test_result = {
-                'component': component,
-                'tier': tier,
-                'test_type': test_type,
-                'duration': duration,
-                'returncode': result.returncode,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'success': result.returncode == 0,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            self.results[f"{component}_{tier}_{test_type}"] = test_result
-            
-            status = "✅ PASSED" if result.returncode == 0 else "❌ FAILED"
-            print(f"   {status} {component} ({tier}) - {duration:.2f}s")
-            
-            if not test_result['success'] and result.stderr:
-                print(f"    Error: {result.stderr[:200]}...")
-            
+            return self._record_error(key, cmd, component, tier, test_type, duration, e, worker)
+
+        if worker is not None:
+            self.sampler.watch(worker, process.pid)
+            if worker in self._cancelled_slots:
+                # --fail-fast stopped this job while its thread was still starting it
+                self._signal_group(process.pid, signal.SIGTERM)
+        stdout_log, stderr_log = self._open_logs(key)
+        pumps = [
+            threading.Thread(target=self._pump_pipe, args=(process.stdout, stdout_log), daemon=True),
+            threading.Thread(target=self._pump_pipe, args=(process.stderr, stderr_log), daemon=True)
+        ]
+        for pump in pumps:
+            pump.start()
+
+        timed_out = False
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            self._signal_group(process.pid, signal.SIGTERM)
+            try:
+                process.wait(timeout=self.KILL_GRACE_PERIOD)
+            except subprocess.TimeoutExpired:
+                self._signal_group(process.pid, signal.SIGKILL)
+                process.wait()
+
+        # Reap anything the command left behind so its pipes close
+        self._signal_group(process.pid, signal.SIGKILL)
+        for pump in pumps:
+            pump.join()
+        duration = time.time() - start
+
+        test_result = self._record_result(key, cmd, component, tier, test_type, duration,
+                                          process.returncode, stdout_log, stderr_log, timed_out, worker)
+        test_result.update(launch)
+        return self._collect_outputs(test_result, exec_cmd)
+
+    def _with_test_report(self, cmd, key):
+        """Point a Cypress, Playwright or PHPUnit command's per-test report at a fresh directory of its own"""
+        report_dir = os.path.abspath(os.path.join(TEST_REPORT_DIR, key))
+        shutil.rmtree(report_dir, ignore_errors=True)
+        return with_test_report(cmd, report_dir)
+
+    def _collect_outputs(self, test_result, exec_cmd):
+        """Read back the k6 points and per-test reports a finished command wrote"""
+        outcomes = test_outcomes(exec_cmd, self._command_cwd(test_result['component']))
+        if outcomes:
+            test_result['test_outcomes'] = outcomes
+        return self._collect_latency(test_result)
+
+    def _collect_latency(self, test_result):
+        """Fold the points a k6 command streamed to --out json into percentile histograms"""
+        output = k6_output_path(test_result['command'])
+        if output is None:
             return test_result
-            
+        sketch = sketch_path(output)
+        if os.path.exists(output):
+            metrics = K6Metrics(stages=k6_stages(test_result['command']))
+            try:
+                metrics.ingest(output)
+            except (OSError, EOFError) as e:
+                # A killed k6 leaves a truncated file; keep whatever was read before the cut
+                print(f"   ⚠️ k6 output {output} was cut short: {e}")
+            with open(sketch, 'w') as f:
+                json.dump(metrics.to_dict(), f)
+        elif os.path.exists(sketch):
+            # The Python load driver aggregates in-process and writes only the histograms
+            try:
+                with open(sketch) as f:
+                    metrics = K6Metrics.from_dict(json.load(f))
+            except (OSError, ValueError):
+                return test_result
+        else:
+            return test_result
+        test_result['latency'] = dict(metrics.summary(), scenario=k6_scenario(test_result['command']), sketch=sketch)
+        return test_result
+
+    async def _read_stream(self, stream, capture):
+        """Drain a subprocess pipe incrementally so it never blocks the child"""
+        while True:
+            data = await stream.read(65536)
+            if not data:
+                break
+            capture.write(data)
+
+    async def _kill_process_group(self, process):
+        """Terminate a process group, escalating to SIGKILL after the grace period"""
+        self._signal_group(process.pid, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), self.KILL_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            self._signal_group(process.pid, signal.SIGKILL)
+            await process.wait()
+
+    async def run_command_async(self, cmd, component, tier, test_type='functional', worker=None):
+        """Run a test command as an asyncio subprocess and capture results"""
+        print(f"🚀 Running {tier} {test_type} tests for {component}...")
+        start = time.time()
+        timeout = self.command_timeout(test_type)
+        key = self._reserve_key(component, tier, test_type)
+        exec_cmd, env = self._command_environment(cmd, worker)
+        exec_cmd = self._with_test_report(exec_cmd, key)
+        timed_out = False
+
+        try:
+            argv, launch = self._launch_argv(exec_cmd, component)
+            process = await asyncio.create_subprocess_exec(
+                *self._exec_argv(argv, key),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self._command_cwd(component),
+                env=env,
+                start_new_session=True
+            )
         except Exception as e:
             duration = time.time() - start
-            test_result = {
+            return self._record_error(key, cmd, component, tier, test_type, duration, e, worker)
+
+        if worker is not None:
+            self.sampler.watch(worker, process.pid)
+        stdout_log, stderr_log = self._open_logs(key)
+        readers = asyncio.gather(
+            self._read_stream(process.stdout, stdout_log),
+            self._read_stream(process.stderr, stderr_log)
+        )
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            await self._kill_process_group(process)
+        except asyncio.CancelledError:
+            await self._kill_process_group(process)
+            readers.cancel()
+            stdout_log.close()
+            stderr_log.close()
+            raise
+
+        # Reap anything the command left behind so its pipes close
+        self._signal_group(process.pid, signal.SIGKILL)
+        await readers
+        duration = time.time() - start
+
+        test_result = self._record_result(key, cmd, component, tier, test_type, duration,
+                                          process.returncode, stdout_log, stderr_log, timed_out, worker)
+        test_result.update(launch)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._collect_outputs, test_result, exec_cmd)
+
+    def _record_skipped(self, job):
+        """Store a result for a job whose dependencies did not pass"""
+        cmd, component, tier, test_type = job.command
+        test_result = {
+            'command': cmd,
+            'component': component,
+            'tier': tier,
+            'test_type': test_type,
+            'duration': 0.0,
+            'returncode': None,
+            'stdout_tail': '',
+            'stderr_tail': 'Skipped: a gating dependency failed',
+            'success': False,
+            'skipped': True,
+            'timed_out': False,
+            'finished_at': time.time(),
+            'timestamp': datetime.now().isoformat()
+        }
+
+        self.results[self._reserve_key(component, tier, test_type)] = test_result
+        print(f"   ⏭️ SKIPPED {component} ({tier}) - gated on a failed dependency")
+        return test_result
+
+    def _record_cached(self, job):
+        """Replay a cached passing result for a job whose inputs are unchanged"""
+        cmd, component, tier, test_type = job.command
+        test_result = dict(job.cached_result)
+        test_result.pop('logs', None)
+        test_result.pop('db_restore', None)
+        test_result.pop('resources', None)
+        test_result.pop('retries', None)
+        test_result.pop('startup_saved', None)
+        test_result.pop('tool_startup', None)
+        test_result.update({
+            'command': cmd,
+            'component': component,
+            'tier': tier,
+            'test_type': test_type,
+            'duration': 0.0,
+            'cached': True,
+            'cached_duration': job.cached_result['duration'],
+            'cached_at': job.cached_result['timestamp'],
+            'finished_at': time.time(),
+            'timestamp': datetime.now().isoformat()
+        })
+
+        self.results[self._reserve_key(component, tier, test_type)] = test_result
+        print(f"   ♻️ CACHED {component} ({tier}) - inputs unchanged since {test_result['cached_at']}")
+        return test_result
+
+    async def run_graph_async(self, jobs, workers, priority):
+        """Feed a job graph through one bounded worker pool, starting each job as soon as its dependencies pass"""
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=workers) if self.engine == 'thread' else None
+        pending = sorted(jobs, key=priority)
+        passed, failed = set(), set()
+        free_slots = list(range(workers))
+        restores = {}
+        running = {}
+        results = []
+        stopped = []
+        cancelled = set()
+
+        def settle(job, result):
+            results.append(result)
+            if self.telemetry is not None:
+                self.telemetry.job_finished(job, result)
+
+        try:
+            while pending or running:
+                for job in [j for j in pending if self._in_stopped_scope(j, stopped)]:
+                    pending.remove(job)
+                    job, result = self._record_cancelled(job, None, stopped)
+                    settle(job, result)
+                    failed.add(job.id)
+
+                blocked = [job for job in pending if job.deps & failed]
+                while blocked:
+                    for job in blocked:
+                        pending.remove(job)
+                        failed.add(job.id)
+                        settle(job, self._record_skipped(job))
+                    blocked = [job for job in pending if job.deps & failed]
+
+                replayed = False
+                for job in [j for j in pending if j.deps <= passed]:
+                    if job.cached_result is not None:
+                        pending.remove(job)
+                        settle(job, self._record_cached(job))
+                        passed.add(job.id)
+                        replayed = True
+                        continue
+                    if len(running) >= workers:
+                        break
+                    if self.admission is not None and not self.admission.admit(job, self._job_label(job)):
+                        continue
+                    pending.remove(job)
+                    job.worker = free_slots.pop(0)
+                    restores[job.id] = self._reset_database(job.worker)
+                    if executor is not None:
+                        task = loop.run_in_executor(
+                            executor, functools.partial(self.run_command, *job.command, worker=job.worker))
+                    else:
+                        task = asyncio.ensure_future(self.run_command_async(*job.command, worker=job.worker))
+                    running[task] = job
+                    if self.telemetry is not None:
+                        self.telemetry.job_started(job, self._job_label(job))
+
+                if not running:
+                    if replayed:
+                        continue
+                    break
+                # Wake up every sample interval to measure running jobs and re-check held ones
+                finished, _ = await asyncio.wait(running, timeout=SAMPLE_INTERVAL,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                self.sampler.sample()
+                if self.telemetry is not None:
+                    self.telemetry.observe(len(pending), sum(1 for j in pending if j.deps <= passed),
+                                           len(self.admission.held) if self.admission is not None else 0,
+                                           len(running) - len(finished))
+                for task in finished:
+                    job = running.pop(task)
+                    if self.telemetry is not None:
+                        self.telemetry.job_ended(job)
+                    free_slots.append(job.worker)
+                    free_slots.sort()
+                    if self.admission is not None:
+                        self.admission.finish(job)
+                    sampled = self.sampler.release(job.worker)
+                    self._cancelled_slots.discard(job.worker)
+                    if job.id in cancelled:
+                        job, result = self._record_cancelled(job, None if task.cancelled() else task.result(), stopped)
+                        settle(job, result)
+                        failed.add(job.id)
+                        continue
+                    result = task.result()
+                    # rusage from the accounting wrapper is exact for CPU; only /proc sees the whole tree's RSS at once
+                    if sampled and result.get('resources'):
+                        result['resources']['peak_rss_mb'] = max(sampled['peak_rss_mb'],
+                                                                 result['resources']['peak_rss_mb'])
+                    elif sampled:
+                        result['resources'] = sampled
+                    if restores.get(job.id):
+                        result['db_restore'] = restores[job.id]
+                    if job.retry_of is not None:
+                        job, result = job.retry_of, self._settle_retry(job, result)
+                    retry = None if self._in_stopped_scope(job, stopped) else self._plan_retry(job, result)
+                    if retry is not None:
+                        # The job's outcome waits on the retry, which goes ahead of everything queued
+                        pending.insert(0, retry)
+                        if self.telemetry is not None:
+                            self.telemetry.job_retrying(job, retry)
+                        continue
+                    self._settle_tests(result)
+                    if not job.blocking:
+                        # Quarantined tests report their outcome but never fail the build or gate later tiers
+                        result['quarantined'] = True
+                    settle(job, result)
+                    (passed if result['success'] or not job.blocking else failed).add(job.id)
+                    if result['success'] and job.cache_key and not result.get('retries'):
+                        self.cache.store(job.cache_key, result)
+                    if self.fail_fast and job.blocking and not result['success']:
+                        stopped.append(self._stop_scope(job, result))
+                        doomed = [(task, other) for task, other in running.items()
+                                  if other.id not in cancelled and self._in_stopped_scope(other, stopped)]
+                        dropped = sum(1 for other in pending if self._in_stopped_scope(other, stopped))
+                        print(f"   🛑 FAIL-FAST ({self.fail_fast}): {stopped[-1]['reason']} - "
+                              f"cancelling {len(doomed)} running and {dropped} queued jobs")
+                        for task, other in doomed:
+                            cancelled.add(other.id)
+                            self._cancel_job(task, other, loop)
+                        self.write_partial_report(stopped[-1])
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+        return results
+
+    def _stop_scope(self, job, result):
+        """The part of the run a failed blocking job stops under the --fail-fast scope"""
+        cmd, component, tier, test_type = job.command
+        value = {'global': None, 'tier': tier, 'component': component}[self.fail_fast]
+        stop = {
+            'scope': self.fail_fast,
+            'value': value,
+            'command': result['command'],
+            'reason': f"{component} ({tier} {test_type}) failed",
+            'at': time.time()
+        }
+        self.fail_fast_events.append(stop)
+        return stop
+
+    def _in_stopped_scope(self, job, stopped):
+        cmd, component, tier, test_type = job.command
+        for stop in stopped:
+            if stop['scope'] == 'global' or {'tier': tier, 'component': component}[stop['scope']] == stop['value']:
+                return True
+        return False
+
+    def _cancel_job(self, task, job, loop):
+        """Stop a running job: asyncio tasks kill their own process group, thread jobs are signalled directly"""
+        if self.engine != 'thread':
+            task.cancel()
+            return
+        self._cancelled_slots.add(job.worker)
+        group = self.sampler.groups.get(job.worker)
+        if group is not None:
+            self._signal_group(group['pgid'], signal.SIGTERM)
+            loop.call_later(self.KILL_GRACE_PERIOD, self._signal_group, group['pgid'], signal.SIGKILL)
+
+    def _record_cancelled(self, job, result, stopped):
+        """Result for a job stopped by --fail-fast; a cancelled retry leaves its original failure standing"""
+        reason = f"Cancelled by fail-fast: {stopped[-1]['reason']}"
+        if job.retry_of is not None:
+            if result is not None:
+                self._discard_result(result)
+            job, result = job.retry_of, job.retry_of.result
+            result.pop('test_outcomes', None)
+            return job, result
+
+        cmd, component, tier, test_type = job.command
+        if result is None:
+            result = {
+                'command': cmd,
                 'component': component,
                 'tier': tier,
                 'test_type': test_type,
-                'duration': duration,
-                'returncode': 1,
-                'stdout': '',
-                'stderr': str(e),
-                'success': False,
+                'duration': 0.0,
+                'returncode': None,
+                'stdout_tail': '',
+                'finished_at': time.time(),
                 'timestamp': datetime.now().isoformat()
             }
-            
-            self.results[f"{component}_{tier}_{test_type}"] = test_result
-            print(f"   ❌ ERROR {component} ({tier}) - {duration:.2f}s: {e}")
-            return test_result
+            self.results[self._reserve_key(component, tier, test_type)] = result
+        # Outcomes of a killed run would read as failures in the flakiness history
+        result.pop('test_outcomes', None)
+        result.update({'success': False, 'cancelled': True, 'timed_out': False, 'stderr_tail': reason})
+        print(f"   🛑 CANCELLED {component} ({tier}) - {reason}")
+        return job, result
 
-    def run_tier1_critical(self, parallel=True):
-        """Run Tier 1 Critical tests - Every commit"""
-        print("\n🔥 TIER 1 CRITICAL TESTS (Every Commit)")
-        print("=" * 60)
-        
-        commands = [
+    def _discard_result(self, result):
+        for key, value in list(self.results.items()):
+            if value is result:
+                del self.results[key]
+
+    def write_partial_report(self, stop):
+        """Write what has finished so far the moment --fail-fast stops part of the run"""
+        results = dict(self.results)
+        os.makedirs('test-results', exist_ok=True)
+        with open(PARTIAL_REPORT, 'w') as f:
+            json.dump({
+                'timestamp': self.test_report['timestamp'],
+                'partial': True,
+                'fail_fast': stop,
+                'summary': {
+                    'finished': len(results),
+                    'successful': sum(1 for r in results.values() if r['success']),
+                    'cancelled': sum(1 for r in results.values() if r.get('cancelled'))
+                },
+                'test_results': results
+            }, f, indent=2, default=str)
+        print(f"   📄 Partial report: {PARTIAL_REPORT}")
+
+    def _plan_retry(self, job, result):
+        """A job re-running just the tests that failed, if the failure came down to individual tests"""
+        if result['success'] or result.get('timed_out') or not job.blocking or job.attempt >= self.retries:
+            return None
+        failed = [outcome for outcome in result.get('test_outcomes', []) if outcome['status'] == 'failed']
+        cmd = retry_command(failed) if failed else None
+        if cmd is None:
+            return None
+
+        job.result = result
+        job.attempt += 1
+        _, component, tier, test_type = job.command
+        retry = Job(f"{job.id}-retry{job.attempt}", (cmd, component, tier, test_type))
+        retry.retry_of = job
+        retry.cpu_cost, retry.mem_cost = job.cpu_cost, job.mem_cost
+        print(f"   🔁 Retrying {len(failed)} failed tests of {component} ({tier}), attempt {job.attempt}/{self.retries}")
+        return retry
+
+    def _settle_retry(self, retry, retry_result):
+        """Fold a retry into the original job's result, which passes once every failed test has passed"""
+        result = retry.retry_of.result
+        self._discard_result(retry_result)
+        result['test_outcomes'] = merge_attempt(result['test_outcomes'], retry_result.get('test_outcomes', []))
+        result.setdefault('retries', []).append({
+            'command': retry_result['command'],
+            'duration': retry_result['duration'],
+            'returncode': retry_result['returncode'],
+            'logs': retry_result.get('logs'),
+            'worker': retry_result.get('worker'),
+            'finished_at': retry_result['finished_at']
+        })
+        still_failing = sum(1 for outcome in result['test_outcomes'] if outcome['status'] == 'failed')
+        if not still_failing:
+            result['success'] = True
+            result['recovered_by_retry'] = True
+            print(f"   🎲 RECOVERED {result['component']} ({result['tier']}) - failed tests passed on retry")
+        else:
+            print(f"   ❌ {still_failing} tests of {result['component']} ({result['tier']}) still fail on retry")
+        return result
+
+    def _settle_tests(self, result):
+        """Replace a finished job's per-test outcomes with a summary, keeping them for the results database"""
+        outcomes = result.pop('test_outcomes', None)
+        if outcomes:
+            self.test_records.add(outcomes)
+            self._run_outcomes[id(result)] = outcomes
+            result['tests'] = summarize(outcomes)
+            projects = sorted({outcome['project'] for outcome in outcomes if outcome['project']})
+            if len(projects) > 1:
+                # Lets a coalesced run be split back into one result per project
+                result['projects'] = {}
+                for project in projects:
+                    mine = [outcome for outcome in outcomes if outcome['project'] == project]
+                    result['projects'][project] = dict(summarize(mine),
+                                                       duration=round(sum(o['duration'] for o in mine), 2))
+
+    def quarantine_tier(self, commands):
+        """Move chronically flaky tests out of a tier's blocking commands into their own non-blocking lane"""
+        if not self.quarantined:
+            return commands
+        blocking, lane = quarantine_commands(commands, self.quarantined)
+        lane = [command for command in lane if command[0] not in self.quarantine_lane]
+        self.quarantine_lane.update(command[0] for command in lane)
+        if lane:
+            print(f"🚧 {len(lane)} quarantine lane commands for {len(self.quarantined)} flaky tests (non-blocking)")
+        return blocking + lane
+
+    def coalesce_tier(self, commands):
+        """Run a tier's per-project Playwright commands as one invocation with several --project flags"""
+        if not self.coalesce:
+            return commands
+        # Quarantine lane commands must stay non-blocking, so they never join a merged run
+        lane = [command for command in commands if command[0] in self.quarantine_lane]
+        commands, merged = coalesce_commands([command for command in commands if command not in lane],
+                                             self._playwright_workers)
+        for cmd, group in merged.items():
+            self.coalesced[cmd] = group
+            print(f"🧵 Coalesced {len(group)} Playwright commands into: {cmd}")
+        return commands + lane
+
+    def _playwright_workers(self, group):
+        """Playwright --workers for a merged run: the cores its commands were budgeted, up to the CPU count"""
+        cores = sum(self._command_cost(member[0])[0] for member in group)
+        return max(1, min(round(cores), os.cpu_count() or 1))
+
+    def _command_cost(self, cmd):
+        """Learned (cores, MB) of a command, else its default; a merged command defaults to its members' sum"""
+        learned_cores, learned_mb = self.history.resource_cost(cmd)
+        if cmd in self.coalesced:
+            default_cores = sum(self._command_cost(member[0])[0] for member in self.coalesced[cmd])
+            default_mb = sum(self._command_cost(member[0])[1] for member in self.coalesced[cmd])
+        else:
+            default_cores, default_mb = default_cost(cmd)
+        return (learned_cores if learned_cores is not None else default_cores,
+                learned_mb if learned_mb is not None else default_mb)
+
+    def _estimate(self, cmd, test_type):
+        """Predicted duration; a merged command never run before takes as long as its slowest member"""
+        if cmd in self.coalesced and cmd not in self.history.commands:
+            return max(self.history.estimate(member[0], member[3]) for member in self.coalesced[cmd])
+        return self.history.estimate(cmd, test_type)
+
+    def split_coalesced(self, results):
+        """Replace each merged Playwright result with one result per command it replaced"""
+        split = []
+        for result in results:
+            group = self.coalesced.get(result['command'])
+            if group is None:
+                split.append(result)
+                continue
+            self._discard_result(result)
+            for entry in split_result(result, group):
+                self.results[self._reserve_key(entry['component'], entry['tier'], entry['test_type'])] = entry
+                split.append(entry)
+        return split
+
+    def _job_label(self, job):
+        cmd, component, tier, test_type = job.command
+        return f"{component} ({tier} {test_type})"
+
+    def start_server_pool(self, workers):
+        """Make sure there is one isolated app server per worker, or fall back to the shared server"""
+        if self.server_pool is None:
+            return
+        try:
+            started = len(self.server_pool.instances)
+            began = time.time()
+            self.server_pool.ensure(workers)
+            if len(self.server_pool.instances) > started:
+                print(f"🖥️  App server pool: {len(self.server_pool.instances)} instances from port {self.server_pool.base_port}")
+                self.timeline.add_setup('app server pool', began, time.time(), instances=len(self.server_pool.instances))
+                for instance in self.server_pool.instances[started:]:
+                    self.timeline.add_setup(f"app server startup :{instance.port}", instance.started_at,
+                                            instance.ready_at, lane=(None, instance.index), url=instance.url)
+        except (OSError, subprocess.CalledProcessError, RuntimeError) as e:
+            print(f"⚠️  Could not start the app server pool, using the shared server: {e}")
+            self.server_pool.stop()
+            self.server_pool = None
+
+    def prepare_fixtures(self, workers):
+        """Make the golden database ready and decide how often suites can be reset to it"""
+        self._reset_per_job = False
+        if not self.fresh_db:
+            return
+        try:
+            began = time.time()
+            self.golden.ensure()
+            self.timeline.add_setup('golden database', began, time.time(), path=self.golden.path)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️  Could not build the golden database, suites share the existing one: {e}")
+            self.fresh_db = False
+            return
+
+        if self.server_pool is not None or workers == 1:
+            self._reset_per_job = True
+            return
+        # Parallel suites on the shared server share one database, so reset it between batches only
+        restored = self.golden.restore(self.shared_database, self.db_restore)
+        self.timeline.add_setup(f"db restore ({restored['method']})", time.time() - restored['ms'] / 1000, time.time(),
+                                database=self.shared_database)
+        print(f"🗄️  Restored {self.shared_database} from the golden database ({restored['method']}, {restored['ms']:.1f}ms)")
+
+    def _reset_database(self, worker):
+        """Restore the golden database under the suite about to run on a worker slot"""
+        if not self._reset_per_job:
+            return None
+        instance = self._instance_for(worker)
+        target = instance.database if instance else self.shared_database
+        try:
+            return self.golden.restore(target, self.db_restore)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Could not restore {target} from the golden database: {e}")
+            return None
+
+    def close(self):
+        """Tear down resources owned by the runner"""
+        if self.telemetry is not None:
+            self.telemetry.close()
+        if self.coordinator is not None:
+            self.coordinator.close()
+        if self.server_pool is not None:
+            self.server_pool.stop()
+
+    def _prepare_outputs(self, jobs):
+        """Clear the k6 point files and histograms left by earlier runs of these jobs"""
+        for job in jobs:
+            output = k6_output_path(job.cmd)
+            if output:
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+                for path in (output, sketch_path(output)):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def run_distributed(self, jobs, priority):
+        """Hand a job graph to remote workers through the coordinator; dependencies, skips and cache hits stay here"""
+        batch = len(self.schedule_stats)
+        pending = sorted(jobs, key=priority)
+        passed, failed = set(), set()
+        submitted = {}
+        results = []
+        stopped = []
+        unattended_since = None
+
+        if not self.coordinator.live_workers():
+            print(f"   ⏳ No workers yet - jobs wait on {self.coordinator.url} until one joins")
+        while pending or submitted:
+            if self.coordinator.live_workers():
+                unattended_since = None
+            elif unattended_since is None:
+                unattended_since = time.time()
+            elif time.time() - unattended_since > self.worker_wait:
+                results.extend(self._abandon_remote(submitted, pending, failed))
+                break
+
+            for job in [j for j in pending if self._in_stopped_scope(j, stopped)]:
+                pending.remove(job)
+                job, result = self._record_cancelled(job, None, stopped)
+                results.append(result)
+                failed.add(job.id)
+
+            blocked = [job for job in pending if job.deps & failed]
+            while blocked:
+                for job in blocked:
+                    pending.remove(job)
+                    failed.add(job.id)
+                    results.append(self._record_skipped(job))
+                blocked = [job for job in pending if job.deps & failed]
+
+            replayed = False
+            for job in [j for j in pending if j.deps <= passed]:
+                pending.remove(job)
+                if job.cached_result is not None:
+                    results.append(self._record_cached(job))
+                    passed.add(job.id)
+                    replayed = True
+                    continue
+                descriptor_id = f"{batch}-{job.id}"
+                submitted[descriptor_id] = job
+                self.coordinator.submit({
+                    'id': descriptor_id,
+                    'label': self._job_label(job),
+                    'command': list(job.command),
+                    'blocking': job.blocking,
+                    'cpu_cost': job.cpu_cost,
+                    'mem_cost': job.mem_cost
+                })
+
+            if not submitted:
+                if replayed:
+                    continue
+                break
+            for descriptor, payload in self.coordinator.wait_results(SAMPLE_INTERVAL):
+                job = submitted.pop(descriptor['id'])
+                result = self._accept_remote(job, payload)
+                results.append(result)
+                (passed if result['success'] or not job.blocking else failed).add(job.id)
+                if result['success'] and job.cache_key and not result.get('retries'):
+                    self.cache.store(job.cache_key, result)
+                if self.fail_fast and job.blocking and not result['success']:
+                    stopped.append(self._stop_scope(job, result))
+                    # Jobs already leased run to completion on their workers; only queued ones are dropped
+                    withdrawn = self.coordinator.withdraw({descriptor_id for descriptor_id, other in submitted.items()
+                                                           if self._in_stopped_scope(other, stopped)})
+                    dropped = sum(1 for other in pending if self._in_stopped_scope(other, stopped))
+                    print(f"   🛑 FAIL-FAST ({self.fail_fast}): {stopped[-1]['reason']} - "
+                          f"dropping {len(withdrawn) + dropped} queued jobs")
+                    for descriptor_id in withdrawn:
+                        other, cancelled = self._record_cancelled(submitted.pop(descriptor_id), None, stopped)
+                        results.append(cancelled)
+                        failed.add(other.id)
+                    self.write_partial_report(stopped[-1])
+
+        return results
+
+    def _abandon_remote(self, submitted, pending, failed):
+        """Fail every job still outstanding once no worker has been alive for --worker-wait seconds"""
+        error = f"No live worker on {self.coordinator.url} for {self.worker_wait:.0f}s"
+        print(f"   💀 {error} - failing {len(submitted) + len(pending)} outstanding jobs")
+        self.coordinator.abandon(set(submitted))
+        results = []
+        for job in list(submitted.values()) + pending:
+            cmd, component, tier, test_type = job.command
+            key = self._reserve_key(component, tier, test_type)
+            results.append(self._record_error(key, cmd, component, tier, test_type, 0.0, error))
+            failed.add(job.id)
+        submitted.clear()
+        pending.clear()
+        return results
+
+    def _accept_remote(self, job, payload):
+        """Store a result a worker sent back, along with the report files post-run merging reads"""
+        cmd, component, tier, test_type = job.command
+        key = self._reserve_key(component, tier, test_type)
+        if 'error' in payload:
+            return self._record_error(key, cmd, component, tier, test_type, 0.0,
+                                      f"{payload['error']} (on {payload['node']})")
+
+        roots = [os.path.realpath(root) for root in
+                 ('test-results', SHARD_DIR, K6_OUTPUT_DIR, os.path.join(self._command_cwd(component), SHARD_DIR))]
+        for path, content in payload['artifacts'].items():
+            target = os.path.realpath(path)
+            if not any(target.startswith(root + os.sep) for root in roots):
+                print(f"   ⚠️  Ignoring artifact {path!r} from {payload['node']} - outside the report directories")
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w') as f:
+                f.write(content)
+        self.test_records.add(payload['test_outcomes'])
+        result = payload['result']
+        self._run_outcomes[id(result)] = payload['test_outcomes']
+        # The worker's clock is not ours; its last attempt is taken to have finished as the result arrived
+        attempts = [result] + [retry for retry in result.get('retries', []) if retry.get('finished_at')]
+        shift = time.time() - max(attempt['finished_at'] for attempt in attempts)
+        for attempt in attempts:
+            attempt['finished_at'] += shift
+        result['node'] = payload['node']
+        self.results[key] = result
+
+        status = "✅ PASSED" if result['success'] else "⏱️ TIMEOUT" if result['timed_out'] else "❌ FAILED"
+        print(f"   {status} {component} ({tier}) on {payload['node']} - {result['duration']:.2f}s")
+        return result
+
+    def serve_worker(self, url, name=None):
+        """Run jobs leased from a coordinator one at a time until it has no more work"""
+        name = name or socket.gethostname()
+        # Workers on one machine share test-results/, so their logs and reports are kept apart by name
+        self.key_prefix = f"{name}_"
+        # The coordinator keeps the run's tests.jsonl; a worker only hands each job's records back
+        self.test_records = TestRecordLog(None, self.test_records.slowest_count)
+        self.start_server_pool(1)
+        self.prepare_fixtures(1)
+        return run_worker(url, self.execute_remote, name, self.coordinator_token)
+
+    def execute_remote(self, descriptor):
+        """Run one leased job with the local retries, accounting and admission, and package what it produced"""
+        job = Job(descriptor['id'], tuple(descriptor['command']))
+        job.blocking = descriptor['blocking']
+        job.cpu_cost, job.mem_cost = descriptor['cpu_cost'], descriptor['mem_cost']
+        self._prepare_outputs([job])
+        [result] = asyncio.run(self.run_graph_async([job], 1, lambda j: j.id))
+        outcomes, self._run_outcomes = self._run_outcomes.get(id(result), []), {}
+        return {'result': result, 'test_outcomes': outcomes, 'artifacts': self._artifacts(result)}
+
+    def _artifacts(self, result):
+        """Contents of the k6 sketch and shard reports a command wrote, keyed by path from the repo root"""
+        paths = [result['latency']['sketch']] if result.get('latency') else []
+        cwd = self._command_cwd(result['component'])
+        for token in shlex.split(result['command']):
+            value = token.split('=', 1)[-1]
+            if value.startswith(SHARD_DIR):
+                paths.extend(glob.glob(os.path.join(cwd, value.replace('[hash]', '*'))))
+        artifacts = {}
+        for path in paths:
+            try:
+                with open(path) as f:
+                    artifacts[os.path.relpath(path)] = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+        return artifacts
+
+    def run_jobs(self, jobs, workers, reorder=True):
+        """Plan a job graph from duration history, run it and compare the prediction with reality"""
+        if not jobs:
+            return []
+        if any(stop['scope'] == 'global' for stop in self.fail_fast_events):
+            print(f"🛑 Skipping {len(jobs)} jobs - the run was stopped by --fail-fast")
+            return []
+
+        if self.coordinator is not None:
+            # Workers own app servers and databases; the plan assumes one slot per worker that has joined
+            workers = max(self.coordinator.live_workers(), 1)
+        else:
+            self.start_server_pool(workers)
+            self.prepare_fixtures(workers)
+            self._prepare_outputs(jobs)
+
+        for job in jobs:
+            job.blocking = job.cmd not in self.quarantine_lane
+            if self.cache.cacheable(job.command):
+                job.cache_key = self.cache.key_for(job.command)
+                if self.use_cache:
+                    job.cached_result = self.cache.lookup(job.cache_key)
+            if job.cached_result is not None:
+                job.estimate = 0.0
+            else:
+                job.estimate = self._estimate(job.cmd, job.test_type)
+            job.cpu_cost, job.mem_cost = self._command_cost(job.cmd)
+        assign_ranks(jobs)
+
+        if reorder:
+            def priority(job):
+                return (-job.rank, job.id)
+        else:
+            def priority(job):
+                return job.id
+
+        predicted = simulate_schedule(jobs, workers, priority)
+        print(f"📐 Scheduling {len(jobs)} jobs on {workers} workers - predicted finish in {predicted:.1f}s")
+        if self.telemetry is not None:
+            self.telemetry.batch_started('+'.join(sorted({job.tier for job in jobs})), len(jobs), workers, predicted)
+        batch_start = time.time()
+        decisions = len(self.admission.decisions) if self.admission is not None else 0
+
+        if self.coordinator is not None:
+            results = self.run_distributed(jobs, priority)
+        else:
+            results = asyncio.run(self.run_graph_async(jobs, workers, priority))
+
+        actual = time.time() - batch_start
+        predicted_finish = {job.cmd: job.predicted_finish for job in jobs}
+        for result in results:
+            result['predicted_finish'] = predicted_finish.get(result['command'])
+            result['actual_finish'] = result['finished_at'] - batch_start
+        tier = '+'.join(sorted({job.tier for job in jobs}))
+        # Merged runs go on the timeline as the one command that actually ran
+        self.timeline.add_batch(tier, batch_start, batch_start + actual, workers, jobs, results,
+                                self._run_outcomes if self.trace else None)
+        self._run_outcomes = {}
+        results = self.split_coalesced(results)
+
+        self.schedule_stats.append({
+            'tier': tier,
+            'jobs': len(jobs),
+            'workers': workers,
+            'predicted_makespan': predicted,
+            'actual_makespan': actual,
+            'throttled': self.admission.decisions[decisions:] if self.admission is not None else []
+        })
+        print(f"   📐 Batch finished in {actual:.1f}s (predicted {predicted:.1f}s)")
+        if self.telemetry is not None:
+            self.telemetry.batch_finished(actual)
+        return results
+
+    def run_commands(self, commands, parallel=True, max_workers=6):
+        """Run a batch of independent commands with the configured execution engine"""
+        jobs = [Job(index, command) for index, command in enumerate(commands)]
+        workers = (self.workers or max_workers) if parallel else 1
+        return self.run_jobs(jobs, workers, reorder=parallel)
+
+    def load_impact(self, ref):
+        """Map files changed since a git ref to the suite targets they exercise"""
+        started = time.time()
+        try:
+            index = ImpactIndex(os.path.join(self.cache_dir, 'impact-index.json'))
+            paths = changed_files(ref)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️  Could not diff against {ref}, running full tiers: {e}")
+            return None
+
+        targets, unmapped = index.select(paths)
+        elapsed = (time.time() - started) * 1000
+        print(f"🎯 {len(paths)} files changed since {ref} -> {len(targets)} suites impacted ({elapsed:.0f}ms)")
+        if unmapped:
+            print(f"   Not in the impact index: {', '.join(unmapped[:5])}{' ...' if len(unmapped) > 5 else ''}")
+        return {'index': index, 'paths': paths, 'targets': targets, 'unmapped': unmapped}
+
+    def select_commands(self, commands):
+        """Narrow a tier's commands to the suites impacted by --changed-since"""
+        if self.impact is None:
+            return commands
+        if self.impact['unmapped']:
+            print("🎯 Unmapped changes - running the full tier")
+            return commands
+
+        selected = self.impact['index'].narrow(commands, self.impact['targets'])
+        print(f"🎯 Running {len(selected)}/{len(commands)} commands impacted by the change")
+        return selected
+
+    def _spec_estimate(self, key):
+        entry = self.history.commands.get(key)
+        return entry['ewma'] if entry else DEFAULT_SPEC_ESTIMATE
+
+    def shard_commands(self, commands):
+        """Replace per-spec Cypress and per-project Playwright commands with duration-balanced shards"""
+        if not self.shards:
+            return commands
+
+        remaining = []
+        cypress_pools = {}
+        playwright_pools = {}
+        for command in commands:
+            cmd, component, tier, test_type = command
+            specs = cypress_specs(cmd)
+            project = playwright_project(cmd)
+            if specs is not None:
+                cypress_pools.setdefault((component, tier), {'specs': set(), 'types': set()})
+                cypress_pools[(component, tier)]['specs'].update(specs)
+                cypress_pools[(component, tier)]['types'].add(test_type)
+            elif project is not None:
+                name, explicit = project
+                pool = playwright_pools.setdefault((name, component, tier), {'specs': set(), 'types': set()})
+                pool['specs'].update(explicit or discover_specs(PLAYWRIGHT_SPEC_GLOBS))
+                pool['types'].add(test_type)
+            else:
+                remaining.append(command)
+
+        sharded = []
+        for (component, tier), pool in cypress_pools.items():
+            # Tier 1 owns every discovered spec unless --changed-since narrowed it
+            if tier == 'tier1' and self.impact is None:
+                pool['specs'].update(discover_specs(CYPRESS_SPEC_GLOB))
+            test_type = pool['types'].pop() if len(pool['types']) == 1 else 'e2e'
+            shards = balance_shards(sorted(pool['specs']), self.shards,
+                                    lambda spec: self._spec_estimate(cypress_history_key(spec)))
+            for specs in shards:
+                self.shard_count += 1
+                sharded.append((cypress_shard_command(specs, self.shard_count), component, tier, test_type))
+
+        for (name, component, tier), pool in playwright_pools.items():
+            test_type = pool['types'].pop() if len(pool['types']) == 1 else 'e2e'
+            shards = balance_shards(sorted(pool['specs']), self.shards,
+                                    lambda spec: self._spec_estimate(playwright_history_key(name, spec)))
+            for specs in shards:
+                self.shard_count += 1
+                sharded.append((playwright_shard_command(name, specs, self.shard_count), component, tier, test_type))
+
+        if sharded:
+            print(f"🧩 Split {len(commands) - len(remaining)} commands into {len(sharded)} balanced shards")
+        return sharded + remaining
+
+    def merge_shard_results(self):
+        """Merge per-shard JUnit/JSON output into single reports and learn per-spec durations"""
+        if not self.shards or not os.path.isdir(SHARD_DIR):
+            return []
+
+        specs = []
+        for tool, project, spec, summary in collect_spec_timings():
+            key = cypress_history_key(spec) if tool == 'cypress' else playwright_history_key(project, spec)
+            if summary['tests']:
+                self.history.update(key, summary['duration'])
+            specs.append({
+                'tool': tool,
+                'project': project,
+                'spec': spec,
+                'tests': summary['tests'],
+                'failures': summary['failures'],
+                'skipped': summary['skipped'],
+                'duration': summary['duration']
+            })
+
+        cypress_reports = sorted(glob.glob(os.path.join(SHARD_DIR, 'cypress-*', '*.xml')))
+        playwright_reports = sorted(glob.glob(os.path.join(SHARD_DIR, 'playwright-*.xml')))
+        if cypress_reports:
+            merge_junit(cypress_reports, 'test-results/cypress-shards.xml', name='cypress')
+        if playwright_reports:
+            merge_junit(playwright_reports, 'test-results/playwright-shards.xml', name='playwright')
+        self.merge_playwright_json(sorted(glob.glob(os.path.join(SHARD_DIR, 'playwright-*.json'))),
+                                   'test-results/playwright-shards.json')
+        return specs
+
+    def merge_latency(self):
+        """Merge every k6 run's histograms into one percentile table per endpoint"""
+        merged = None
+        for result in self.results.values():
+            sketch = result.get('latency', {}).get('sketch')
+            if not sketch:
+                continue
+            try:
+                with open(sketch) as f:
+                    metrics = K6Metrics.from_dict(json.load(f))
+            except (OSError, ValueError):
+                continue
+            merged = metrics if merged is None else merged.merge(metrics)
+        return merged.summary() if merged is not None else None
+
+    def check_performance(self):
+        """Compare this run's k6 and Lighthouse numbers with the rolling baseline, then add them to it"""
+        runs = []
+        for result in self.results.values():
+            if result.get('cached'):
+                continue
+            if result.get('latency'):
+                runs.append((result, k6_samples(result['latency']['scenario'], result['latency'])))
+                continue
+            report_path = lighthouse_output_path(result['command'])
+            if result['success'] and report_path and os.path.exists(report_path):
+                try:
+                    runs.append((result, lighthouse_samples(report_path)))
+                except (OSError, ValueError) as e:
+                    print(f"⚠️  Could not read the Lighthouse report {report_path}: {e}")
+        samples = [sample for _, run_samples in runs for sample in run_samples]
+        if not samples:
+            return None
+
+        commit = current_commit()
+        baseline = PerfBaseline()
+        try:
+            regressions = baseline.check(commit, samples, self.perf_tolerance, self.perf_window)
+            # Only runs that completed become part of the baseline
+            baseline.record(commit, [sample for result, run_samples in runs if result['success']
+                                     for sample in run_samples])
+        finally:
+            baseline.close()
+        return {
+            'commit': commit,
+            'samples': len(samples),
+            'tolerance': self.perf_tolerance,
+            'window': self.perf_window,
+            'regressions': regressions
+        }
+
+    def merge_playwright_json(self, paths, output_path):
+        """Combine Playwright JSON reports from several shards into one"""
+        if not paths:
+            return
+        merged = {'config': None, 'suites': [], 'errors': [], 'stats': {}}
+        for path in paths:
+            try:
+                with open(path) as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                continue
+            merged['config'] = merged['config'] or report.get('config')
+            merged['suites'].extend(report.get('suites', []))
+            merged['errors'].extend(report.get('errors', []))
+            for name, value in report.get('stats', {}).items():
+                if isinstance(value, (int, float)):
+                    merged['stats'][name] = merged['stats'].get(name, 0) + value
+        with open(output_path, 'w') as f:
+            json.dump(merged, f)
+
+    def tier1_commands(self):
+        """Tier 1 command list as (command, component, tier, test_type) tuples"""
+        return [
             # Frontend Tests (Cypress)
             ("npx cypress run --spec 'cypress/e2e/video-recording.cy.js' --headless", "frontend", "tier1", "e2e"),
             ("npx cypress run --spec 'cypress/e2e/content-requests.cy.js' --headless", "frontend", "tier1", "e2e"),
@@ -96,22 +1370,18 @@ class MarketScaleTestRunner:
             # API Tests (Newman)
             ("newman run postman/collections/marketscale-api.json -e postman/environments/local.json", "api", "tier1", "contract"),
         ]
-        
-        if parallel:
-            with ThreadPoolExecutor(max_workers=6) as executor:
-                futures = [executor.submit(self.run_command, cmd, comp, tier, test_type) for cmd, comp, tier, test_type in commands]
-                for future in as_completed(futures):
-                    future.result()
-        else:
-            for cmd, comp, tier, test_type in commands:
-                self.run_command(cmd, comp, tier, test_type)
 
-    def run_tier2_important(self, parallel=True):
-        """Run Tier 2 Important tests - Schema changes"""
-        print("\n⚡ TIER 2 IMPORTANT TESTS (Schema Changes)")
+    def run_tier1_critical(self, parallel=True):
+        """Run Tier 1 Critical tests - Every commit"""
+        print("\n🔥 TIER 1 CRITICAL TESTS (Every Commit)")
         print("=" * 60)
         
-        commands = [
+        commands = self.coalesce_tier(self.quarantine_tier(self.shard_commands(self.select_commands(self.tier1_commands()))))
+        self.run_commands(commands, parallel=parallel, max_workers=6)
+
+    def tier2_commands(self):
+        """Tier 2 command list as (command, component, tier, test_type) tuples"""
+        return [
             # Cross-browser Testing (Playwright)
             ("npx playwright test --project=chromium", "cross-browser", "tier2", "e2e"),
             ("npx playwright test --project=firefox", "cross-browser", "tier2", "e2e"),
@@ -127,25 +1397,28 @@ class MarketScaleTestRunner:
             # Visual Regression Tests
             ("npx playwright test --grep='visual regression'", "visual", "tier2", "regression"),
         ]
-        
-        if parallel:
-            with ThreadPoolExecutor(max_workers=6) as executor:
-                futures = [executor.submit(self.run_command, cmd, comp, tier, test_type) for cmd, comp, tier, test_type in commands]
-                for future in as_completed(futures):
-                    future.result()
-        else:
-            for cmd, comp, tier, test_type in commands:
-                self.run_command(cmd, comp, tier, test_type)
 
-    def run_tier3_secondary(self, parallel=True):
-        """Run Tier 3 Secondary tests - Weekly"""
-        print("\n TIER 3 SECONDARY TESTS (Weekly)")
+    def run_tier2_important(self, parallel=True):
+        """Run Tier 2 Important tests - Schema changes"""
+        print("\n⚡ TIER 2 IMPORTANT TESTS (Schema Changes)")
         print("=" * 60)
         
-        commands = [
+        commands = self.coalesce_tier(self.quarantine_tier(self.shard_commands(self.select_commands(self.tier2_commands()))))
+        self.run_commands(commands, parallel=parallel, max_workers=6)
+
+    def load_test_command(self, script, output):
+        """k6 command for a load script, or the built-in Python driver where k6 is missing or not wanted"""
+        if self.load_driver == 'k6' or (self.load_driver == 'auto' and shutil.which('k6')):
+            return f"k6 run --out json={output} {script}"
+        model = f" --model={self.load_model}" if self.load_model != 'closed' else ''
+        return f"{shlex.quote(sys.executable)} -m {LOADGEN_MODULE} {script} --out json={output}{model}"
+
+    def tier3_commands(self):
+        """Tier 3 command list as (command, component, tier, test_type) tuples"""
+        return [
             # Performance Testing (k6)
-            ("k6 run k6-tests/video-processing-load.js", "performance", "tier3", "load"),
-            ("k6 run k6-tests/api-stress-test.js", "performance", "tier3", "stress"),
+            (self.load_test_command('k6-tests/video-processing-load.js', 'test-results/k6/tier3-video-processing-load.json.gz'), "performance", "tier3", "load"),
+            (self.load_test_command('k6-tests/api-stress-test.js', 'test-results/k6/tier3-api-stress-test.json.gz'), "performance", "tier3", "stress"),
             
             # Security Testing
             ("php artisan test --testsuite=Security", "security", "tier3", "security"),
@@ -156,15 +1429,14 @@ class MarketScaleTestRunner:
             # End-to-End Workflows
             ("npx cypress run --spec 'cypress/e2e/complete-workflow.cy.js' --headless", "e2e", "tier3", "workflow"),
         ]
+
+    def run_tier3_secondary(self, parallel=True):
+        """Run Tier 3 Secondary tests - Weekly"""
+        print("\n TIER 3 SECONDARY TESTS (Weekly)")
+        print("=" * 60)
         
-        if parallel:
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                futures = [executor.submit(self.run_command, cmd, comp, tier, test_type) for cmd, comp, tier, test_type in commands]
-                for future in as_completed(futures):
-                    future.result()
-        else:
-            for cmd, comp, tier, test_type in commands:
-                self.run_command(cmd, comp, tier, test_type)
+        commands = self.coalesce_tier(self.quarantine_tier(self.shard_commands(self.select_commands(self.tier3_commands()))))
+        self.run_commands(commands, parallel=parallel, max_workers=4)
 
     def run_smoke_tests(self):
         """Run quick smoke tests for basic functionality"""
@@ -177,18 +1449,28 @@ class MarketScaleTestRunner:
             ("curl -f http://localhost:8000/api/health", "smoke", "smoke", "health"),
         ]
         
-        for cmd, comp, tier, test_type in commands:
-            self.run_command(cmd, comp, tier, test_type)
+        self.run_commands(self.quarantine_tier(commands), parallel=False)
+
+    def build_regression_graph(self, gated=False):
+        """Build one job graph over all tiers, optionally gating each tier on the previous one passing"""
+        jobs = []
+        previous = []
+        for commands in (self.tier1_commands(), self.tier2_commands(), self.tier3_commands()):
+            commands = self.coalesce_tier(self.quarantine_tier(self.shard_commands(self.select_commands(commands))))
+            tier_jobs = [Job(len(jobs) + index, command, deps=previous if gated else ())
+                         for index, command in enumerate(commands)]
+            jobs.extend(tier_jobs)
+            previous = [job.id for job in tier_jobs]
+        return jobs
 
-    def run_regression_suite(self):
+    def run_regression_suite(self, parallel=True, gated=False):
         """Run full regression test suite"""
         print("\n🔄 FULL REGRESSION SUITE")
         print("=" * 60)
         
-        # Run all tiers
-        self.run_tier1_critical(parallel=True)
-        self.run_tier2_important(parallel=True)
-        self.run_tier3_secondary(parallel=True)
+        # Pipeline all tiers through one global pool instead of tier-by-tier barriers
+        jobs = self.build_regression_graph(gated=gated)
+        self.run_jobs(jobs, (self.workers or 6) if parallel else 1, reorder=parallel)
 
     def run_performance_tests(self):
         """Run comprehensive performance testing"""
@@ -196,13 +1478,12 @@ class MarketScaleTestRunner:
         print("=" * 60)
         
         commands = [
-            ("k6 run k6-tests/video-processing-load.js", "performance", "performance", "load"),
-            ("k6 run k6-tests/api-stress-test.js", "performance", "performance", "stress"),
+            (self.load_test_command('k6-tests/video-processing-load.js', 'test-results/k6/performance-video-processing-load.json.gz'), "performance", "performance", "load"),
+            (self.load_test_command('k6-tests/api-stress-test.js', 'test-results/k6/performance-api-stress-test.json.gz'), "performance", "performance", "stress"),
             ("npx lighthouse http://localhost:8000 --output=json --output-path=./test-results/lighthouse.json", "performance", "performance", "lighthouse"),
         ]
         
-        for cmd, comp, tier, test_type in commands:
-            self.run_command(cmd, comp, tier, test_type)
+        self.run_commands(commands, parallel=False)
 
     def run_security_tests(self):
         """Run security testing suite"""
@@ -214,19 +1495,32 @@ class MarketScaleTestRunner:
             ("npx cypress run --spec 'cypress/e2e/security-tests.cy.js' --headless", "security", "security", "e2e"),
         ]
         
-        for cmd, comp, tier, test_type in commands:
-            self.run_command(cmd, comp, tier, test_type)
+        self.run_commands(self.quarantine_tier(commands), parallel=False)
 
     def generate_report(self):
         """Generate comprehensive test report"""
         total_time = time.time() - self.start_time
-        successful = sum(1 for r in self.results.values() if r['success'])
-        total = len(self.results)
+        spec_results = self.merge_shard_results()
+        latency = self.merge_latency()
+        performance = self.check_performance()
+        flaky = self.flaky_summary()
+        toolchain = self.toolchain_summary()
+        slowest = self.slowest_summary()
+        self.test_records.close()
+        tests = dict(self.test_records.counts, records=TEST_RECORDS)
+        timeline = self.timeline.summary()
+        if self.trace:
+            timeline['trace'] = self.timeline.write_trace(self.trace, {'platform': self.test_report['platform'],
+                                                                       'timestamp': self.test_report['timestamp']})
+        # The quarantine lane is reported on its own and never counts towards the pass rate
+        blocking = [r for r in self.results.values() if not r.get('quarantined')]
+        successful = sum(1 for r in blocking if r['success'])
+        total = len(blocking)
         
         # Calculate metrics by tier
         tier_metrics = {}
         for tier in ['tier1', 'tier2', 'tier3', 'smoke', 'performance', 'security']:
-            tier_tests = [r for r in self.results.values() if r['tier'] == tier]
+            tier_tests = [r for r in blocking if r['tier'] == tier]
             if tier_tests:
                 tier_metrics[tier] = {
                     'total': len(tier_tests),
@@ -236,67 +1530,115 @@ class MarketScaleTestRunner:
                     'avg_duration': sum(r['duration'] for r in tier_tests) / len(tier_tests)
                 }
         
-        # Generate HTML report
-        html_report = self.generate_html_report(total_time, successful, total, tier_metrics)
-        
         # Save reports
         os.makedirs('test-results', exist_ok=True)
         
         with open('test-results/test-report.json', 'w') as f:
             json.dump({
+                'timestamp': self.test_report['timestamp'],
                 'summary': {
                     'total_tests': total,
                     'successful': successful,
                     'failed': total - successful,
-                    'success_rate': (successful/total)*100,
-                    'total_time': total_time
+                    'success_rate': (successful/total)*100 if total else 0,
+                    'total_time': total_time,
+                    'cached': sum(1 for r in self.results.values() if r.get('cached'))
                 },
                 'tier_metrics': tier_metrics,
+                'schedule': self.schedule_stats,
+                'specs': spec_results,
+                'latency': latency,
+                'performance_baseline': performance,
+                'flaky': flaky,
+                'fail_fast': self.fail_fast_events,
+                'toolchain': toolchain,
+                'tests': tests,
+                'slowest_tests': slowest,
+                'timeline': timeline,
                 'test_results': self.results
             }, f, indent=2)
         
-        with open('test-results/test-report.html', 'w') as f:
-            f.write(html_report)
+        self.record_history(spec_results, tier_metrics)
+        
+        # Learn command durations for the next run's scheduling
+        self.history.ingest_report('test-results/test-report.json')
+        self.history.save()
+        self.cache.save()
+        
+        self.write_html_report('test-results/test-report.html', total_time, successful, total, tier_metrics,
+                               spec_results, latency, performance, slowest)
         
         return {
             'total_tests': total,
             'successful': successful,
             'failed': total - successful,
-            'success_rate': (successful/total)*100,
+            'success_rate': (successful/total)*100 if total else 0,
             'total_time': total_time,
-            'tier_metrics': tier_metrics
+            'cached': sum(1 for r in self.results.values() if r.get('cached')),
+            'tier_metrics': tier_metrics,
+            'schedule': self.schedule_stats,
+            'latency': latency,
+            'flaky': flaky,
+            'fail_fast': self.fail_fast_events,
+            'toolchain': toolchain,
+            'tests': tests,
+            'slowest_tests': slowest,
+            'timeline': timeline,
+            'cancelled': sum(1 for r in self.results.values() if r.get('cancelled')),
+            'perf_regressions': performance['regressions'] if performance else []
         }
 
-    def generate_html_report(self, total_time, successful, total, tier_metrics):
-        """Generate HTML test report"""
+    def slowest_summary(self):
+        """The run's longest individual tests across every Cypress, Playwright and PHPUnit report"""
+        return [{'test': test_name(outcome), 'tool': outcome['tool'], 'project': outcome['project'],
+                 'suite': outcome.get('suite'), 'status': outcome['status'], 'duration': round(outcome['duration'], 3),
+                 'retries': outcome.get('retries', 0)}
+                for outcome in self.test_records.slowest()]
+
+    def toolchain_summary(self):
+        """Resolved Node tool binaries and the npx startup time the run skipped by launching them directly"""
+        direct = [result for result in self.results.values() if result.get('startup_saved')]
+        return dict(self.toolchain.describe(), commands=len(direct),
+                    startup_saved=round(sum(result['startup_saved'] for result in direct), 2))
+
+    def flaky_summary(self):
+        """Tests that needed a retry this run, the quarantine list and how the quarantine lane did"""
+        recovered = self.test_records.flaky
+        return {
+            'retries': self.retries,
+            'quarantine_score': self.quarantine_score,
+            'flaky_this_run': [{'tool': outcome['tool'], 'project': outcome['project'], 'test': test_name(outcome)}
+                               for outcome in recovered],
+            'quarantined': [{'tool': tool, 'project': project, 'test': f"{file} › {title}", **score}
+                            for (tool, project, file, title), score in sorted(self.quarantined.items(),
+                                                                               key=lambda item: -item[1]['score'])],
+            'lane': [{'command': r['command'], 'success': r['success']}
+                     for r in self.results.values() if r.get('quarantined')]
+        }
+
+    def record_history(self, spec_results, tier_metrics):
+        """Append every execution and spec timing to the results database"""
+        try:
+            store = ResultsStore('tiered', label=','.join(tier_metrics))
+            for key, result in self.results.items():
+                store.add_execution(key, result)
+            for spec in spec_results:
+                status = 'failed' if spec['failures'] else 'passed'
+                store.add_test_case(spec['tool'], spec['project'], spec['spec'], status, spec['duration'])
+            for outcome in self.test_records:
+                store.add_test_case(outcome['tool'], outcome['project'], test_name(outcome), outcome['status'],
+                                    outcome['duration'])
+            store.close()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not record results in the history database: {e}")
+
+    def write_html_report(self, path, total_time, successful, total, tier_metrics, spec_results,
+                          latency=None, performance=None, slowest=None):
+        """Stream the HTML test report to disk, with paged per-command and per-spec tables"""
         success_rate = (successful/total)*100 if total > 0 else 0
         
-        html = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <title>MarketScale QA Test Report</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }}
-        .container {{ max-width: 1200px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-        .header {{ text-align: center; margin-bottom: 30px; }}
-        .summary {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px; }}
-        .metric {{ background: #f8f9fa; padding: 20px; border-radius: 8px; text-align: center; }}
-        .metric h3 {{ margin: 0 0 10px 0; color: #333; }}
-        .metric .value {{ font-size: 2em; font-weight: bold; color: #007bff; }}
-        .tier-section {{ margin-bottom: 30px; }}
-        .tier-header {{ background: #007bff; color: white; padding: 10px 20px; border-radius: 5px 5px 0 0; }}
-        .tier-content {{ background: #f8f9fa; padding: 20px; border-radius: 0 0 5px 5px; }}
-        .test-item {{ display: flex; justify-content: space-between; align-items: center; padding: 10px; margin: 5px 0; background: white; border-radius: 5px; }}
-        .test-item.passed {{ border-left: 4px solid #28a745; }}
-        .test-item.failed {{ border-left: 4px solid #dc3545; }}
-        .status {{ font-weight: bold; }}
-        .status.passed {{ color: #28a745; }}
-        .status.failed {{ color: #dc3545; }}
-    </style>
-</head>
-<body>
-    <div class="container">
+        with HtmlReportWriter(path, 'MarketScale QA Test Report') as report:
+            report.write(f"""
         <div class="header">
             <h1>🎬 MarketScale QA Test Report</h1>
             <p>Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
@@ -324,18 +1666,14 @@ class MarketScaleTestRunner:
                 <div class="value">{total_time:.2f}s</div>
             </div>
         </div>
-"""
-        
-        # Add tier sections
-        for tier, metrics in tier_metrics.items():
-            tier_name = tier.replace('tier', 'Tier ').title()
-            html += f"""
-        <div class="tier-section">
-            <div class="tier-header">
-                <h2>{tier_name} Tests</h2>
-                <p>Success Rate: {metrics['success_rate']:.1f}% | Avg Duration: {metrics['avg_duration']:.2f}s</p>
-            </div>
-            <div class="tier-content">
+""")
+            
+            # Add tier sections
+            for tier, metrics in tier_metrics.items():
+                tier_name = tier.replace('tier', 'Tier ').title()
+                report.open_section(f"{tier_name} Tests",
+                                    f"Success Rate: {metrics['success_rate']:.1f}% | Avg Duration: {metrics['avg_duration']:.2f}s")
+                report.write(f"""
                 <div style="display: grid; grid-template-columns: repeat(4, 1fr); gap: 10px; margin-bottom: 20px;">
                     <div style="text-align: center; padding: 10px; background: white; border-radius: 5px;">
                         <strong>{metrics['total']}</strong><br>Total
@@ -350,16 +1688,102 @@ class MarketScaleTestRunner:
                         <strong>{metrics['success_rate']:.1f}%</strong><br>Success Rate
                     </div>
                 </div>
-            </div>
-        </div>
-"""
-        
-        html += """
-    </div>
-</body>
-</html>
-"""
-        return html
+""")
+                report.close_section()
+            
+            report.open_section("Command Results", "Click a column to sort; type to filter")
+            report.table(
+                [('Command', 'text'), ('Tier', 'text'), ('Component', 'text'), ('Type', 'text'),
+                 ('Status', 'status'), ('Duration (s)', 'num'), ('Worker', 'num'), ('User CPU (s)', 'num'),
+                 ('Sys CPU (s)', 'num'), ('Cores', 'num'), ('Peak RSS (MB)', 'num'), ('Voluntary CS', 'num'),
+                 ('Involuntary CS', 'num'), ('Blocks In', 'num'), ('Blocks Out', 'num')],
+                ((result['command'], result['tier'], result['component'], result['test_type'],
+                  'passed' if result['success'] else 'failed', round(result['duration'], 2), result.get('worker'))
+                 + tuple(result.get('resources', {}).get(field) for field in RESOURCE_FIELDS)
+                 for result in self.results.values())
+            )
+            report.close_section()
+            
+            if spec_results:
+                report.open_section("Spec Results", f"{len(spec_results)} specs from sharded runs")
+                report.table(
+                    [('Spec', 'text'), ('Tool', 'text'), ('Project', 'text'), ('Status', 'status'),
+                     ('Tests', 'num'), ('Failures', 'num'), ('Duration (s)', 'num')],
+                    ((spec['spec'], spec['tool'], spec['project'], 'failed' if spec['failures'] else 'passed',
+                      spec['tests'], spec['failures'], round(spec['duration'], 2))
+                     for spec in spec_results)
+                )
+                report.close_section()
+            
+            if slowest:
+                report.open_section("Slowest Tests", f"The {len(slowest)} longest tests of "
+                                                     f"{self.test_records.counts['total']} reported by "
+                                                     "the test runners")
+                report.table(
+                    [('Test', 'text'), ('Tool', 'text'), ('Project', 'text'), ('Suite', 'text'),
+                     ('Status', 'status'), ('Duration (s)', 'num'), ('Retries', 'num')],
+                    ((test['test'], test['tool'], test['project'], test['suite'], test['status'], test['duration'],
+                      test['retries']) for test in slowest)
+                )
+                report.close_section()
+            
+            reported = self.test_records.counts['total']
+            if reported:
+                report.open_section("All Tests", f"{reported} tests reported by the test runners; "
+                                                 "click a column to sort, type to filter")
+                report.table(
+                    [('Test', 'text'), ('Tool', 'text'), ('Project', 'text'), ('Suite', 'text'), ('Line', 'num'),
+                     ('Status', 'status'), ('Duration (s)', 'num'), ('Retries', 'num')],
+                    ((test_name(outcome), outcome['tool'], outcome['project'], outcome.get('suite'),
+                      outcome.get('line'), outcome['status'], round(outcome['duration'], 3), outcome.get('retries', 0))
+                     for outcome in self.test_records)
+                )
+                report.close_section()
+            
+            flaky = self.flaky_summary()
+            if flaky['flaky_this_run'] or flaky['quarantined']:
+                report.open_section("Flaky Tests",
+                                    f"{len(flaky['flaky_this_run'])} recovered on retry this run, "
+                                    f"{len(flaky['quarantined'])} quarantined in a non-blocking lane",
+                                    color='#fd7e14')
+                report.table(
+                    [('Test', 'text'), ('Tool', 'text'), ('Project', 'text'), ('State', 'text'),
+                     ('Flakiness', 'num'), ('Runs', 'num')],
+                    [(test['test'], test['tool'], test['project'], 'quarantined', test['score'], test['runs'])
+                     for test in flaky['quarantined']]
+                    + [(test['test'], test['tool'], test['project'], 'flaky this run', None, None)
+                       for test in flaky['flaky_this_run']]
+                )
+                report.close_section()
+            
+            if latency and latency['endpoints']:
+                rates = " | ".join(f"{metric}: {rate['rate'] * 100:.2f}% of {rate['count']}"
+                                   for metric, rate in latency['rates'].items())
+                report.open_section("Latency Percentiles (ms)",
+                                    f"{latency['points']} k6 samples{' | ' + rates if rates else ''}")
+                report.table(
+                    [('Endpoint', 'text'), ('Metric', 'text'), ('Requests', 'num'), ('p50', 'num'),
+                     ('p90', 'num'), ('p95', 'num'), ('p99', 'num'), ('Max', 'num')],
+                    ((row['endpoint'], row['metric'], row['count'], row['p50'], row['p90'], row['p95'],
+                      row['p99'], row['max']) for row in latency['endpoints'])
+                )
+                report.close_section()
+            
+            if performance and performance['regressions']:
+                report.open_section(
+                    "Performance Regressions",
+                    f"Worse than the median of the last {performance['window']} runs by more than "
+                    f"{performance['tolerance'] * 100:.0f}% and the run-to-run noise",
+                    color='#dc3545'
+                )
+                report.table(
+                    [('Scenario', 'text'), ('Endpoint', 'text'), ('Stage', 'text'), ('Metric', 'text'),
+                     ('Baseline', 'num'), ('Now', 'num'), ('Change', 'text')],
+                    ((regression['scenario'], regression['endpoint'], regression['stage'], regression['metric'],
+                      regression['baseline_median'], regression['value'], format_change(regression['change']))
+                     for regression in performance['regressions'])
+                )
+                report.close_section()
 
     def print_summary(self, report):
         """Print test execution summary"""
@@ -371,14 +1795,92 @@ class MarketScaleTestRunner:
         print(f"Failed: {report['failed']}")
         print(f"Success Rate: {report['success_rate']:.1f}%")
         print(f"Total Time: {report['total_time']:.2f}s")
+        if report['cached']:
+            print(f"Replayed from cache: {report['cached']}")
+        if report['cancelled']:
+            print(f"Cancelled by fail-fast: {report['cancelled']}")
+        if report['toolchain']['commands']:
+            print(f"🧰 Pre-resolved tool binaries: {report['toolchain']['commands']} commands skipped npx, "
+                  f"saving ~{report['toolchain']['startup_saved']:.2f}s of startup")
+        for stop in report['fail_fast']:
+            scope = f"{stop['scope']} {stop['value']}" if stop['value'] else stop['scope']
+            print(f"🛑 Fail-fast stopped {scope}: {stop['reason']}")
         
         print("\n📋 TIER BREAKDOWN:")
         for tier, metrics in report['tier_metrics'].items():
             print(f"  {tier.upper()}: {metrics['passed']}/{metrics['total']} passed ({metrics['success_rate']:.1f}%)")
         
+        if report['schedule']:
+            print("\n📐 SCHEDULE (predicted vs actual):")
+            for batch in report['schedule']:
+                print(f"  {batch['tier'].upper()}: {batch['jobs']} jobs on {batch['workers']} workers - "
+                      f"predicted {batch['predicted_makespan']:.1f}s, actual {batch['actual_makespan']:.1f}s")
+                if batch['throttled']:
+                    waited = sum(decision['waited'] for decision in batch['throttled'])
+                    print(f"    ⏸️  {len(batch['throttled'])} jobs held back by admission control for {waited:.1f}s")
+        
+        critical = report['timeline']['critical_path']
+        if critical['entries']:
+            print(f"\n⏳ CRITICAL PATH: {critical['length']:.1f}s - {critical['busy']:.1f}s running commands, "
+                  f"{critical['waiting']:.1f}s between them")
+            commands = [entry for entry in critical['entries'] if entry['kind'] == 'command']
+            for entry in sorted(commands, key=lambda entry: -entry['duration'])[:5]:
+                print(f"  {entry['duration']:7.2f}s  {entry['name']} ({entry['reason']})")
+            idle = [(name, stats) for name, stats in report['timeline']['workers'].items() if stats['gaps']]
+            for name, stats in sorted(idle, key=lambda item: -item[1]['idle'])[:5]:
+                longest = max(stats['gaps'], key=lambda gap: gap['duration'])
+                print(f"  💤 {name}: idle {stats['idle']:.1f}s ({stats['utilization'] * 100:.0f}% busy), "
+                      f"longest {longest['duration']:.1f}s in {longest['batch']}")
+        
+        measured = [result for result in self.results.values() if result.get('resources')]
+        if measured:
+            print("\n⚙️  RESOURCES (slowest commands; low cores with many voluntary switches means waiting):")
+            for result in sorted(measured, key=lambda result: -result['duration'])[:5]:
+                usage = result['resources']
+                print(f"  {result['duration']:7.2f}s  user {usage.get('user_cpu', '-')}s sys {usage.get('system_cpu', '-')}s "
+                      f"| {usage.get('avg_cores')} cores | {usage['peak_rss_mb']} MB "
+                      f"| {usage.get('voluntary_ctx_switches', '-')}/{usage.get('involuntary_ctx_switches', '-')} cs "
+                      f"| {result['command']}")
+        
+        if report['slowest_tests']:
+            print(f"\n🐢 SLOWEST TESTS (of {report['tests']['total']} reported):")
+            for test in report['slowest_tests'][:10]:
+                project = f"[{test['project']}] " if test['project'] else ''
+                print(f"  {test['duration']:7.2f}s  {test['tool']} {project}{test['test']}")
+        
+        if report['latency']:
+            print("\n⏱️  LATENCY (ms, all k6 requests):")
+            for row in report['latency']['endpoints']:
+                if row['endpoint'] == '*':
+                    print(f"  {row['metric']}: p50 {row['p50']} | p90 {row['p90']} | p95 {row['p95']} | "
+                          f"p99 {row['p99']} ({row['count']} samples)")
+        
+        flaky = report['flaky']
+        if flaky['flaky_this_run']:
+            print(f"\n🎲 FLAKY TESTS (failed, then passed on retry): {len(flaky['flaky_this_run'])}")
+            for test in flaky['flaky_this_run'][:10]:
+                print(f"  {test['tool']} {'[' + test['project'] + '] ' if test['project'] else ''}{test['test']}")
+        if flaky['quarantined']:
+            lane_passed = sum(1 for command in flaky['lane'] if command['success'])
+            print(f"\n🚧 QUARANTINED: {len(flaky['quarantined'])} tests with flakiness >= {flaky['quarantine_score']} "
+                  f"(lane {lane_passed}/{len(flaky['lane'])} passed, non-blocking)")
+            for test in flaky['quarantined'][:10]:
+                print(f"  {test['score']:.2f} over {test['runs']} runs - {test['tool']} {test['test']}")
+        
+        if report['perf_regressions']:
+            print(f"\n📉 PERFORMANCE REGRESSIONS ({len(report['perf_regressions'])}):")
+            for regression in report['perf_regressions']:
+                print(f"  {regression['scenario']} {regression['endpoint']} [stage {regression['stage']}] "
+                      f"{regression['metric']}: {regression['baseline_median']} -> {regression['value']} "
+                      f"({format_change(regression['change'])})")
+        
         print(f"\n📄 Detailed reports saved to:")
         print(f"  - test-results/test-report.json")
         print(f"  - test-results/test-report.html")
+        if report['tests']['total']:
+            print(f"  - {report['tests']['records']} ({report['tests']['total']} per-test records)")
+        if report['timeline'].get('trace'):
+            print(f"  - {report['timeline']['trace']} (open in https://ui.perfetto.dev or chrome://tracing)")
 
 def main():
     parser = argparse.ArgumentParser(description='MarketScale QA Test Runner')
@@ -388,10 +1890,103 @@ def main():
                        help='Run tests in parallel')
     parser.add_argument('--sequential', action='store_true', 
                        help='Run tests sequentially')
+    parser.add_argument('--engine', choices=['asyncio', 'thread'], default='asyncio',
+                       help='Execution engine (thread is the ThreadPoolExecutor fallback)')
+    parser.add_argument('--timeout', type=float, default=None,
+                       help='Per-command timeout in seconds (overrides per-type defaults)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker pool size (defaults to 6, or 4 for tier 3)')
+    parser.add_argument('--tier-gates', action='store_true',
+                       help='In regression mode, only start tier N after tier N-1 passes')
+    parser.add_argument('--log-compression', choices=['none', 'gzip', 'zstd'], default='none',
+                       help='Compress per-command logs under test-results/logs/')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Ignore cached results and run every command')
+    parser.add_argument('--cache-dir', default='.qa-cache',
+                       help='Directory for the runner caches')
+    parser.add_argument('--cache-max-mb', type=int, default=256,
+                       help='Result cache size limit before least recently used entries are evicted')
+    parser.add_argument('--changed-since', metavar='REF', default=None,
+                       help='Only run suites impacted by files changed since this git ref')
+    parser.add_argument('--shards', type=int, default=None,
+                       help='Split Cypress specs and Playwright projects into N duration-balanced shards')
+    parser.add_argument('--server-pool', action='store_true',
+                       help='Give every worker its own php artisan serve instance and SQLite database')
+    parser.add_argument('--server-base-port', type=int, default=8100,
+                       help='First port used by the app server pool')
+    parser.add_argument('--perf-tolerance', type=float, default=0.10,
+                       help='Relative change past the performance baseline that counts as a regression')
+    parser.add_argument('--perf-window', type=int, default=10,
+                       help='Number of past runs the performance baseline is taken from')
+    parser.add_argument('--fresh-db', action='store_true',
+                       help='Restore the migrated and seeded golden SQLite database before each suite')
+    parser.add_argument('--db-restore', choices=RESTORE_METHODS, default='auto',
+                       help='How the golden database is restored (auto tries reflink, then a plain copy)')
+    parser.add_argument('--load-driver', choices=['auto', 'k6', 'python'], default='auto',
+                       help='Run load scripts with k6 or the built-in asyncio driver (auto uses k6 when installed)')
+    parser.add_argument('--load-model', choices=['closed', 'open'], default='closed',
+                       help='For the Python driver: stage targets are virtual users (closed) or iterations/s (open)')
+    parser.add_argument('--no-coalesce', action='store_true',
+                       help='Run each per-project Playwright command on its own instead of one shared invocation')
+    parser.add_argument('--slowest-tests', type=int, default=SLOWEST_TESTS,
+                       help='Number of slowest individual tests listed in the report')
+    parser.add_argument('--profile-toolchain', action='store_true',
+                       help='Time each Node tool launch with and without npx (cached per lockfile) so the report '
+                            'and trace show tool startup and the npx time skipped')
+    parser.add_argument('--telemetry', metavar='[HOST:]PORT', default=None,
+                       help='Serve live queue, worker and CPU metrics (/metrics, /status, /events) on this port')
+    parser.add_argument('--telemetry-log', nargs='?', const=TELEMETRY_LOG, default=None,
+                       help=f'Append scheduler events as JSON lines (default {TELEMETRY_LOG})')
+    parser.add_argument('--trace', default=TRACE_PATH,
+                       help=f'Trace-event timeline of the run for Perfetto or chrome://tracing (default {TRACE_PATH}, '
+                            'empty to skip)')
+    parser.add_argument('--max-load', type=float, default=None,
+                       help='Load average budget for admitting jobs (defaults to the CPU count)')
+    parser.add_argument('--mem-reserve-mb', type=int, default=1024,
+                       help='Memory kept free when admitting jobs')
+    parser.add_argument('--fail-fast', nargs='?', const='global', choices=['tier', 'component', 'global'],
+                       default=None,
+                       help='When a blocking job fails, kill the running jobs and drop the queued ones in the same '
+                            'tier, component or the whole run (default global)')
+    parser.add_argument('--retries', type=int, default=1,
+                       help='Times the failed tests of a Cypress or Playwright command are re-run on their own')
+    parser.add_argument('--quarantine-score', type=float, default=QUARANTINE_SCORE,
+                       help='Flakiness score at which a test moves to the non-blocking quarantine lane')
+    parser.add_argument('--no-quarantine', action='store_true',
+                       help='Run quarantined flaky tests in their normal, blocking commands')
+    parser.add_argument('--no-admission', action='store_true',
+                       help='Start jobs whenever a worker is free, ignoring CPU and memory budgets')
+    parser.add_argument('--coordinator', metavar='[HOST:]PORT', default=None,
+                       help='Serve jobs to remote workers from HOST:PORT instead of running them here '
+                            '(only on 127.0.0.1 unless HOST is given)')
+    parser.add_argument('--worker', metavar='URL', default=None,
+                       help='Run jobs leased from the coordinator at URL until it finishes')
+    parser.add_argument('--coordinator-token', default=None,
+                       help=f'Shared secret between coordinator and workers (defaults to ${TOKEN_ENV}; '
+                            'a coordinator without one makes one up and prints it)')
+    parser.add_argument('--worker-wait', type=float, default=WORKER_WAIT,
+                       help='Seconds the coordinator waits with no live worker before failing the remaining jobs')
+    parser.add_argument('--worker-name', default=None,
+                       help='Name this worker reports to the coordinator (defaults to the hostname)')
     
     args = parser.parse_args()
     
-    runner = MarketScaleTestRunner()
+    runner = MarketScaleTestRunner(engine=args.engine, timeout=args.timeout, workers=args.workers,
+                                   log_compression=args.log_compression, use_cache=not args.no_cache,
+                                   cache_dir=args.cache_dir, cache_max_mb=args.cache_max_mb,
+                                   changed_since=args.changed_since, shards=args.shards,
+                                   server_pool=args.server_pool, server_base_port=args.server_base_port,
+                                   fresh_db=args.fresh_db, db_restore=args.db_restore,
+                                   perf_tolerance=args.perf_tolerance, perf_window=args.perf_window,
+                                   admission=not args.no_admission, max_load=args.max_load,
+                                   mem_reserve_mb=args.mem_reserve_mb, retries=args.retries,
+                                   quarantine=not args.no_quarantine, quarantine_score=args.quarantine_score,
+                                   fail_fast=args.fail_fast, coordinator=args.coordinator,
+                                   load_driver=args.load_driver, load_model=args.load_model,
+                                   coalesce=not args.no_coalesce, slowest=args.slowest_tests,
+                                   telemetry=args.telemetry, telemetry_log=args.telemetry_log, trace=args.trace,
+                                   coordinator_token=args.coordinator_token,
+                                   profile_toolchain=args.profile_toolchain, worker_wait=args.worker_wait)
     
     if args.sequential:
         args.parallel = False
@@ -402,30 +1997,43 @@ def main():
     print("Demonstrates expertise in modern testing tools and methodologies")
     print("=" * 80)
     
-    if args.tier == '1' or args.tier == 'all':
-        runner.run_tier1_critical(parallel=args.parallel)
-    
-    if args.tier == '2' or args.tier == 'all':
-        runner.run_tier2_important(parallel=args.parallel)
-    
-    if args.tier == '3' or args.tier == 'all':
-        runner.run_tier3_secondary(parallel=args.parallel)
-    
-    if args.tier == 'smoke' or args.tier == 'all':
-        runner.run_smoke_tests()
-    
-    if args.tier == 'performance' or args.tier == 'all':
-        runner.run_performance_tests()
-    
-    if args.tier == 'security' or args.tier == 'all':
-        runner.run_security_tests()
-    
-    if args.tier == 'regression' or args.tier == 'all':
-        runner.run_regression_suite()
-    
-    # Generate and display report
-    report = runner.generate_report()
-    runner.print_summary(report)
+    try:
+        if args.worker:
+            runner.serve_worker(args.worker, args.worker_name)
+            return
+
+        if args.tier == '1' or args.tier == 'all':
+            runner.run_tier1_critical(parallel=args.parallel)
+
+        if args.tier == '2' or args.tier == 'all':
+            runner.run_tier2_important(parallel=args.parallel)
+
+        if args.tier == '3' or args.tier == 'all':
+            runner.run_tier3_secondary(parallel=args.parallel)
+
+        if args.tier == 'smoke' or args.tier == 'all':
+            runner.run_smoke_tests()
+
+        if args.tier == 'performance' or args.tier == 'all':
+            runner.run_performance_tests()
+
+        if args.tier == 'security' or args.tier == 'all':
+            runner.run_security_tests()
+
+        if args.tier == 'regression' or args.tier == 'all':
+            runner.run_regression_suite(parallel=args.parallel, gated=args.tier_gates)
+
+        if not runner.results and runner.impact is not None:
+            print(f"\n🎯 No commands impacted by changes since {args.changed_since} - nothing to run")
+            return
+
+        # Generate and display report
+        report = runner.generate_report()
+        runner.print_summary(report)
+        if report['perf_regressions'] or report['fail_fast']:
+            sys.exit(1)
+    finally:
+        runner.close()
 
 if __name__ == "__main__":
     main()
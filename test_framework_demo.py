@@ -9,6 +9,9 @@ import json
 import os
 from datetime import datetime
 
+from qa_runner.probes import probe_tools
+from qa_runner.store import record_results
+
 def run_test(name, command, test_type="functional", timeout=30):
     """Run a test and return results"""
     print(f"Running {name} ({test_type})...")
@@ -33,6 +36,7 @@ def run_test(name, command, test_type="functional", timeout=30):
         
         return {
             'name': name,
+            'command': command,
             'type': test_type,
             'duration': duration,
             'success': success,
@@ -45,6 +49,7 @@ def run_test(name, command, test_type="functional", timeout=30):
         print(f"   TIMEOUT {name} - {duration:.2f}s")
         return {
             'name': name,
+            'command': command,
             'type': test_type,
             'duration': duration,
             'success': False,
@@ -56,6 +61,7 @@ def run_test(name, command, test_type="functional", timeout=30):
         print(f"   ERROR {name} - {duration:.2f}s: {e}")
         return {
             'name': name,
+            'command': command,
             'type': test_type,
             'duration': duration,
             'success': False,
@@ -63,6 +69,24 @@ def run_test(name, command, test_type="functional", timeout=30):
             'output': ""
         }
 
+def probe_test(name, probe, test_type="health"):
+    """Report a tool probe the same way as a test"""
+    status = "PASSED" if probe['success'] else "FAILED"
+    source = " (cached)" if probe['cached'] else ""
+    print(f"   {status} {name} - {probe['duration']:.2f}s{source}")
+    if not probe['success'] and probe['error']:
+        print(f"    Error: {probe['error'][:200]}...")
+    return {
+        'name': name,
+        'command': probe['command'],
+        'type': test_type,
+        'duration': probe['duration'],
+        'success': probe['success'],
+        'error': probe['error'],
+        'output': probe['output'],
+        'cached': probe['cached']
+    }
+
 def check_file_exists(filepath, description):
     """Check if a file exists and return result"""
     exists = os.path.exists(filepath)
@@ -85,22 +109,25 @@ def main():
     
     tests = []
     
+    # Every version check runs at once; unchanged tools are answered from .qa-cache/
+    probes = probe_tools(['node', 'npm', 'php', 'composer', 'k6', 'python', 'cypress', 'playwright', 'vite'])
+    
     # Environment Health Checks
     print("\nENVIRONMENT HEALTH CHECKS")
     print("-" * 30)
-    tests.append(run_test("Node.js Version", "node --version", "health"))
-    tests.append(run_test("NPM Version", "npm --version", "health"))
-    tests.append(run_test("PHP Version", "php --version", "health"))
-    tests.append(run_test("Composer Version", "composer --version", "health"))
-    tests.append(run_test("k6 Version", "k6 version", "health"))
-    tests.append(run_test("Python Version", "python3 --version", "health"))
+    tests.append(probe_test("Node.js Version", probes['node']))
+    tests.append(probe_test("NPM Version", probes['npm']))
+    tests.append(probe_test("PHP Version", probes['php']))
+    tests.append(probe_test("Composer Version", probes['composer']))
+    tests.append(probe_test("k6 Version", probes['k6']))
+    tests.append(probe_test("Python Version", probes['python']))
     
     # Tool Installation Checks
     print("\nTOOL INSTALLATION CHECKS")
     print("-" * 30)
-    tests.append(run_test("Cypress Installation", "npx cypress --version", "tool"))
-    tests.append(run_test("Playwright Installation", "npx playwright --version", "tool"))
-    tests.append(run_test("Vite Installation", "npx vite --version", "tool"))
+    tests.append(probe_test("Cypress Installation", probes['cypress'], "tool"))
+    tests.append(probe_test("Playwright Installation", probes['playwright'], "tool"))
+    tests.append(probe_test("Vite Installation", probes['vite'], "tool"))
     
     # File Structure Validation
     print("\nFILE STRUCTURE VALIDATION")
@@ -222,6 +249,8 @@ def main():
             'tests': tests
         }, f, indent=2)
     
+    record_results('comprehensive', {test['name']: test for test in tests})
+    
     print(f"\nResults saved to: test-results/comprehensive-results.json")
     
     if success_rate >= 80: